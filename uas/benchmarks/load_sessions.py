@@ -0,0 +1,205 @@
+import argparse
+import contextlib
+import gc
+import json
+import os
+import random
+import sys
+import threading
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from rerun_latency import _act, _start  # noqa: E402
+from service.prewarm import prewarm  # noqa: E402
+from streamlit.runtime import Runtime  # noqa: E402
+
+# ========================================
+# BENCHMARK: BEBAN BANYAK SESSION
+# ========================================
+# Mensimulasikan N pengguna sekaligus di satu proses Python, seperti server
+# Streamlit: setiap session adalah AppTest sendiri yang berjalan di thread
+# sendiri, dan semuanya berbagi GIL, thread pool OpenCV dan memori proses.
+# Setiap session memutar trace interaksi yang sama (upload, geser slider
+# rotasi, Apply, download) dengan jeda "berpikir" acak di antaranya:
+#
+#   python benchmarks/load_sessions.py --sessions 1 2 4 8 16 --size 1920x1080
+#
+# Output per N: latency rerun p50/p95/p99, throughput (rerun/detik), dan
+# RSS proses (puncak selama level itu dan sesudahnya). "Knee" adalah N
+# di mana throughput berhenti naik sementara p95 terus naik: di atas titik
+# itu menambah pengguna hanya menambah antrian.
+#
+# Tanpa websocket dan serialisasi protobuf server sungguhan, jadi angka
+# latency adalah batas bawah; yang diukur adalah persaingan antar session
+# di dalam proses.
+
+# Clicking a download button reruns the script, which re-encodes the PNG
+TRACE = [
+    ("upload", None),
+    ("select", ("selectbox", "Select Transformation Type", "Rotation")),
+    ("slide", ("slider", "Rotation Angle (degrees)", 10)),
+    ("slide", ("slider", "Rotation Angle (degrees)", 20)),
+    ("slide", ("slider", "Rotation Angle (degrees)", 30)),
+    ("apply", ("button", "✨ Apply Transformation", None)),
+    ("download", "rerun"),
+]
+
+
+def rss_bytes():
+    """Current resident set size of this process (Linux), or None."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return None
+
+
+class RssSampler:
+    """Background thread tracking peak RSS while a load level runs."""
+
+    def __init__(self, interval=0.05):
+        self.interval = interval
+        self.peak = rss_bytes() or 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._loop, name="rss-sampler", daemon=True)
+
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, rss_bytes() or 0)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+@contextlib.contextmanager
+def shared_runtime():
+    """Keep a Runtime visible while other sessions' AppTest runs clear it.
+
+    AppTest installs a mock Runtime singleton for each run and resets it to
+    None afterwards; with concurrent sessions that reset would pull it out
+    from under runs still in progress. Here the last installed one stays.
+    """
+    last = []
+    instance, exists = Runtime.__dict__['instance'], Runtime.__dict__['exists']
+
+    def sticky_instance(cls):
+        if cls._instance is not None:
+            last[:] = [cls._instance]
+            return cls._instance
+        if not last:
+            raise RuntimeError("Runtime hasn't been created!")
+        return last[0]
+
+    Runtime.instance = classmethod(sticky_instance)
+    Runtime.exists = classmethod(lambda cls: cls._instance is not None or bool(last))
+    try:
+        yield
+    finally:
+        Runtime.instance, Runtime.exists = instance, exists
+
+
+def session(trace, size, timeout, think, rng, start, samples, errors):
+    """One simulated user: replays the trace, appending (step, seconds) to samples."""
+    start.wait()
+    try:
+        at = None
+        for step, action in trace:
+            t0 = time.perf_counter()
+            if action is None:
+                at = _start("pages/transform_tool.py", size, timeout)
+            elif action == "rerun":
+                at.run(timeout=timeout)
+            else:
+                _act(at, action, timeout)
+            samples.append((step, time.perf_counter() - t0))
+            if think:
+                time.sleep(rng.uniform(0, 2 * think))
+    except Exception as e:
+        errors.append(repr(e))
+
+
+def run_level(n, size, rounds, timeout, think, seed):
+    samples, errors = [], []
+    start = threading.Barrier(n + 1)
+    threads = [threading.Thread(target=session, name=f"session-{i}",
+                                args=(TRACE * rounds, size, timeout, think, random.Random(seed + i),
+                                      start, samples, errors))
+               for i in range(n)]
+    gc.collect()
+    with shared_runtime(), RssSampler() as rss:
+        for t in threads:
+            t.start()
+        start.wait()
+        t0 = time.perf_counter()
+        for t in threads:
+            t.join()
+        wall = time.perf_counter() - t0
+    gc.collect()
+
+    ms = np.array([s for _, s in samples]) * 1000
+    p50, p95, p99 = np.percentile(ms, [50, 95, 99]) if len(ms) else (float("nan"),) * 3
+    per_step = {}
+    for step, s in samples:
+        per_step.setdefault(step, []).append(s * 1000)
+    return {
+        'sessions': n, 'reruns': len(samples), 'errors': errors,
+        'p50_ms': round(float(p50), 1), 'p95_ms': round(float(p95), 1), 'p99_ms': round(float(p99), 1),
+        'throughput': round(len(samples) / wall, 2), 'wall_s': round(wall, 2),
+        'peak_rss_mb': round(rss.peak / 2**20, 1), 'rss_after_mb': round((rss_bytes() or 0) / 2**20, 1),
+        'step_p50_ms': {k: round(float(np.median(v)), 1) for k, v in per_step.items()},
+    }
+
+
+def knee(results):
+    """First level whose throughput is within 10% of the best one."""
+    best = max(r['throughput'] for r in results)
+    return next(r['sessions'] for r in results if r['throughput'] >= 0.9 * best)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Concurrent-session load test of the transform tool.")
+    parser.add_argument("--sessions", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--size", default="1920x1080", help="synthetic upload, WxH")
+    parser.add_argument("--rounds", type=int, default=1, help="trace repetitions per session")
+    parser.add_argument("--think", type=float, default=0.0, help="mean think time between steps, s")
+    parser.add_argument("--timeout", type=float, default=300, help="seconds per rerun")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", default=None, help="also write results to this file")
+    args = parser.parse_args(argv)
+
+    size = tuple(int(v) for v in args.size.lower().split("x"))
+    prewarm(background=False)
+    run_level(1, size, 1, args.timeout, 0, args.seed)  # warm-up
+
+    print(f"upload {size[0]}x{size[1]}, trace x{args.rounds}, think {args.think:g}s, "
+          f"{os.cpu_count()} cores, baseline RSS {(rss_bytes() or 0) / 2**20:.0f} MB\n")
+    print(f"{'N':>4} {'reruns':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'rerun/s':>8} "
+          f"{'peak RSS':>9} {'RSS after':>10}  errors")
+    results = []
+    for n in args.sessions:
+        r = run_level(n, size, args.rounds, args.timeout, args.think, args.seed)
+        results.append(r)
+        print(f"{n:>4} {r['reruns']:>7} {r['p50_ms']:8.1f} {r['p95_ms']:8.1f} {r['p99_ms']:8.1f} "
+              f"{r['throughput']:8.2f} {r['peak_rss_mb']:8.0f}M {r['rss_after_mb']:9.0f}M  {len(r['errors'])}")
+        for e in r['errors'][:3]:
+            print(f"       {e}", file=sys.stderr)
+
+    print("\nmedian per step (ms): " + ", ".join(
+        f"{step} " + "/".join(f"{r['step_p50_ms'].get(step, float('nan')):.0f}" for r in results)
+        for step in dict.fromkeys(s for s, _ in TRACE)) + f"  (N = {', '.join(map(str, args.sessions))})")
+    print(f"throughput saturates at N = {knee(results)}")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({'size': list(size), 'cores': os.cpu_count(), 'results': results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
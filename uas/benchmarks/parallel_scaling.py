@@ -0,0 +1,95 @@
+import argparse
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from engine import (  # noqa: E402
+    NONLINEAR_WARPS,
+    color_op,
+    configure_workers,
+    filter_op,
+    lut_op,
+    compile_lut,
+    remap_op,
+    run_op_parallel,
+    sepia_matrix,
+    warp_op,
+)
+from engine.planner import run_op  # noqa: E402
+
+# ========================================
+# BENCHMARK: STRIP-PARALLEL SCALING
+# ========================================
+# Mengukur speedup dan efisiensi (speedup / worker) executor strip-parallel
+# dari 1 sampai N worker, per jenis op:
+#
+#   python benchmarks/parallel_scaling.py --size 4000x3000 --max-workers 8
+#
+# Efisiensi 1.0 berarti skala linear. Hasil hanya bermakna jika mesin
+# benar-benar punya N core bebas (lihat baris "cores" di output).
+
+
+def make_ops(cols, rows):
+    return [
+        ("warpAffine (rotate)", warp_op(cv2.getRotationMatrix2D((cols / 2, rows / 2), 17, 0.9))),
+        ("warpPerspective", warp_op(np.array([[1, 0.1, 0], [0.0002, 1, 0], [1e-4, 5e-5, 1]]))),
+        ("remap (swirl)", remap_op("Swirl", NONLINEAR_WARPS["Swirl"])),
+        ("Gaussian 9×9", filter_op("Gaussian Blur", {'kernel_size': 9})),
+        ("Sharpen", filter_op("Sharpen", {'strength': 1.0})),
+        ("Colour matrix", color_op(sepia_matrix())),
+        ("LUT (per channel)", lut_op(compile_lut([{'type': 'Gamma', 'params': {'gamma': 1.8},
+                                                   'channels': 'R'}]))),
+    ]
+
+
+def best_ms(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - t0) * 1000)
+    return min(times)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Strip-parallel scaling benchmark.")
+    parser.add_argument("--size", default="4000x3000", help="image size COLSxROWS")
+    parser.add_argument("--max-workers", type=int, default=None, help="default: available cores")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    cols, rows = (int(v) for v in args.size.lower().split("x"))
+    cores = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count()
+    max_workers = args.max_workers or cores
+    counts = sorted({1, *[n for n in (2, 4, 8, 16, 32) if n < max_workers], max_workers})
+
+    rng = np.random.default_rng(0)
+    img = cv2.GaussianBlur((rng.random((rows, cols, 3)) * 255).astype(np.uint8), (9, 9), 0)
+    ops = make_ops(cols, rows)
+
+    print(f"image {cols}×{rows}, cores {cores}, OpenCV {cv2.__version__}")
+    print(f"{'op':<22}" + "".join(f"{n:>8}w" for n in counts) + "   (ms; speedup / efficiency vs 1 worker)")
+    totals = {n: 0.0 for n in counts}
+    for label, op in ops:
+        run_op(img, op)  # warm caches (remap grids)
+        row = []
+        for n in counts:
+            configure_workers(n)
+            ms = best_ms(lambda: run_op_parallel(img, op) if n > 1 else run_op(img, op), args.repeat)
+            totals[n] += ms
+            row.append(ms)
+        base = row[0]
+        print(f"{label:<22}" + "".join(f"{ms:9.1f}" for ms in row)
+              + "   " + "  ".join(f"{base / ms:.2f}x/{base / ms / n:.2f}" for n, ms in zip(counts, row)))
+    base = totals[counts[0]]
+    print(f"{'total':<22}" + "".join(f"{totals[n]:9.1f}" for n in counts)
+          + "   " + "  ".join(f"{base / totals[n]:.2f}x/{base / totals[n] / n:.2f}" for n in counts))
+
+
+if __name__ == "__main__":
+    main()
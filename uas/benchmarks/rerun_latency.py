@@ -0,0 +1,226 @@
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from streamlit.testing.v1 import AppTest  # noqa: E402
+
+from service.prewarm import prewarm  # noqa: E402
+
+# ========================================
+# BENCHMARK: RERUN LATENCY PER HALAMAN
+# ========================================
+# Mengukur waktu satu rerun penuh script setiap halaman untuk interaksi
+# yang umum (menggeser slider rotasi, mengganti mode, mengubah threshold
+# Canny, Apply, ...) secara headless dengan streamlit.testing.v1.AppTest,
+# ditambah puncak memori Python (tracemalloc) per rerun:
+#
+#   python benchmarks/rerun_latency.py --size 1920x1080
+#   python benchmarks/rerun_latency.py --only transform --json out.json
+#
+# AppTest tidak mendukung file_uploader, jadi halaman dijalankan lewat
+# script pembungkus yang mengganti st.file_uploader dengan gambar sintetis
+# berukuran --size. Semua tab st.tabs dirender di setiap rerun (pindah tab
+# tidak memicu rerun), jadi "pindah tab" diukur sebagai interaksi dengan
+# widget di tab tersebut.
+#
+# Setiap interaksi punya budget (median ms per rerun dan puncak MB); jika
+# ada yang terlampaui, script keluar dengan status 1. --scale mengalikan
+# semua budget untuk mesin yang lebih lambat. Waktu termasuk overhead
+# AppTest sendiri (beberapa ms).
+
+UPLOAD_LABEL = "Choose an image file"
+
+# Runs a page with the image uploader answering with a synthetic PNG
+WRAPPER = '''
+import io, runpy, sys
+import numpy as np
+import streamlit as st
+from PIL import Image
+sys.path.insert(0, {root!r})
+
+class _Upload(io.BytesIO):
+    name = "synthetic.png"
+    type = "image/png"
+    size = property(lambda self: len(self.getvalue()))
+
+@st.cache_resource
+def _png(cols, rows):
+    y, x = np.mgrid[0:rows, 0:cols]
+    img = np.dstack([x * 255 // max(cols - 1, 1), y * 255 // max(rows - 1, 1), (x ^ y) & 255])
+    buf = io.BytesIO()
+    Image.fromarray(img.astype(np.uint8)).save(buf, format="PNG", compress_level=1)
+    return buf.getvalue()
+
+def _uploader(label, *args, **kwargs):
+    return _Upload(_png({cols}, {rows})) if label == {upload!r} else None
+
+st.file_uploader = _uploader
+runpy.run_path({page!r}, run_name="__main__")
+'''
+
+
+def drag(label, values):
+    """A slider drag: one rerun per intermediate value."""
+    return [("slider", label, v) for v in values]
+
+
+# (page, interaction, untimed setup actions, timed actions, budget ms, budget MB)
+# An interaction without timed actions measures the first run of the page.
+SCENARIOS = [
+    ("main.py", "first run", [], [], 300, 20),
+    ("pages/about.py", "first run", [], [], 300, 20),
+    ("pages/intro.py", "first run", [], [], 800, 40),
+    ("pages/intro.py", "visualisation: rotation slider",
+     [("selectbox", "Transformation Type", "Rotation")],
+     drag("Angle (degrees)", [0, 15, 30, 45, 60]), 600, 40),
+    ("pages/matrix_explorer.py", "first run", [], [], 3000, 60),
+    ("pages/matrix_explorer.py", "custom matrix: edit a12",
+     [], [("number_input", "a₁₂", v) for v in (0.1, 0.2, 0.3)], 3000, 60),
+    ("pages/matrix_explorer.py", "operations tab: switch A",
+     [], [("selectbox", "Transformation A", v) for v in ("Rotation", "Scaling", "Shearing")], 3000, 60),
+    ("pages/matrix_explorer.py", "demo tab: rotation slider",
+     [("radio", "Transformation", "Rotation")], drag("Angle", [0, 30, 60, 90]), 3000, 60),
+    ("pages/transform_tool.py", "first run (upload)", [], [], 1000, 100),
+    ("pages/transform_tool.py", "single: rotation slider",
+     [("selectbox", "Select Transformation Type", "Rotation")],
+     drag("Rotation Angle (degrees)", [5, 10, 15, 20, 25, 30]), 600, 100),
+    ("pages/transform_tool.py", "single: apply rotation",
+     [("selectbox", "Select Transformation Type", "Rotation"),
+      ("slider", "Rotation Angle (degrees)", 30)],
+     [("button", "✨ Apply Transformation", None)], 2000, 150),
+    ("pages/transform_tool.py", "switch mode",
+     [], [("radio", "**Choose Mode:**", m) for m in
+          ("🔗 Multiple Transformations", "🌀 Non-linear Warps", "🎨 Filters", "🎯 Single Transformation")],
+     800, 150),
+    ("pages/transform_tool.py", "filters: Canny threshold",
+     [("radio", "**Choose Mode:**", "🎨 Filters"), ("selectbox", "Select Filter", "Edge Detection"),
+      ("radio", "Method", "Canny")],
+     drag("Threshold 1", [60, 80, 120, 140]), 600, 100),
+    ("pages/transform_tool.py", "filters: blur kernel",
+     [("radio", "**Choose Mode:**", "🎨 Filters")], drag("Kernel Size", [3, 7, 9, 11]), 800, 100),
+]
+
+
+def _widget(at, kind, label):
+    for w in getattr(at, kind):
+        if w.label == label or getattr(w, "key", None) == label:
+            return w
+    raise LookupError(f"No {kind} labelled {label!r} on this run")
+
+
+def _act(at, action, timeout):
+    kind, label, value = action
+    w = _widget(at, kind, label)
+    if kind == "button":
+        w.click()
+    else:
+        w.set_value(value)
+    at.run(timeout=timeout)
+    if at.exception:
+        raise RuntimeError(f"{label}: {at.exception[0].value}")
+
+
+def _start(page, size, timeout):
+    cols, rows = size
+    script = WRAPPER.format(root=ROOT, page=os.path.join(ROOT, page), cols=cols, rows=rows,
+                            upload=UPLOAD_LABEL)
+    at = AppTest.from_string(script, default_timeout=timeout)
+    at.run()
+    if at.exception:
+        raise RuntimeError(f"{page}: {at.exception[0].value}")
+    return at
+
+
+def measure(scenario, size, timeout, memory=False):
+    """Per-rerun seconds (and tracemalloc peaks in bytes) of one fresh pass."""
+    page, _, setup, steps, _, _ = scenario
+    times, peaks = [], []
+
+    def timed(fn):
+        if memory:
+            tracemalloc.reset_peak()
+        t0 = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - t0)
+        if memory:
+            peaks.append(tracemalloc.get_traced_memory()[1])
+        return result
+
+    if not steps:
+        timed(lambda: _start(page, size, timeout))
+        return times, peaks
+    at = _start(page, size, timeout)
+    for action in setup:
+        _act(at, action, timeout)
+    for action in steps:
+        timed(lambda: _act(at, action, timeout))
+    return times, peaks
+
+
+def run(scenarios, size, repeat, timeout, scale):
+    results = []
+    for scenario in scenarios:
+        page, name, _, _, budget_ms, budget_mb = scenario
+        measure(scenario, size, timeout)  # warm-up: imports, caches, OpenCV init
+        samples = []
+        for _ in range(repeat):
+            samples += measure(scenario, size, timeout)[0]
+        tracemalloc.start()
+        try:
+            _, peaks = measure(scenario, size, timeout, memory=True)
+        finally:
+            tracemalloc.stop()
+        median_ms = statistics.median(samples) * 1000
+        peak_mb = max(peaks) / 2**20
+        results.append({
+            'page': page, 'interaction': name, 'reruns': len(samples),
+            'median_ms': round(median_ms, 1), 'max_ms': round(max(samples) * 1000, 1),
+            'peak_mb': round(peak_mb, 1),
+            'budget_ms': budget_ms * scale, 'budget_mb': budget_mb * scale,
+            'ok': median_ms <= budget_ms * scale and peak_mb <= budget_mb * scale,
+        })
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Per-page Streamlit rerun latency and memory.")
+    parser.add_argument("--size", default="1920x1080", help="synthetic upload, WxH")
+    parser.add_argument("--repeat", type=int, default=3, help="timed passes per interaction")
+    parser.add_argument("--only", default=None, help="only pages whose path contains this")
+    parser.add_argument("--scale", type=float, default=1.0, help="multiply all budgets")
+    parser.add_argument("--timeout", type=float, default=120, help="seconds per rerun")
+    parser.add_argument("--json", default=None, help="also write results to this file")
+    args = parser.parse_args(argv)
+
+    size = tuple(int(v) for v in args.size.lower().split("x"))
+    prewarm(background=False)  # otherwise main.py starts it mid-measurement
+    scenarios = [s for s in SCENARIOS if args.only is None or args.only in s[0]]
+    results = run(scenarios, size, args.repeat, args.timeout, args.scale)
+
+    print(f"upload {size[0]}x{size[1]}, {args.repeat} passes, budgets x{args.scale:g}\n")
+    print(f"{'page':<26} {'interaction':<32} {'n':>3} {'median ms':>10} {'max ms':>8} "
+          f"{'peak MB':>8} {'budget':>14}")
+    for r in results:
+        budget = f"{r['budget_ms']:g}ms/{r['budget_mb']:g}MB"
+        print(f"{r['page']:<26} {r['interaction']:<32} {r['reruns']:>3} {r['median_ms']:10.1f} "
+              f"{r['max_ms']:8.1f} {r['peak_mb']:8.1f} {budget:>14}  {'ok' if r['ok'] else 'OVER BUDGET'}")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({'size': list(size), 'results': results}, f, indent=2)
+
+    over = [r for r in results if not r['ok']]
+    if over:
+        print(f"\n{len(over)} interaction(s) over budget", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,54 @@
+import argparse
+import os
+import pickle
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from engine import ProcessRunner, SharedImage, make_recipe, transform_stage  # noqa: E402
+from engine.sharedmem import _noop_job  # noqa: E402
+
+# ========================================
+# BENCHMARK: SHARED-MEMORY DISPATCH
+# ========================================
+# Biaya mengirim satu job ke worker process (round trip tanpa komputasi)
+# untuk berbagai ukuran gambar, dibanding biaya pickle array yang akan
+# terjadi tanpa shared memory:
+#
+#   python benchmarks/shm_dispatch.py --sizes 1 10 100
+
+
+def best_ms(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - t0) * 1000)
+    return min(times)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Shared-memory job dispatch benchmark.")
+    parser.add_argument("--sizes", type=float, nargs="+", default=[1, 10, 50], help="megapixels (RGB)")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    recipe = make_recipe([transform_stage("Rotation", angle=10)])
+    runner = ProcessRunner(1)
+    runner.submit(SharedImage((8, 8, 3)), recipe, _job=_noop_job).result().release()  # start worker
+
+    print(f"{'MP':>6} {'MB':>8} {'dispatch ms':>12} {'pickle ms':>10}")
+    for mp in args.sizes:
+        side = int((mp * 1e6) ** 0.5)
+        with SharedImage((side, side, 3)) as img:
+            def dispatch():
+                runner.submit(img, recipe, _job=_noop_job).result().release()
+            ms = best_ms(dispatch, args.repeat)
+            pk = best_ms(lambda: pickle.dumps(img.array, protocol=pickle.HIGHEST_PROTOCOL), 2)
+            print(f"{mp:6.0f} {img.array.nbytes / 1e6:8.0f} {ms:12.2f} {pk:10.1f}")
+    runner.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+import argparse
+import ast
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# ========================================
+# BENCHMARK: STARTUP IMPORT TIME
+# ========================================
+# Mengukur biaya import saat cold start dengan `python -X importtime` di
+# proses baru (tanpa cache sys.modules):
+#
+# - per halaman: semua import top-level halaman itu, di atas streamlit
+#   (yang selalu sudah dimuat oleh server);
+# - per modul berat: cv2, matplotlib, engine, ...
+#
+#   python benchmarks/startup_importtime.py > benchmarks/startup_importtime.txt
+#
+# Setiap angka adalah nilai minimum dari --repeat kali jalan (default 3),
+# supaya noise cache disk dan scheduler tidak ikut terukur.
+
+PAGES = ["main.py", "pages/intro.py", "pages/matrix_explorer.py", "pages/transform_tool.py", "pages/about.py"]
+MODULES = ["numpy", "PIL.Image", "cv2", "matplotlib.pyplot", "mpl_toolkits.mplot3d",
+           "engine", "service.video", "service.prewarm"]
+
+
+def top_level_imports(path):
+    """Import statements at module level of a page, as source lines."""
+    with open(path, encoding="utf-8") as f:
+        tree = ast.parse(f.read())
+    return [ast.unparse(node) for node in tree.body if isinstance(node, (ast.Import, ast.ImportFrom))]
+
+
+def import_us(statements, preload=("streamlit",)):
+    """Cumulative import time (µs) of statements in a fresh interpreter, after preload."""
+    code = "\n".join([f"import {m}" for m in preload] + ["import sys", "sys.stderr.write('--mark--\\n')"]
+                     + statements)
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=ROOT,
+                          capture_output=True, text=True, check=True)
+    after = proc.stderr.split("--mark--\n", 1)[1]
+    total, top = 0, []
+    for line in after.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = (part.strip() for part in line[len("import time:"):].split("|"))
+        if not cumulative.isdigit():
+            continue
+        # Top-level entries are those without leading indentation in the name column
+        raw_name = line.rsplit("|", 1)[1]
+        if raw_name.startswith(" ") and not raw_name.startswith("  "):
+            total += int(cumulative)
+            top.append((int(cumulative), name))
+    return total, sorted(top, reverse=True)
+
+
+def best(statements, repeat, preload=("streamlit",)):
+    runs = [import_us(statements, preload) for _ in range(repeat)]
+    return min(runs, key=lambda r: r[0])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Cold-start import time per page and module.")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--top", type=int, default=5, help="heaviest imports listed per page")
+    args = parser.parse_args(argv)
+
+    print(f"Python {sys.version.split()[0]}, min of {args.repeat} runs, after `import streamlit`\n")
+    print(f"{'page':<28} {'import ms':>10}  heaviest")
+    for page in PAGES:
+        statements = [s for s in top_level_imports(os.path.join(ROOT, page)) if s != "import streamlit as st"]
+        total, top = best(statements, args.repeat)
+        heaviest = ", ".join(f"{name} {us / 1000:.0f}" for us, name in top[:args.top])
+        print(f"{page:<28} {total / 1000:10.1f}  {heaviest}")
+
+    print(f"\n{'module':<28} {'import ms':>10}")
+    for module in MODULES:
+        total, _ = best([f"import {module}"], args.repeat)
+        print(f"{module:<28} {total / 1000:10.1f}")
+
+
+if __name__ == "__main__":
+    main()
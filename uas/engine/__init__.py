@@ -0,0 +1,83 @@
+from .buffers import BufferPool
+from .color import (
+    COLOR_PRESETS,
+    apply_color_matrix,
+    channel_swap_matrix,
+    compose_color,
+    contrast_matrix,
+    grayscale_matrix,
+    invert_matrix,
+    saturation_matrix,
+    sepia_matrix,
+    white_balance_matrix,
+)
+from .geometry import (
+    compose,
+    image_corners,
+    is_affine,
+    normalize,
+    perspective_from_points,
+    to_homography,
+    transform_points,
+    warp,
+    warp_chain,
+)
+from .jobs import Job, JobRunner, job_runner, pipeline_job
+from .parallel import (
+    Cancelled,
+    configure_workers,
+    execute_parallel,
+    execute_tiled,
+    pin_library_threads,
+    pool_size,
+    run_op_parallel,
+    shared_pool,
+)
+from .pipeline import (
+    FILTER_TYPES,
+    TRANSFORM_TYPES,
+    WARP_TYPES,
+    StageCache,
+    build_matrix,
+    chain_key,
+    compile_stages,
+    filter_stage,
+    image_key,
+    run_pipeline,
+    segment_plans,
+    stage_ops,
+    transform_stage,
+)
+from .planner import (
+    color_op,
+    execute,
+    expand_op,
+    explain,
+    filter_op,
+    gray_op,
+    lut_op,
+    optimize,
+    region_op,
+    remap_op,
+    run_op,
+    run_optimized,
+    warp_op,
+)
+from .recipe import (
+    RECIPE_VERSION,
+    RecipeRunner,
+    apply_recipe,
+    dumps_recipe,
+    load_recipe,
+    loads_recipe,
+    make_recipe,
+    replay_batch,
+    session_stages,
+    validate_recipe,
+)
+from .precision import WorkBuffer, buffer_bytes
+from .region import apply_region, blend_region, mask_region, polygon_region, rect_region, region_bbox, region_mask
+from .roi import execute_roi, output_shape, plan_windows, source_window
+from .sharedmem import ProcessRunner, SharedImage, ShmHandle, attach
+from .tone import TONE_OPS, apply_lut, apply_tone, apply_tone_float, compile_lut, compose_luts
+from .warps import NONLINEAR_WARPS, GridCache, build_maps, grid_cache, nonlinear_warp
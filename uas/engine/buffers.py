@@ -0,0 +1,87 @@
+import sys
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+# ========================================
+# REUSABLE OUTPUT BUFFERS
+# ========================================
+# Setiap rerun Streamlit menghitung ulang preview, dan setiap op OpenCV
+# mengalokasikan array output baru. Pada gambar besar alokasi + page fault
+# itu terlihat di profil. BufferPool menyimpan array output per session,
+# dengan key (shape, dtype), dan memberikannya sebagai dst= ke OpenCV.
+#
+# Keamanan: buffer hanya dipakai ulang jika tidak ada yang lain memegang
+# referensinya (sys.getrefcount). Array yang disimpan di session state,
+# history, StageCache, atau view darinya (view memegang .base) otomatis
+# tidak pernah ditimpa. st.image meng-encode gambar saat dipanggil, jadi
+# tidak menahan referensi. Jika semua buffer untuk sebuah key sedang
+# dipakai, array baru dialokasikan (dan disimpan jika masih ada kuota).
+
+POOL_MAX_BYTES = 512 * 2**20
+MAX_PER_KEY = 4
+
+
+def _unshared_refcount():
+    """getrefcount of a pooled array nobody else holds, seen from the loop in get().
+
+    Normally 3 (pool list, loop variable, getrefcount's argument), but how
+    many of those the interpreter counts is an implementation detail, so it
+    is measured here with the same access pattern instead of hard-coded.
+    """
+    arrays = [np.empty(1)]
+    for arr in arrays:
+        return sys.getrefcount(arr)
+
+
+_FREE_REFCOUNT = _unshared_refcount()
+
+
+class BufferPool:
+    """Per-session destination arrays keyed by (shape, dtype)."""
+
+    def __init__(self, max_bytes=POOL_MAX_BYTES, max_per_key=MAX_PER_KEY):
+        self.max_bytes = max_bytes
+        self.max_per_key = max_per_key
+        self.hits = 0
+        self.misses = 0
+        self._buffers = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def nbytes(self):
+        return sum(a.nbytes for arrays in self._buffers.values() for a in arrays)
+
+    def get(self, shape, dtype=np.uint8):
+        """An array of this shape/dtype that nobody else references (contents undefined)."""
+        dtype = np.dtype(dtype)
+        key = (tuple(shape), dtype.str)
+        with self._lock:
+            arrays = self._buffers.get(key)
+            if arrays is not None:
+                self._buffers.move_to_end(key)
+                for arr in arrays:
+                    if sys.getrefcount(arr) <= _FREE_REFCOUNT:
+                        self.hits += 1
+                        return arr
+            self.misses += 1
+            arr = np.empty(shape, dtype=dtype)
+            if arrays is None:
+                arrays = self._buffers[key] = []
+            if len(arrays) < self.max_per_key and arr.nbytes <= self.max_bytes:
+                arrays.append(arr)
+                self._evict()
+            return arr
+
+    def _evict(self):
+        # Drop least recently used keys until the pool fits its budget; arrays
+        # still in use elsewhere simply stop being tracked
+        total = self.nbytes
+        while total > self.max_bytes and len(self._buffers) > 1:
+            _, arrays = self._buffers.popitem(last=False)
+            total -= sum(a.nbytes for a in arrays)
+
+    def clear(self):
+        with self._lock:
+            self._buffers.clear()
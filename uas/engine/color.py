@@ -0,0 +1,102 @@
+import cv2
+import numpy as np
+
+# ========================================
+# COLOUR MATRICES (cv2.transform)
+# ========================================
+# Colour matrix 3×4 bekerja per pixel pada vektor [R, G, B, 1]:
+#
+#   [R']   [m00 m01 m02 o0] [R]
+#   [G'] = [m10 m11 m12 o1] [G]
+#   [B']   [m20 m21 m22 o2] [B]
+#                           [1]
+#
+# Seperti matriks geometri, rantai colour matrix bisa dikalikan menjadi satu
+# matriks sehingga seluruh rantai hanya butuh satu pass cv2.transform.
+
+# ITU-R BT.601 luma weights (same as cv2.COLOR_RGB2GRAY)
+LUMA = np.array([0.299, 0.587, 0.114])
+
+
+def to_color_affine(M):
+    """Promote a 3×3 or 3×4 colour matrix to 4×4 homogeneous form."""
+    M = np.asarray(M, dtype=np.float64)
+    if M.shape == (3, 3):
+        M = np.hstack([M, np.zeros((3, 1))])
+    if M.shape != (3, 4):
+        raise ValueError(f"Expected a 3×3 or 3×4 colour matrix, got shape {M.shape}")
+    return np.vstack([M, [0.0, 0.0, 0.0, 1.0]])
+
+
+def compose_color(matrices):
+    """Compose colour matrices applied in order (first element first) into one 3×4."""
+    C = np.eye(4)
+    for M in matrices:
+        C = to_color_affine(M) @ C
+    return C[:3]
+
+
+def apply_color_matrix(img, M, dst=None):
+    """Apply a 3×3/3×4 colour matrix in one saturating cv2.transform pass."""
+    M = np.asarray(M, dtype=np.float64)
+    if M.shape == (3, 4) and not M[:, 3].any():
+        M = M[:, :3]
+    return cv2.transform(img, M.astype(np.float32), dst=dst)
+
+
+# ----------------------------------------
+# Presets
+# ----------------------------------------
+
+def identity_matrix():
+    return np.eye(3, 4)
+
+
+def grayscale_matrix():
+    return np.hstack([np.tile(LUMA, (3, 1)), np.zeros((3, 1))])
+
+
+def sepia_matrix():
+    return np.array([
+        [0.393, 0.769, 0.189, 0.0],
+        [0.349, 0.686, 0.168, 0.0],
+        [0.272, 0.534, 0.131, 0.0],
+    ])
+
+
+def saturation_matrix(s):
+    """s = 0 gives grayscale, 1 is identity, > 1 boosts saturation."""
+    M = (1 - s) * np.tile(LUMA, (3, 1)) + s * np.eye(3)
+    return np.hstack([M, np.zeros((3, 1))])
+
+
+def white_balance_matrix(r_gain, g_gain, b_gain):
+    return np.hstack([np.diag([r_gain, g_gain, b_gain]), np.zeros((3, 1))])
+
+
+def channel_swap_matrix(order="BGR"):
+    """Permutation matrix that reorders RGB into the given channel order."""
+    M = np.zeros((3, 4))
+    for row, ch in enumerate(order):
+        M[row, "RGB".index(ch)] = 1.0
+    return M
+
+
+def invert_matrix():
+    return np.hstack([-np.eye(3), np.full((3, 1), 255.0)])
+
+
+def contrast_matrix(alpha, beta=0.0, pivot=0.0):
+    """I' = alpha * (I - pivot) + pivot + beta for every channel."""
+    return np.hstack([alpha * np.eye(3), np.full((3, 1), pivot * (1 - alpha) + beta)])
+
+
+COLOR_PRESETS = {
+    "Identity": identity_matrix,
+    "Grayscale": grayscale_matrix,
+    "Sepia": sepia_matrix,
+    "Saturation": saturation_matrix,
+    "White Balance": white_balance_matrix,
+    "Channel Swap": channel_swap_matrix,
+    "Invert": invert_matrix,
+}
@@ -0,0 +1,88 @@
+import cv2
+import numpy as np
+
+# ========================================
+# MATRIX HELPERS
+# ========================================
+# Semua transformasi disimpan sebagai matriks homogen 3×3 supaya affine (2×3)
+# dan perspective (3×3) bisa dikomposisi dengan perkalian matriks biasa.
+
+
+def to_homography(M):
+    """Promote a 2×3 affine matrix to 3×3; 3×3 matrices are returned as float64."""
+    M = np.asarray(M, dtype=np.float64)
+    if M.shape == (2, 3):
+        return np.vstack([M, [0.0, 0.0, 1.0]])
+    if M.shape == (3, 3):
+        return M
+    raise ValueError(f"Expected a 2×3 or 3×3 matrix, got shape {M.shape}")
+
+
+def is_affine(H, eps=1e-12):
+    """True when the bottom row of H is [0, 0, 1] (up to scale)."""
+    H = to_homography(H)
+    return abs(H[2, 0]) < eps and abs(H[2, 1]) < eps and abs(H[2, 2]) > eps
+
+
+def compose(matrices):
+    """Compose a list of transforms applied in order (first element first).
+
+    Returns C = M_n @ ... @ M_1 so that a single warp with C equals warping
+    with each matrix in turn.
+    """
+    C = np.eye(3)
+    for M in matrices:
+        C = to_homography(M) @ C
+    return normalize(C)
+
+
+def normalize(H):
+    """Scale a homography so that H[2, 2] == 1 when possible."""
+    H = to_homography(H)
+    if abs(H[2, 2]) > 1e-12:
+        H = H / H[2, 2]
+    return H
+
+
+def perspective_from_points(src_pts, dst_pts):
+    """3×3 homography mapping four source corners onto four destination corners."""
+    src = np.asarray(src_pts, dtype=np.float32).reshape(4, 2)
+    dst = np.asarray(dst_pts, dtype=np.float32).reshape(4, 2)
+    return cv2.getPerspectiveTransform(src, dst).astype(np.float64)
+
+
+def image_corners(cols, rows):
+    """Corners of a cols×rows image in TL, TR, BR, BL order."""
+    return np.float32([[0, 0], [cols, 0], [cols, rows], [0, rows]])
+
+
+def transform_points(H, pts):
+    """Apply a 2×3 or 3×3 transform to an (N, 2) array of points."""
+    H = to_homography(H)
+    pts = np.asarray(pts, dtype=np.float64).reshape(-1, 2)
+    pts_h = np.hstack([pts, np.ones((len(pts), 1))]) @ H.T
+    return pts_h[:, :2] / pts_h[:, 2:3]
+
+
+# ========================================
+# WARP EXECUTION
+# ========================================
+
+def warp(img, M, dsize, flags=cv2.INTER_LINEAR, border_mode=cv2.BORDER_CONSTANT, dst=None):
+    """Warp img with a 2×3 or 3×3 matrix in a single resampling pass.
+
+    Affine matrices go through cv2.warpAffine (cheaper), everything else
+    through cv2.warpPerspective. A preallocated dst of the right shape and
+    dtype is written in place.
+    """
+    H = normalize(M)
+    if is_affine(H):
+        return cv2.warpAffine(img, H[:2].astype(np.float32), dsize, dst=dst,
+                              flags=flags, borderMode=border_mode)
+    return cv2.warpPerspective(img, H.astype(np.float32), dsize, dst=dst,
+                               flags=flags, borderMode=border_mode)
+
+
+def warp_chain(img, matrices, dsize, **kwargs):
+    """Compose all matrices into one homography and warp once."""
+    return warp(img, compose(matrices), dsize, **kwargs)
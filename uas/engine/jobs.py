@@ -0,0 +1,104 @@
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from .parallel import Cancelled, execute_tiled
+from .recipe import RecipeRunner, make_recipe
+
+# ========================================
+# BACKGROUND JOBS
+# ========================================
+# Operasi berat (mis. Apply pipeline pada gambar 100 MP) dijalankan sebagai
+# job di thread latar belakang, sehingga script Streamlit tidak terblokir.
+# Job dieksekusi per tile (execute_tiled): progress dilaporkan setiap tile
+# dan pembatalan dicek di antara tile.
+#
+# Halaman yang memegang job memanggil heartbeat() setiap kali ia di-render.
+# Jika tab ditutup, heartbeat berhenti dan job dibatalkan otomatis setelah
+# orphan_timeout detik, jadi pekerjaan tidak berjalan terus tanpa pemilik.
+
+ACTIVE = ("queued", "running")
+
+
+class Job:
+    def __init__(self, fn, label, orphan_timeout):
+        self.id = uuid.uuid4().hex[:8]
+        self.label = label
+        self.status = "queued"
+        self.done = 0
+        self.total = 0
+        self.result = None
+        self.error = None
+        self.created = time.monotonic()
+        self.started = None
+        self.finished = None
+        self._fn = fn
+        self._cancel = threading.Event()
+        self._orphan_timeout = orphan_timeout
+        self._last_seen = self.created
+
+    @property
+    def fraction(self):
+        return self.done / self.total if self.total else 0.0
+
+    @property
+    def elapsed(self):
+        if self.started is None:
+            return 0.0
+        return (self.finished or time.monotonic()) - self.started
+
+    def cancel(self):
+        self._cancel.set()
+
+    def heartbeat(self):
+        self._last_seen = time.monotonic()
+
+    def _progress(self, done, total):
+        self.done, self.total = done, total
+        if time.monotonic() - self._last_seen > self._orphan_timeout:
+            self._cancel.set()
+
+    def _run(self):
+        if self._cancel.is_set():
+            self.status = "cancelled"
+            return
+        self.status = "running"
+        self.started = time.monotonic()
+        try:
+            self.result = self._fn(self._progress, self._cancel)
+            self.status = "done"
+        except Cancelled:
+            self.status = "cancelled"
+        except Exception as e:
+            self.error = str(e)
+            self.status = "failed"
+        finally:
+            self.finished = time.monotonic()
+            self._fn = None
+
+
+class JobRunner:
+    """Bounded pool of background job threads shared by all sessions."""
+
+    def __init__(self, max_jobs=2, orphan_timeout=30.0):
+        self.orphan_timeout = orphan_timeout
+        self._pool = ThreadPoolExecutor(max_workers=max_jobs, thread_name_prefix="job")
+
+    def submit(self, fn, label="Job"):
+        """fn(progress, cancel) -> result runs in the background; returns a Job."""
+        job = Job(fn, label, self.orphan_timeout)
+        self._pool.submit(job._run)
+        return job
+
+
+job_runner = JobRunner()
+
+
+def pipeline_job(img, stages):
+    """Job function applying stages to img as one optimized, tiled plan."""
+    def run(progress, cancel):
+        runner = RecipeRunner(make_recipe(stages))
+        plan = runner.plan((img.shape[0], img.shape[1], 1 if img.ndim == 2 else img.shape[2]))
+        return execute_tiled(img, plan, progress, cancel)
+    return run
@@ -0,0 +1,269 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import cv2
+import numpy as np
+
+from .geometry import warp
+from .planner import _into, execute, out_shape, run_op
+from .warps import build_maps
+
+try:
+    from threadpoolctl import threadpool_limits
+except ImportError:  # optional; BLAS threads are then limited via env vars only
+    threadpool_limits = None
+
+# ========================================
+# STRIP-PARALLEL EXECUTION
+# ========================================
+# Setiap op dalam plan dibagi menjadi strip horizontal pada gambar OUTPUT
+# dan strip-strip itu dijalankan di satu thread pool bersama:
+#
+# - warp: setiap strip memakai matriks yang digeser (T(-y0) · H) dan membaca
+#   gambar sumber utuh, jadi tidak perlu halo;
+# - remap: setiap strip memakai potongan baris dari map yang di-cache;
+# - point op (LUT, colour matrix, gray/expand): strip tanpa halo;
+# - filter: strip input diperlebar dengan halo = radius kernel, lalu hasil
+#   dipotong kembali. Canny tidak dipecah (hysteresis bersifat global).
+#
+# Jumlah worker diatur per deployment dengan env UAS_WORKERS (default: jumlah
+# core). Thread internal OpenCV (UAS_CV_THREADS, default 1) dan BLAS dibatasi
+# supaya beberapa sesi Streamlit tidak saling berebut core: paralelisme hanya
+# berasal dari pool ini, dan ukurannya tetap berapa pun jumlah sesi.
+#
+# cv2.setNumThreads berlaku untuk seluruh proses (tidak bisa per thread),
+# jadi setelah pool dibuat OpenCV di thread mana pun berjalan satu thread.
+# Karena itu semua jalur berat (preview, Apply, recipe, job) harus lewat
+# execute_parallel, bukan memanggil OpenCV langsung; prewarm membuat pool
+# saat startup supaya batasan ini berlaku sejak request pertama, tidak
+# bergantung pada session mana yang lebih dulu memakai pool.
+
+MIN_STRIP_ROWS = 32
+PARALLEL_MIN_PIXELS = 512 * 512
+STRIPS_PER_WORKER = 2
+TILE_ROWS = 256  # execute_tiled: progress / cancellation granularity
+
+_BLAS_VARS = ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS")
+
+_pool = None
+_workers = None
+_pool_lock = threading.Lock()
+_local = threading.local()
+
+
+def _default_workers():
+    if os.environ.get("UAS_WORKERS"):
+        return max(1, int(os.environ["UAS_WORKERS"]))
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def pin_library_threads(cv_threads=None, blas_threads=1):
+    """Limit OpenCV and BLAS internal threading (process-wide)."""
+    if cv_threads is None:
+        cv_threads = int(os.environ.get("UAS_CV_THREADS", 1))
+    cv2.setNumThreads(cv_threads)
+    for var in _BLAS_VARS:
+        # Only affects BLAS libraries loaded after this point
+        os.environ.setdefault(var, str(blas_threads))
+    if threadpool_limits is not None:
+        threadpool_limits(blas_threads)
+
+
+def _mark_worker():
+    _local.in_pool = True
+
+
+def configure_workers(workers=None, cv_threads=None):
+    """(Re)create the shared pool with the given size and pin library threads."""
+    global _pool, _workers
+    with _pool_lock:
+        old = _pool
+        _workers = workers or _default_workers()
+        _pool = ThreadPoolExecutor(max_workers=_workers, thread_name_prefix="strip",
+                                   initializer=_mark_worker)
+        pin_library_threads(cv_threads)
+    if old is not None:
+        old.shutdown(wait=True)
+    return _workers
+
+
+def shared_pool():
+    if _pool is None:
+        configure_workers()
+    return _pool
+
+
+def pool_size():
+    shared_pool()
+    return _workers
+
+
+# ----------------------------------------
+# Strip kernels
+# ----------------------------------------
+
+def _halo(op):
+    """Rows of context a filter needs on each side of a strip (None = not splittable)."""
+    if op['op'] == 'region':
+        return None  # region coordinates are absolute; runs on its own bbox
+    if op['op'] != 'filter':
+        return 0
+    if op['type'] == 'Gaussian Blur':
+        k = op['params'].get('kernel_size', 5)
+        return (k + 1 if k % 2 == 0 else k) // 2
+    if op['type'] == 'Sharpen':
+        return 1
+    if op['type'] == 'Edge Detection' and op['params'].get('method', 'Sobel') == 'Sobel':
+        return 1
+    return None
+
+
+def _warp_strip(img, op, y0, y1, dsize):
+    shift = np.array([[1.0, 0, 0], [0, 1.0, -y0], [0, 0, 1.0]])
+    size = (dsize[0], y1 - y0)
+    out = warp(img, shift @ op['matrix'], size)
+    for H_after, (canvas_w, canvas_h) in op['clips']:
+        canvas = np.full((canvas_h, canvas_w), 255, dtype=np.uint8)
+        mask = warp(canvas, shift @ H_after, size, flags=cv2.INTER_NEAREST)
+        out[mask == 0] = 0
+    return out
+
+
+def _run_strip(img, op, y0, y1, dsize, out):
+    kind = op['op']
+    if kind == 'warp':
+        out[y0:y1] = _warp_strip(img, op, y0, y1, dsize)
+    elif kind == 'remap':
+        map1, map2 = build_maps(op['name'], op['params'], dsize)
+        out[y0:y1] = cv2.remap(img, map1[y0:y1], map2[y0:y1], cv2.INTER_LINEAR,
+                               borderMode=cv2.BORDER_CONSTANT)
+    elif kind == 'filter':
+        h = _halo(op)
+        top, bottom = max(0, y0 - h), min(img.shape[0], y1 + h)
+        res = run_op(img[top:bottom], op)
+        out[y0:y1] = res[y0 - top:y0 - top + (y1 - y0)]
+    else:
+        out[y0:y1] = run_op(img[y0:y1], op)
+
+
+def strip_bounds(rows, n_strips):
+    edges = np.linspace(0, rows, n_strips + 1).astype(int)
+    return [(int(a), int(b)) for a, b in zip(edges[:-1], edges[1:]) if b > a]
+
+
+def _shape3(img):
+    return (img.shape[0], img.shape[1], 1 if img.ndim == 2 else img.shape[2])
+
+
+def _prepare_output(img, op, buffers=None):
+    """Empty output array for op; remap grids are built here, once, before the strips."""
+    rows, cols, ch = out_shape(op, _shape3(img))
+    if op['op'] == 'remap':
+        build_maps(op['name'], op['params'], (cols, rows))
+    shape = (rows, cols) if ch == 1 else (rows, cols, ch)
+    if buffers is not None:
+        return buffers.get(shape, img.dtype)
+    return np.empty(shape, dtype=img.dtype)
+
+
+def run_op_parallel(img, op, pool=None, workers=None, buffers=None, out=None):
+    """Run one op as horizontal output strips on the shared pool."""
+    rows, cols, _ = out_shape(op, _shape3(img))
+    workers = workers or pool_size()
+    n_strips = min(workers * STRIPS_PER_WORKER, rows // MIN_STRIP_ROWS)
+    if n_strips < 2 or _halo(op) is None:
+        return run_op(img, op, buffers, out)
+    if out is None:
+        out = _prepare_output(img, op, buffers)
+    elif op['op'] == 'remap':
+        _prepare_output(img, op)  # builds the grids once; the array itself is dropped
+    pool = pool or shared_pool()
+    futures = [pool.submit(_run_strip, img, op, y0, y1, (cols, rows), out)
+               for y0, y1 in strip_bounds(rows, n_strips)]
+    for f in futures:
+        f.result()
+    return out
+
+
+def execute_parallel(img, ops, timings=None, buffers=None, out=None):
+    """Same as planner.execute, but large images run strip-parallel.
+
+    Called from a shared-pool thread (nested use) it runs serially, so it
+    never waits on its own pool. buffers and out are as in planner.execute.
+    """
+    if (getattr(_local, "in_pool", False) or pool_size() < 2
+            or img.shape[0] * img.shape[1] < PARALLEL_MIN_PIXELS):
+        return execute(img, ops, timings, buffers, out)
+    last = len(ops) - 1
+    for i, op in enumerate(ops):
+        t0 = time.perf_counter()
+        img = run_op_parallel(img, op, buffers=buffers, out=out if i == last else None)
+        if timings is not None:
+            timings.append((time.perf_counter() - t0) * 1000)
+    return _into(out, img)
+
+
+# ----------------------------------------
+# Tiled execution with progress / cancel
+# ----------------------------------------
+
+class Cancelled(Exception):
+    """Raised by execute_tiled when its cancel event is set."""
+
+
+def execute_tiled(img, ops, progress=None, cancel=None, tile_rows=TILE_ROWS):
+    """Execute a plan in tiles of tile_rows output rows.
+
+    progress(done, total) is called after every finished tile; cancel is a
+    threading.Event checked between tiles (raises Cancelled). Tiles run on
+    the shared pool unless it has a single worker or this is a pool thread.
+    """
+    shape, counts = _shape3(img), []
+    for op in ops:
+        rows = out_shape(op, shape)[0]
+        counts.append(1 if _halo(op) is None else max(1, -(-rows // tile_rows)))
+        shape = out_shape(op, shape)
+    total, done = sum(counts), 0
+    use_pool = pool_size() > 1 and not getattr(_local, "in_pool", False)
+
+    def tick():
+        nonlocal done
+        done += 1
+        if progress is not None:
+            progress(done, total)
+
+    def check():
+        if cancel is not None and cancel.is_set():
+            raise Cancelled()
+
+    for op, n in zip(ops, counts):
+        check()
+        if n == 1:
+            img = run_op(img, op)
+            tick()
+            continue
+        out = _prepare_output(img, op)
+        rows, cols = out.shape[:2]
+        bounds = strip_bounds(rows, n)
+        if use_pool:
+            futures = [shared_pool().submit(_run_strip, img, op, y0, y1, (cols, rows), out)
+                       for y0, y1 in bounds]
+            try:
+                for f in as_completed(futures):
+                    f.result()
+                    tick()
+                    check()
+            finally:
+                for f in futures:
+                    f.cancel()
+        else:
+            for y0, y1 in bounds:
+                check()
+                _run_strip(img, op, y0, y1, (cols, rows), out)
+                tick()
+        img = out
+    return img
@@ -0,0 +1,299 @@
+import hashlib
+import json
+import time
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+from .geometry import image_corners, perspective_from_points
+from .parallel import execute_parallel
+from .planner import (
+    color_op,
+    expand_op,
+    filter_op,
+    gray_op,
+    lut_op,
+    optimize,
+    out_shape,
+    region_op,
+    remap_op,
+    warp_op,
+)
+from .tone import compile_lut
+from .warps import NONLINEAR_WARPS
+
+# ========================================
+# PIPELINE STAGES
+# ========================================
+# Satu stage adalah dict yang hanya berisi parameter (tanpa numpy array),
+# sehingga bisa di-hash dan diserialisasi:
+#
+#   {'kind': 'transform', 'type': 'Rotation', 'params': {'angle': 30}}
+#   {'kind': 'filter', 'type': 'Gaussian Blur', 'params': {'kernel_size': 5}}
+#
+# Matriks dihitung saat eksekusi dari ukuran input stage tersebut.
+
+TRANSFORM_TYPES = ["Translation", "Scaling", "Rotation", "Shearing", "Reflection", "Perspective"]
+WARP_TYPES = list(NONLINEAR_WARPS)
+FILTER_TYPES = ["Gaussian Blur", "Sharpen", "Edge Detection", "Brightness/Contrast",
+                "Tone Curve", "Grayscale", "Colour Matrix"]
+
+
+def transform_stage(transform_type, **params):
+    return {'kind': 'transform', 'type': transform_type, 'params': params}
+
+
+def filter_stage(filter_type, **params):
+    return {'kind': 'filter', 'type': filter_type, 'params': params}
+
+
+def build_matrix(transform_type, params, shape):
+    """Matrix for a geometric stage applied to an input of shape (rows, cols, ...)."""
+    rows, cols = shape[:2]
+    p = params
+    if transform_type == "Translation":
+        return np.float64([[1, 0, p.get('tx', 0)], [0, 1, p.get('ty', 0)]])
+    if transform_type == "Scaling":
+        return np.float64([[p.get('sx', 1.0), 0, 0], [0, p.get('sy', 1.0), 0]])
+    if transform_type == "Rotation":
+        center = (0, 0) if p.get('center') == 'origin' else (cols / 2, rows / 2)
+        return cv2.getRotationMatrix2D(center, p.get('angle', 0), p.get('scale', 1.0))
+    if transform_type == "Shearing":
+        shear = p.get('shear', 0.0)
+        if p.get('axis', 'X') == 'X':
+            return np.float64([[1, shear, 0], [0, 1, 0]])
+        return np.float64([[1, 0, 0], [shear, 1, 0]])
+    if transform_type == "Reflection":
+        axis = p.get('axis', 'Vertical')
+        if axis == 'Vertical':
+            return np.float64([[-1, 0, cols], [0, 1, 0]])
+        if axis == 'Horizontal':
+            return np.float64([[1, 0, 0], [0, -1, rows]])
+        return np.float64([[-1, 0, cols], [0, -1, rows]])
+    if transform_type == "Perspective":
+        # dst / matrix are pixels of the input they were tuned on ('size' = [cols, rows]);
+        # on an input of another size the homography is rescaled to the same relative warp
+        w, h = p.get('size') or (cols, rows)
+        if 'matrix' in p:
+            H = np.asarray(p['matrix'], dtype=np.float64)
+        else:
+            H = perspective_from_points(image_corners(w, h), p['dst'])
+        if (w, h) != (cols, rows):
+            S = np.diag([cols / w, rows / h, 1.0])
+            H = S @ H @ np.linalg.inv(S)
+        return H
+    raise ValueError(f"Unknown transform: {transform_type}")
+
+
+def stage_ops(stage, shape):
+    """Planner ops implementing one stage on an input of the given shape."""
+    t, p = stage['type'], stage['params']
+    if stage['kind'] == 'transform':
+        if t in NONLINEAR_WARPS:
+            return [remap_op(t, p)]
+        return [warp_op(build_matrix(t, p, shape), _canvas_size(t, p, shape), label=t)]
+
+    if p.get('region'):
+        # Masked filter: the same ops, computed on the region's bbox only
+        inner = {k: v for k, v in p.items() if k != 'region'}
+        return [region_op(stage_ops({**stage, 'params': inner}, shape), p['region'], label=t)]
+    if t in ("Gaussian Blur", "Sharpen"):
+        return [filter_op(t, p)]
+    if t == "Edge Detection":
+        return [filter_op(t, p), expand_op()]
+    if t == "Brightness/Contrast":
+        steps = [{'type': 'Brightness/Contrast',
+                  'params': {'alpha': p.get('contrast', 1.0), 'beta': p.get('brightness', 0)}}]
+        return [lut_op(compile_lut(steps), label=t, steps=steps)]
+    if t == "Tone Curve":
+        return [lut_op(compile_lut(p.get('steps', [])), label=t, steps=p.get('steps', []))]
+    if t == "Grayscale":
+        return [gray_op(), expand_op()]
+    if t == "Colour Matrix":
+        return [color_op(p['matrix'], label=t)]
+    raise ValueError(f"Unknown filter: {t}")
+
+
+def _canvas_size(transform_type, params, shape):
+    """Output size for transforms that grow the canvas (Single mode), else None."""
+    if not params.get('resize_canvas'):
+        return None
+    rows, cols = shape[:2]
+    if transform_type == "Scaling":
+        return int(cols * params.get('sx', 1.0)), int(rows * params.get('sy', 1.0))
+    if transform_type == "Shearing":
+        shear = abs(params.get('shear', 0.0))
+        if params.get('axis', 'X') == 'X':
+            return int(cols + shear * rows), rows
+        return cols, int(rows + shear * cols)
+    return None
+
+
+def compile_stages(stages, shape):
+    """Planner ops for a list of stages, each built for its own input shape."""
+    ops = []
+    for stage in stages:
+        new_ops = stage_ops(stage, shape)
+        for op in new_ops:
+            shape = out_shape(op, shape)
+        ops.extend(new_ops)
+    return ops
+
+
+def stage_label(stage):
+    return f"{'🔷' if stage['kind'] == 'transform' else '🎨'} {stage['type']}"
+
+
+# ========================================
+# INCREMENTAL EXECUTION
+# ========================================
+# Hasil setiap segmen di-cache dengan key = hash(key upstream + parameter
+# segmen). Mengubah stage k hanya menghitung ulang dari segmen k sampai akhir.
+# Stage transform matriks yang berurutan dijadikan satu segmen supaya tetap
+# satu pass resampling; menghitung ulang segmen itu sama mahalnya dengan satu
+# warp.
+#
+# Optimizer (planner.optimize) dijalankan per segmen, jadi tidak ada fusi
+# melewati batas segmen: mis. Brightness/Contrast | Tone Curve tetap dua
+# LUT, dan Rotation | Grayscale | Rotation tetap dua warp, padahal plan utuh
+# menggabungkannya menjadi satu LUT / satu warp. Itu harga cache per stage:
+# dengan fusi lintas segmen, mengubah stage mana pun menghitung ulang
+# seluruh pipeline. Report run_pipeline menyertakan plan setiap segmen
+# untuk planner.explain.
+
+def image_key(img):
+    """Content hash of an image (shape, dtype and pixels)."""
+    h = hashlib.blake2b(digest_size=16)
+    h.update(repr((img.shape, img.dtype.str)).encode())
+    h.update(np.ascontiguousarray(img).data)
+    return h.hexdigest()
+
+
+def stage_key(stage):
+    return json.dumps(stage, sort_keys=True, default=_json_default)
+
+
+def _json_default(obj):
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    raise TypeError(f"Cannot serialise {type(obj).__name__}")
+
+
+def chain_key(upstream_key, stages):
+    h = hashlib.blake2b(digest_size=16)
+    h.update(upstream_key.encode())
+    for stage in stages:
+        h.update(stage_key(stage).encode())
+    return h.hexdigest()
+
+
+def segments(stages):
+    """Group consecutive matrix transforms; every other stage stands alone."""
+    groups = []
+    for idx, stage in enumerate(stages):
+        is_matrix = stage['kind'] == 'transform' and stage['type'] not in NONLINEAR_WARPS
+        if is_matrix and groups and groups[-1][1]:
+            groups[-1][0].append(idx)
+        else:
+            groups.append(([idx], is_matrix))
+    return [g for g, _ in groups]
+
+
+class StageCache:
+    """LRU cache of read-only intermediate results with a byte budget."""
+
+    def __init__(self, max_bytes=512 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._items = OrderedDict()
+        self.nbytes = 0
+        # Segments served from / recomputed into the cache by run_pipeline
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        img = self._items.get(key)
+        if img is not None:
+            self._items.move_to_end(key)
+        return img
+
+    def put(self, key, img):
+        if key in self._items:
+            return
+        img.setflags(write=False)
+        self._items[key] = img
+        self.nbytes += img.nbytes
+        while self.nbytes > self.max_bytes and len(self._items) > 1:
+            _, old = self._items.popitem(last=False)
+            self.nbytes -= old.nbytes
+
+    def clear(self):
+        self._items.clear()
+        self.nbytes = 0
+
+
+def segment_plans(stages, shape, groups=None):
+    """[(input shape, optimized plan)] for each segment of stages."""
+    plans = []
+    for group in groups if groups is not None else segments(stages):
+        plan = optimize(compile_stages([stages[i] for i in group], shape), shape)
+        plans.append((shape, plan))
+        for op in plan:
+            shape = out_shape(op, shape)
+    return plans
+
+
+def run_pipeline(img, stages, cache=None, source_key=None, progress=None):
+    """Run stages on img, reusing cached segment outputs.
+
+    Returns (result, report) where report has one row per segment:
+    {'stages': [...indices], 'label': str, 'cached': bool, 'ms': float,
+     'shape': input shape, 'plan': optimized ops, 'timings': per-op ms or None}.
+    progress(done, total) is called after each segment.
+    """
+    if source_key is None:
+        source_key = image_key(img)
+    groups = segments(stages)
+    # Plans are cheap to build, so cached segments get one too (estimates only)
+    plans = segment_plans(stages, _shape3(img), groups)
+
+    # Keys for every segment end, then the last one already in the cache
+    keys = []
+    key = source_key
+    for group in groups:
+        key = chain_key(key, [stages[i] for i in group])
+        keys.append(key)
+
+    start, current = 0, img
+    if cache is not None:
+        for g in range(len(groups) - 1, -1, -1):
+            hit = cache.get(keys[g])
+            if hit is not None:
+                start, current = g + 1, hit
+                break
+
+    if cache is not None:
+        cache.hits += start
+        cache.misses += len(groups) - start
+
+    report = [{'stages': group, 'label': " + ".join(stages[i]['type'] for i in group),
+               'cached': g < start, 'ms': 0.0, 'shape': plans[g][0], 'plan': plans[g][1], 'timings': None}
+              for g, group in enumerate(groups)]
+
+    for g in range(start, len(groups)):
+        t0 = time.perf_counter()
+        timings = report[g]['timings'] = []
+        current = execute_parallel(current, plans[g][1], timings)
+        report[g]['ms'] = (time.perf_counter() - t0) * 1000
+        if cache is not None:
+            cache.put(keys[g], current)
+        if progress is not None:
+            progress(g + 1, len(groups))
+
+    return current, report
+
+
+def _shape3(img):
+    return (img.shape[0], img.shape[1], 1 if img.ndim == 2 else img.shape[2])
@@ -0,0 +1,474 @@
+import time
+
+import cv2
+import numpy as np
+
+from .color import apply_color_matrix, compose_color
+from .geometry import compose, is_affine, normalize, transform_points, warp
+from .tone import apply_lut, apply_tone_float, compose_luts
+from .warps import nonlinear_warp
+
+# ========================================
+# PIPELINE PLANNER
+# ========================================
+# Sebuah plan adalah list op (dict) yang dieksekusi berurutan. Planner
+# mengubah plan "naive" menjadi plan yang lebih murah dengan hasil yang sama
+# atau hampir sama (lihat catatan akurasi di bawah):
+#
+# - op grayscale (3 → 1 channel) dipindah ke depan melewati op linear yang
+#   seragam per channel (warp, remap, Gaussian blur), sehingga resampling
+#   hanya bekerja pada 1 channel;
+# - op expand (1 → 3 channel) ditunda sampai akhir, atau sampai op yang
+#   butuh 3 channel;
+# - warp berurutan digabung menjadi satu homografi (dengan mask jika canvas
+#   perantara memotong gambar), LUT berurutan menjadi satu LUT, colour matrix
+#   berurutan menjadi satu matrix;
+# - point op (LUT / colour matrix) dipindah ke sisi warp yang jumlah
+#   pixelnya lebih kecil, hanya jika pertukaran itu eksak.
+#
+# Akurasi: pemindahan LUT / colour matrix / grayscale identik dengan plan
+# naive (paling banyak ±1 pembulatan). Warp yang digabung TIDAK identik:
+# resampling dan clipping perantara hilang, jadi hasilnya satu interpolasi,
+# bukan beberapa. Pada gambar halus selisih rata-rata sekitar 0.5-1.6
+# (p99 beberapa level), lebih besar jika diikuti Sharpen (~2-3), dan di
+# tepi canvas pixel tunggal bisa berbeda sampai >100. Pada noise putih
+# selisihnya jauh lebih besar karena dua interpolasi lebih mengaburkan.
+# tests/test_planner.py menjaga batas ini.
+
+# Rough single-core cost per output pixel in nanoseconds, as
+# (fixed, per channel). Measured on 1600×1200 uint8 images.
+COST_NS = {
+    'warp': (1.0, 3.0),
+    'remap': (6.2, 1.7),
+    'color': (0.0, 0.2),
+    'lut': (0.0, 0.2),         # uniform table; per-channel tables cost 1.2
+    'gray': (0.5, 0.0),
+    'expand': (0.2, 0.0),
+    'gaussian': (0.0, 0.16),   # per kernel tap
+    'sharpen': (0.0, 0.75),
+    'sobel': (12.0, 0.5),
+    'canny': (22.0, 0.5),
+}
+
+
+# ----------------------------------------
+# Op constructors
+# ----------------------------------------
+
+def warp_op(M, dsize=None, label="Warp", clips=()):
+    """Geometric warp; dsize=None keeps the input size.
+
+    clips lists (H_after, canvas_size) pairs for intermediate canvases that a
+    fused warp must still crop to: output pixels that H_after maps from
+    outside the canvas are set to 0, as the separate warps would have.
+    """
+    return {'op': 'warp', 'matrix': normalize(M), 'dsize': dsize, 'label': label,
+            'clips': list(clips)}
+
+
+def remap_op(name, params):
+    return {'op': 'remap', 'name': name, 'params': dict(params), 'label': name}
+
+
+def color_op(M, label="Colour Matrix"):
+    M = np.asarray(M, dtype=np.float64)
+    if M.shape == (3, 3):
+        M = np.hstack([M, np.zeros((3, 1))])
+    return {'op': 'color', 'matrix': M, 'label': label}
+
+
+def lut_op(lut, label="Tone", steps=None):
+    """Tone table; steps (if given) are the tone steps it was compiled from,
+    used to evaluate the op exactly on float working images."""
+    return {'op': 'lut', 'lut': np.asarray(lut, dtype=np.uint8).reshape(256, 1, -1), 'label': label,
+            'steps': None if steps is None else list(steps)}
+
+
+def gray_op():
+    return {'op': 'gray', 'label': "Grayscale"}
+
+
+def expand_op():
+    return {'op': 'expand', 'label': "Gray → RGB"}
+
+
+def filter_op(filter_type, params):
+    return {'op': 'filter', 'type': filter_type, 'params': dict(params), 'label': filter_type}
+
+
+def region_op(ops, region, label="Region"):
+    """Run ops only inside region (see engine.region) and blend them back in."""
+    return {'op': 'region', 'ops': list(ops), 'region': dict(region), 'label': f"{label} (region)"}
+
+
+# ----------------------------------------
+# Op properties
+# ----------------------------------------
+
+def _is_geometric(op):
+    return op['op'] in ('warp', 'remap')
+
+
+def _is_gaussian(op):
+    return op['op'] == 'filter' and op['type'] == 'Gaussian Blur'
+
+
+def _channel_agnostic(op):
+    """Ops that treat every channel identically (commute exactly with expand)."""
+    if op['op'] in ('warp', 'remap'):
+        return True
+    if op['op'] == 'lut':
+        return _uniform_lut(op['lut'])
+    if op['op'] == 'filter':
+        return op['type'] in ('Gaussian Blur', 'Sharpen')
+    return False
+
+
+def _uniform_lut(lut):
+    lut = lut.reshape(256, -1)
+    return bool((lut == lut[:, :1]).all())
+
+
+def _color_nonclipping(M):
+    """True when M maps every RGB value in [0, 255]³ inside [0, 255] (no saturation)."""
+    lin, offset = M[:, :3], M[:, 3]
+    lo = np.where(lin < 0, lin, 0).sum(axis=1) * 255 + offset
+    hi = np.where(lin > 0, lin, 0).sum(axis=1) * 255 + offset
+    return bool((lo >= -1e-9).all() and (hi <= 255 + 1e-9).all())
+
+
+def _pixel_exact(op):
+    """Warp that only copies pixels (integer shifts, flips, 90° turns)."""
+    if op['op'] != 'warp' or not is_affine(op['matrix']):
+        return False
+    A = op['matrix'][:2]
+    lin, t = A[:, :2], A[:, 2]
+    is_perm = np.allclose(np.abs(lin).sum(axis=0), 1) and np.allclose(np.abs(lin).sum(axis=1), 1)
+    return bool(is_perm and np.allclose(lin, np.round(lin)) and np.allclose(t, np.round(t)))
+
+
+def _commutes_with_geometry(point_op, geom_op):
+    """Point op ↔ warp swaps that keep the result exact (up to uint8 rounding)."""
+    if point_op['op'] == 'lut':
+        # Pure pixel copies commute with any LUT that keeps the black border black
+        return _pixel_exact(geom_op) and not point_op['lut'][0].any()
+    if point_op['op'] == 'color':
+        # Linear interpolation commutes with a linear colour map as long as
+        # nothing saturates and black stays black
+        M = point_op['matrix']
+        return not M[:, 3].any() and _color_nonclipping(M)
+    return False
+
+
+def out_shape(op, shape):
+    """Output (rows, cols, channels) of op for an input shape."""
+    rows, cols, ch = shape
+    kind = op['op']
+    if kind == 'warp' and op['dsize'] is not None:
+        cols, rows = op['dsize']
+    elif kind == 'gray':
+        ch = 1
+    elif kind in ('expand', 'color'):
+        ch = 3
+    elif kind == 'lut' and ch == 1 and not _uniform_lut(op['lut']):
+        ch = 3
+    elif kind == 'filter' and op['type'] == 'Edge Detection':
+        ch = 1
+    elif kind == 'region':
+        inner = (rows, cols, ch)
+        for sub in op['ops']:
+            inner = out_shape(sub, inner)
+        ch = max(ch, inner[2])
+    return rows, cols, ch
+
+
+def _shape_of(img):
+    return (img.shape[0], img.shape[1], 1 if img.ndim == 2 else img.shape[2])
+
+
+def estimate_ns(op, shape):
+    """Estimated cost of op on an input of the given shape, in nanoseconds."""
+    rows, cols, ch = out_shape(op, shape)
+    px = rows * cols
+    kind = op['op']
+    if kind == 'region':
+        from .region import region_bbox
+
+        x0, y0, x1, y1 = region_bbox(op['region'], shape)
+        inner = (max(y1 - y0, 0), max(x1 - x0, 0), shape[2])
+        cost = 0.0
+        for sub in op['ops']:
+            cost += estimate_ns(sub, inner)
+            inner = out_shape(sub, inner)
+        return cost
+    if kind == 'filter':
+        if op['type'] == 'Gaussian Blur':
+            fixed, per_ch = COST_NS['gaussian']
+            return per_ch * op['params'].get('kernel_size', 5) * px * ch
+        if op['type'] == 'Sharpen':
+            kind = 'sharpen'
+        else:
+            kind = 'sobel' if op['params'].get('method', 'Sobel') == 'Sobel' else 'canny'
+            ch = shape[2]
+    fixed, per_ch = COST_NS[kind]
+    if kind == 'lut' and not _uniform_lut(op['lut']):
+        per_ch = 1.2
+    cost = (fixed + per_ch * ch) * px
+    if kind == 'warp':
+        # Each intermediate-canvas crop is a nearest-neighbour mask warp
+        cost += len(op['clips']) * sum(COST_NS['warp']) * px
+    return cost
+
+
+# ========================================
+# EXECUTION
+# ========================================
+
+def _dst(img, op, buffers):
+    """Reusable output array for op from a BufferPool, or None."""
+    if buffers is None:
+        return None
+    rows, cols, ch = out_shape(op, _shape_of(img))
+    return buffers.get((rows, cols) if ch == 1 else (rows, cols, ch), img.dtype)
+
+
+def run_op(img, op, buffers=None, out=None):
+    """Run one op; with a BufferPool the OpenCV calls write into pooled dst arrays.
+
+    out, if given, is used as the dst instead; ops that cannot write in place
+    (region, Canny, Sobel, float tone) still return a new array.
+    """
+    kind = op['op']
+    dst = out if out is not None else _dst(img, op, buffers)
+    if kind == 'warp':
+        rows, cols = img.shape[:2]
+        dsize = op['dsize'] or (cols, rows)
+        out = warp(img, op['matrix'], dsize, dst=dst)
+        for H_after, (canvas_w, canvas_h) in op['clips']:
+            canvas = np.full((canvas_h, canvas_w), 255, dtype=np.uint8)
+            mask = warp(canvas, H_after, dsize, flags=cv2.INTER_NEAREST)
+            out[mask == 0] = 0
+        return out
+    if kind == 'remap':
+        return nonlinear_warp(img, op['name'], op['params'], dst=dst)
+    if kind == 'color':
+        if img.ndim == 2:
+            img = cv2.cvtColor(img, cv2.COLOR_GRAY2RGB)
+        return apply_color_matrix(img, op['matrix'], dst=dst)
+    if kind == 'lut':
+        if img.ndim == 2 and not _uniform_lut(op['lut']):
+            img = cv2.cvtColor(img, cv2.COLOR_GRAY2RGB)
+        if img.dtype != np.uint8:
+            if op.get('steps') is None:
+                raise ValueError(f"{op['label']}: tone table without steps needs a uint8 image")
+            return apply_tone_float(img.copy(), op['steps'])
+        return apply_lut(img, op['lut'], dst=dst)
+    if kind == 'gray':
+        return img if img.ndim == 2 else cv2.cvtColor(img, cv2.COLOR_RGB2GRAY, dst=dst)
+    if kind == 'expand':
+        return img if img.ndim == 3 else cv2.cvtColor(img, cv2.COLOR_GRAY2RGB, dst=dst)
+    if kind == 'region':
+        from .region import apply_region
+
+        return apply_region(img, op['ops'], op['region'])
+    return _run_filter(img, op['type'], op['params'], dst)
+
+
+def _run_filter(img, filter_type, params, dst=None):
+    if filter_type == 'Gaussian Blur':
+        k = params.get('kernel_size', 5)
+        k = k + 1 if k % 2 == 0 else k
+        return cv2.GaussianBlur(img, (k, k), 0, dst=dst)
+    if filter_type == 'Sharpen':
+        kernel = np.array([[0, -1, 0], [-1, 5, -1], [0, -1, 0]]) * params.get('strength', 1.0)
+        return cv2.filter2D(img, -1, kernel, dst=dst)
+    if filter_type == 'Edge Detection':
+        gray = img if img.ndim == 2 else cv2.cvtColor(img, cv2.COLOR_RGB2GRAY)
+        if params.get('method', 'Sobel') == 'Sobel':
+            sobelx = cv2.Sobel(gray, cv2.CV_64F, 1, 0, ksize=3)
+            sobely = cv2.Sobel(gray, cv2.CV_64F, 0, 1, ksize=3)
+            magnitude = np.sqrt(sobelx**2 + sobely**2)
+            return np.uint8(magnitude) if img.dtype == np.uint8 else magnitude.astype(img.dtype)
+        if gray.dtype != np.uint8:
+            # Canny is defined on uint8 only; its output is 0 / 255 anyway
+            edges = cv2.Canny(np.clip(gray, 0, 255).astype(np.uint8),
+                              params.get('threshold1', 100), params.get('threshold2', 200))
+            return edges.astype(gray.dtype)
+        return cv2.Canny(gray, params.get('threshold1', 100), params.get('threshold2', 200))
+    raise ValueError(f"Unknown filter: {filter_type}")
+
+
+def execute(img, ops, timings=None, buffers=None, out=None):
+    """Run a plan; if timings is a list, per-op wall time (ms) is appended to it.
+
+    buffers is an optional BufferPool supplying the output arrays; an
+    intermediate result is reused as soon as the next op has consumed it.
+    out, if given, receives the final result (written by the last op
+    directly when it can) and is returned.
+    """
+    last = len(ops) - 1
+    for i, op in enumerate(ops):
+        t0 = time.perf_counter()
+        img = run_op(img, op, buffers, out if i == last else None)
+        if timings is not None:
+            timings.append((time.perf_counter() - t0) * 1000)
+    return _into(out, img)
+
+
+def _into(out, img):
+    """img copied into out (when out is given and img is not already it)."""
+    if out is None or img is out:
+        return img
+    np.copyto(out, img.reshape(out.shape))
+    return out
+
+
+# ========================================
+# OPTIMIZER
+# ========================================
+
+def _content_fits(op, shape):
+    """True when warping an input of this shape keeps all of it on the canvas."""
+    rows, cols = shape[:2]
+    out_rows, out_cols, _ = out_shape(op, shape)
+    corners = np.float64([[0, 0], [cols - 1, 0], [cols - 1, rows - 1], [0, rows - 1]])
+    H = op['matrix']
+    w = np.hstack([corners, np.ones((4, 1))]) @ H[2]
+    if (w <= 0).any():
+        return False
+    pts = transform_points(H, corners)
+    eps = 1e-6
+    return bool((pts >= -eps).all() and (pts[:, 0] <= out_cols - 1 + eps).all()
+                and (pts[:, 1] <= out_rows - 1 + eps).all())
+
+
+def _fuse(a, b, shape):
+    """Single op equivalent to a followed by b (a sees an input of `shape`), or None."""
+    if a['op'] == 'warp' and b['op'] == 'warp':
+        # Crops a's canvas already required now happen after b as well
+        clips = [(compose([H_after, b['matrix']]), size) for H_after, size in a['clips']]
+        if a['clips'] or not _content_fits(a, shape):
+            canvas_rows, canvas_cols, _ = out_shape(a, shape)
+            clips.append((b['matrix'], (canvas_cols, canvas_rows)))
+        return warp_op(compose([a['matrix'], b['matrix']]), b['dsize'] or a['dsize'],
+                       f"{a['label']} + {b['label']}", clips)
+    if a['op'] == 'lut' and b['op'] == 'lut':
+        steps = None
+        if a.get('steps') is not None and b.get('steps') is not None:
+            steps = a['steps'] + b['steps']
+        return lut_op(compose_luts(a['lut'], b['lut']), f"{a['label']} + {b['label']}", steps)
+    if a['op'] == 'color' and b['op'] == 'color' and _color_nonclipping(a['matrix']):
+        return color_op(compose_color([a['matrix'], b['matrix']]), f"{a['label']} + {b['label']}")
+    return None
+
+
+def _should_swap(a, b, shape, nxt=None):
+    """True when running b before a is cheaper and gives the same result.
+
+    nxt is the op after b (if any): a point op is also moved across a
+    same-size warp when that makes it adjacent to an op it can fuse with.
+    """
+    # Hoist grayscale ahead of channel-uniform linear ops
+    if b['op'] == 'gray' and (_is_geometric(a) or _is_gaussian(a)):
+        return True
+    # Sink gray → RGB expansion past ops that treat channels identically
+    if a['op'] == 'expand' and _channel_agnostic(b):
+        return True
+    # Point op across a warp: keep it on the side with fewer pixels
+    if a['op'] in ('lut', 'color') and b['op'] == 'warp' and _commutes_with_geometry(a, b):
+        rows_in, cols_in, _ = shape
+        rows_out, cols_out, _ = out_shape(b, shape)
+        if rows_out * cols_out == rows_in * cols_in and nxt is not None:
+            return nxt['op'] == a['op']
+        return rows_out * cols_out < rows_in * cols_in
+    if a['op'] == 'warp' and b['op'] in ('lut', 'color') and _commutes_with_geometry(b, a):
+        rows_out, cols_out, _ = out_shape(a, shape)
+        return rows_out * cols_out > shape[0] * shape[1]
+    return False
+
+
+def optimize(ops, shape, max_passes=50):
+    """Return an equivalent, cheaper plan for an input of the given shape."""
+    ops = [dict(op) for op in ops]
+    for _ in range(max_passes):
+        changed = False
+        i = 0
+        cur_shape = shape
+        while i < len(ops) - 1:
+            a, b = ops[i], ops[i + 1]
+            # gray(expand(x)) == x
+            if a['op'] == 'expand' and b['op'] == 'gray':
+                del ops[i:i + 2]
+                changed = True
+                continue
+            fused = _fuse(a, b, cur_shape)
+            if fused is not None:
+                ops[i:i + 2] = [fused]
+                changed = True
+                continue
+            nxt = ops[i + 2] if i + 2 < len(ops) else None
+            if _should_swap(a, b, cur_shape, nxt):
+                ops[i:i + 2] = [b, a]
+                changed = True
+            cur_shape = out_shape(ops[i], cur_shape)
+            i += 1
+        # Redundant trailing work: gray on a 1-channel image, expand on 3 channels
+        cur_shape = shape
+        kept = []
+        for op in ops:
+            if (op['op'] == 'gray' and cur_shape[2] == 1) or (op['op'] == 'expand' and cur_shape[2] == 3):
+                changed = True
+                continue
+            kept.append(op)
+            cur_shape = out_shape(op, cur_shape)
+        ops = kept
+        if not changed:
+            break
+    return ops
+
+
+# ========================================
+# REPORTING
+# ========================================
+
+def plan_cost(ops, shape):
+    """Per-op (label, in_shape, out_shape, estimated ms) rows."""
+    rows = []
+    for op in ops:
+        nxt = out_shape(op, shape)
+        rows.append((op['label'], shape, nxt, estimate_ns(op, shape) / 1e6))
+        shape = nxt
+    return rows
+
+
+def explain(ops, shape, timings=None, title="Plan"):
+    """Plain-text table of a plan with estimated (and, if given, actual) cost."""
+    def fmt(s):
+        return f"{s[1]}×{s[0]}×{s[2]}"
+
+    lines = [f"{title}", f"{'#':>2}  {'op':<32} {'in → out':<28} {'est ms':>8} {'actual ms':>10}"]
+    total_est = total_act = 0.0
+    for idx, (label, s_in, s_out, est) in enumerate(plan_cost(ops, shape)):
+        act = timings[idx] if timings is not None and idx < len(timings) else None
+        total_est += est
+        total_act += act or 0.0
+        act_txt = f"{act:10.2f}" if act is not None else f"{'-':>10}"
+        lines.append(f"{idx + 1:>2}  {label[:32]:<32} {fmt(s_in) + ' → ' + fmt(s_out):<28} {est:8.2f} {act_txt}")
+    act_total = f"{total_act:10.2f}" if timings is not None else f"{'-':>10}"
+    lines.append(f"{'':>2}  {'total':<32} {'':<28} {total_est:8.2f} {act_total}")
+    return "\n".join(lines)
+
+
+def run_optimized(img, ops, report=False):
+    """Optimize and execute a plan; with report=True also return the explain text."""
+    shape = _shape_of(img)
+    plan = optimize(ops, shape)
+    timings = []
+    result = execute(img, plan, timings)
+    if not report:
+        return result
+    text = "\n\n".join([
+        explain(ops, shape, title="Naive plan"),
+        explain(plan, shape, timings, title="Optimized plan"),
+    ])
+    return result, text
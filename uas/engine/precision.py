@@ -0,0 +1,128 @@
+import cv2
+import numpy as np
+
+from .geometry import warp
+from .planner import out_shape, run_op
+from .tone import apply_tone_float
+from .warps import build_maps
+
+# ========================================
+# FLOAT32 WORKING BUFFER
+# ========================================
+# Mode presisi tinggi: gambar kerja disimpan sebagai float32 (skala 0..255)
+# dan setiap langkah diterapkan pada buffer itu. Nilai tidak di-clip atau
+# dibulatkan di antara langkah, jadi misalnya Brightness lalu Contrast, atau
+# Sharpen lalu Blur, tidak kehilangan presisi. Konversi ke uint8 hanya
+# dilakukan saat gambar ditampilkan atau diekspor.
+#
+# Memori: dua buffer float32 seukuran gambar (buffer kerja + cadangan),
+# yaitu 8 byte per sample dibanding 1 byte untuk uint8. Op point (tone)
+# ditulis langsung ke buffer kerja; op lain menulis ke buffer cadangan
+# (dst=...) lalu kedua buffer ditukar, sehingga langkah yang tidak mengubah
+# ukuran tidak mengalokasikan array baru.
+#
+# version naik setiap kali isi buffer berubah (reset/apply), jadi hasil
+# konversi untuk ekspor bisa di-cache per versi.
+
+BUFFERS = 2
+
+
+def buffer_bytes(shape):
+    """Memory used by the float32 working buffers for an image of this shape."""
+    rows, cols = shape[:2]
+    ch = shape[2] if len(shape) > 2 else 1
+    return BUFFERS * rows * cols * ch * np.dtype(np.float32).itemsize
+
+
+def _array_shape(shape):
+    rows, cols, ch = shape
+    return (rows, cols) if ch == 1 else (rows, cols, ch)
+
+
+class WorkBuffer:
+    """float32 working image that planner ops are applied to in place."""
+
+    def __init__(self, img):
+        self.image = img.astype(np.float32)
+        self._spare = None
+        self.version = 0
+
+    @property
+    def shape(self):
+        a = self.image
+        return (a.shape[0], a.shape[1], 1 if a.ndim == 2 else a.shape[2])
+
+    @property
+    def nbytes(self):
+        return self.image.nbytes + (self._spare.nbytes if self._spare is not None else 0)
+
+    def reset(self, img):
+        """Start over from img, keeping the buffers when the shape allows."""
+        self.version += 1
+        if self.image.shape == img.shape:
+            self.image[...] = img
+        else:
+            self.image, self._spare = img.astype(np.float32), None
+        return self
+
+    def _take_spare(self, shape):
+        spare, self._spare = self._spare, None
+        if spare is None or spare.shape != shape:
+            spare = np.empty(shape, dtype=np.float32)
+        return spare
+
+    def _run(self, op, dst):
+        src = self.image
+        kind = op['op']
+        if kind == 'warp' and not op['clips']:
+            rows, cols = src.shape[:2]
+            return warp(src, op['matrix'], op['dsize'] or (cols, rows), dst=dst)
+        if kind == 'remap':
+            rows, cols = dst.shape[:2]
+            map1, map2 = build_maps(op['name'], op['params'], (cols, rows))
+            return cv2.remap(src, map1, map2, cv2.INTER_LINEAR, dst=dst, borderMode=cv2.BORDER_CONSTANT)
+        if kind == 'color' and src.ndim == 3:
+            return cv2.transform(src, op['matrix'].astype(np.float32), dst=dst)
+        if kind == 'filter' and op['type'] == 'Gaussian Blur':
+            k = op['params'].get('kernel_size', 5)
+            k = k + 1 if k % 2 == 0 else k
+            return cv2.GaussianBlur(src, (k, k), 0, dst=dst)
+        if kind == 'filter' and op['type'] == 'Sharpen':
+            kernel = np.array([[0, -1, 0], [-1, 5, -1], [0, -1, 0]]) * op['params'].get('strength', 1.0)
+            return cv2.filter2D(src, -1, kernel, dst=dst)
+        return run_op(src, op)
+
+    def apply(self, ops):
+        """Run a plan on the buffer; nothing is rounded or clipped between ops."""
+        self.version += 1
+        for op in ops:
+            src = self.image
+            if op['op'] == 'lut' and op.get('steps') is not None and out_shape(op, self.shape) == self.shape:
+                apply_tone_float(src, op['steps'])
+                continue
+            dst = self._take_spare(_array_shape(out_shape(op, self.shape)))
+            out = self._run(op, dst)
+            if out is not dst:
+                self._spare = dst
+                out = out.astype(np.float32, copy=False)
+            elif src.shape == dst.shape:
+                self._spare = src
+            self.image = out
+        return self
+
+    def to_uint8(self):
+        """Rounded, saturated uint8 copy for display and export."""
+        scratch = self._take_spare(self.image.shape)
+        np.clip(self.image, 0, 255, out=scratch)
+        out = cv2.convertScaleAbs(scratch)
+        self._spare = scratch
+        return out
+
+    def to_uint16(self):
+        """16-bit copy (0..65535) for export without 8-bit quantisation."""
+        scratch = self._take_spare(self.image.shape)
+        np.clip(self.image, 0, 255, out=scratch)
+        scratch *= 257
+        out = (scratch + 0.5).astype(np.uint16)
+        self._spare = scratch
+        return out
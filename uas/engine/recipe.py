@@ -0,0 +1,378 @@
+import argparse
+import inspect
+import json
+import numbers
+import os
+from datetime import datetime
+
+import cv2
+import numpy as np
+
+from .pipeline import (
+    FILTER_TYPES,
+    TRANSFORM_TYPES,
+    WARP_TYPES,
+    _json_default,
+    _shape3,
+    compile_stages,
+)
+from .parallel import execute_parallel
+from .planner import optimize, out_shape
+from .tone import TONE_OPS
+from .warps import NONLINEAR_WARPS, build_maps
+
+try:
+    import yaml
+except ImportError:  # PyYAML is optional; JSON always works
+    yaml = None
+
+# ========================================
+# RECIPES
+# ========================================
+# Recipe adalah daftar stage pipeline (lihat pipeline.py) ditambah header
+# versi, sehingga pipeline yang sudah di-tuning bisa disimpan dan dijalankan
+# ulang pada gambar lain:
+#
+#   {"format": "uas-recipe", "version": 1, "name": "...",
+#    "stages": [{"kind": "transform", "type": "Rotation", "params": {"angle": 30}}, ...]}
+#
+# Parameter Perspective (sudut 'dst' atau 'matrix') dalam pixel, disertai
+# 'size' = [cols, rows] input saat di-tuning; pada gambar berukuran lain
+# homography diskalakan sehingga warp relatifnya sama. Recipe lama tanpa
+# 'size' tetap memakai pixel absolut.
+#
+# Saat replay seluruh stage dikompilasi menjadi satu plan dan dioptimasi
+# sekali (fusi warp, LUT, colour matrix), lalu dieksekusi per gambar.
+#
+# Dari command line (di folder uas/):
+#
+#   python -m engine.recipe recipe.json gambar/*.png -o hasil/
+
+RECIPE_FORMAT = "uas-recipe"
+RECIPE_VERSION = 1
+
+_KNOWN_TYPES = {
+    'transform': set(TRANSFORM_TYPES) | set(WARP_TYPES),
+    'filter': set(FILTER_TYPES),
+}
+
+
+def make_recipe(stages, name=None):
+    """Wrap a list of stages into a versioned recipe dict (JSON-safe)."""
+    recipe = {
+        'format': RECIPE_FORMAT,
+        'version': RECIPE_VERSION,
+        'name': name or "recipe",
+        'created': datetime.now().isoformat(timespec="seconds"),
+        'stages': [{'kind': s['kind'], 'type': s['type'], 'params': s.get('params', {})}
+                   for s in stages],
+    }
+    # Round-trip through JSON so numpy scalars/arrays become plain lists/floats
+    return json.loads(json.dumps(recipe, default=_json_default))
+
+
+def session_stages(history):
+    """Stages that reproduce current_image from original_image.
+
+    Pipeline applies start again from the original image, so everything
+    before the last such entry is dropped.
+    """
+    stages = []
+    for entry in history:
+        if entry.get('from_original'):
+            stages = []
+        stages.extend(entry.get('stages', []))
+    return stages
+
+
+# ----------------------------------------
+# Parameter checks
+# ----------------------------------------
+# Recipe bisa datang dari file atau HTTP, jadi params setiap stage diperiksa
+# sebelum dikompilasi: key wajib, tipe dan rentang angka, dan key yang tidak
+# dikenal ditolak. Tanpa ini params yang salah baru gagal jauh di dalam
+# engine (KeyError, TypeError, cv2.error) tanpa menyebut stage mana.
+
+def _number(lo=None, hi=None, integer=False, lo_open=False):
+    def check(name, value):
+        if isinstance(value, bool) or not isinstance(value, numbers.Integral if integer else numbers.Real):
+            raise ValueError(f"'{name}' must be {'an integer' if integer else 'a number'}, got {value!r}")
+        if not np.isfinite(value):
+            raise ValueError(f"'{name}' must be finite")
+        if lo is not None and (value <= lo if lo_open else value < lo):
+            raise ValueError(f"'{name}' must be {'>' if lo_open else '>='} {lo}, got {value}")
+        if hi is not None and value > hi:
+            raise ValueError(f"'{name}' must be <= {hi}, got {value}")
+    return check
+
+
+def _choice(*options):
+    def check(name, value):
+        if value not in options:
+            raise ValueError(f"'{name}' must be one of {', '.join(map(repr, options))}, got {value!r}")
+    return check
+
+
+def _flag(name, value):
+    if not isinstance(value, bool):
+        raise ValueError(f"'{name}' must be true or false, got {value!r}")
+
+
+def _matrix(*shapes):
+    def check(name, value):
+        try:
+            M = np.asarray(value, dtype=np.float64)
+        except (TypeError, ValueError):
+            raise ValueError(f"'{name}' must be a numeric matrix")
+        if M.shape not in shapes:
+            raise ValueError(f"'{name}' must have shape {' or '.join(map(str, shapes))}, got {M.shape}")
+        if not np.isfinite(M).all():
+            raise ValueError(f"'{name}' must be finite")
+    return check
+
+
+def _points(min_count):
+    def check(name, value):
+        try:
+            pts = np.asarray(value, dtype=np.float64)
+        except (TypeError, ValueError):
+            pts = None
+        if pts is None or pts.ndim != 2 or pts.shape[1] != 2 or len(pts) < min_count:
+            raise ValueError(f"'{name}' must be at least {min_count} [x, y] points")
+        if not np.isfinite(pts).all():
+            raise ValueError(f"'{name}' must be finite")
+    return check
+
+
+def _size(name, value):
+    if (not isinstance(value, (list, tuple)) or len(value) != 2
+            or any(isinstance(v, bool) or not isinstance(v, numbers.Integral) or v < 1 for v in value)):
+        raise ValueError(f"'{name}' must be [cols, rows] positive integers, got {value!r}")
+
+
+def _region(name, value):
+    if not isinstance(value, dict) or not {'rect', 'polygon', 'mask'} & set(value):
+        raise ValueError(f"'{name}' must be a mapping with 'rect', 'polygon' or 'mask'")
+    if 'rect' in value:
+        _matrix((4,))(f"{name}.rect", value['rect'])
+    elif 'polygon' in value:
+        _points(3)(f"{name}.polygon", value['polygon'])
+    else:
+        if not isinstance(value['mask'], str):
+            raise ValueError(f"'{name}.mask' must be base64 PNG text")
+        _matrix((2,))(f"{name}.origin", value.get('origin'))
+    if 'feather' in value:
+        _number(0, 1000, integer=True)(f"{name}.feather", value['feather'])
+    if 'invert' in value:
+        _flag(f"{name}.invert", value['invert'])
+
+
+def _tone_steps(name, value):
+    if not isinstance(value, list):
+        raise ValueError(f"'{name}' must be a list of tone steps")
+    for j, step in enumerate(value):
+        where = f"{name}[{j}]"
+        if not isinstance(step, dict) or step.get('type') not in TONE_OPS:
+            raise ValueError(f"{where}: unknown tone step {step.get('type') if isinstance(step, dict) else step!r}")
+        channels = step.get('channels', 'RGB')
+        if not isinstance(channels, str) or not channels or set(channels) - set("RGB"):
+            raise ValueError(f"{where}: 'channels' must be letters from 'RGB'")
+        params = step.get('params', {})
+        if not isinstance(params, dict):
+            raise ValueError(f"{where}: 'params' must be a mapping")
+        # Tone functions take the values first; the rest of their signature is the params
+        sig = list(inspect.signature(TONE_OPS[step['type']]).parameters.values())[1:]
+        unknown = set(params) - {p.name for p in sig}
+        if unknown:
+            raise ValueError(f"{where}: unknown params {', '.join(sorted(unknown))}")
+        missing = [p.name for p in sig if p.default is inspect.Parameter.empty and p.name not in params]
+        if missing:
+            raise ValueError(f"{where}: missing params {', '.join(missing)}")
+        for key, v in params.items():
+            if key == 'points':
+                _points(2)(f"{where}.points", v)
+            elif key == 'gamma':
+                _number(0, lo_open=True)(f"{where}.gamma", v)
+            else:
+                _number()(f"{where}.{key}", v)
+
+
+# type -> ({param: check}, required params); 'region' is allowed on every filter
+_PARAMS = {
+    "Translation": ({'tx': _number(), 'ty': _number(), 'resize_canvas': _flag}, ()),
+    "Scaling": ({'sx': _number(0, lo_open=True), 'sy': _number(0, lo_open=True), 'resize_canvas': _flag}, ()),
+    "Rotation": ({'angle': _number(), 'scale': _number(0, lo_open=True), 'center': _choice('image', 'origin')},
+                 ()),
+    "Shearing": ({'shear': _number(), 'axis': _choice('X', 'Y'), 'resize_canvas': _flag}, ()),
+    "Reflection": ({'axis': _choice('Vertical', 'Horizontal', 'Both')}, ()),
+    "Perspective": ({'dst': _matrix((4, 2)), 'matrix': _matrix((3, 3)), 'size': _size}, ()),
+    **{name: ({k: _number() for k in defaults}, tuple(defaults)) for name, defaults in NONLINEAR_WARPS.items()},
+    "Gaussian Blur": ({'kernel_size': _number(1, 255, integer=True)}, ()),
+    "Sharpen": ({'strength': _number(0)}, ()),
+    "Edge Detection": ({'method': _choice('Sobel', 'Canny'), 'threshold1': _number(0),
+                        'threshold2': _number(0)}, ()),
+    "Brightness/Contrast": ({'brightness': _number(), 'contrast': _number(0)}, ()),
+    "Tone Curve": ({'steps': _tone_steps}, ()),
+    "Grayscale": ({}, ()),
+    "Colour Matrix": ({'matrix': _matrix((3, 3), (3, 4))}, ('matrix',)),
+}
+
+
+def validate_params(stage_type, params, kind='transform'):
+    """Check one stage's params; raises ValueError naming the offending param."""
+    checks, required = _PARAMS[stage_type]
+    if kind == 'filter':
+        checks = {**checks, 'region': _region}
+    unknown = set(params) - set(checks)
+    if unknown:
+        raise ValueError(f"unknown params {', '.join(sorted(map(str, unknown)))} for {stage_type}")
+    missing = [k for k in required if k not in params]
+    if stage_type == "Perspective" and not {'dst', 'matrix'} & set(params):
+        missing.append("'dst' or 'matrix'")
+    if missing:
+        raise ValueError(f"missing params {', '.join(missing)} for {stage_type}")
+    for key, value in params.items():
+        checks[key](key, value)
+    if stage_type == "Perspective" and 'matrix' not in params:
+        # Degenerate corners (three collinear) have no homography
+        pts = np.asarray(params['dst'], dtype=np.float64)
+        for a in range(4):
+            p, q, r = pts[a], pts[(a + 1) % 4], pts[(a + 2) % 4]
+            if abs((q[0] - p[0]) * (r[1] - p[1]) - (q[1] - p[1]) * (r[0] - p[0])) < 1e-9:
+                raise ValueError("'dst' corners must not have three points on one line")
+
+
+def validate_recipe(recipe):
+    """Check a loaded recipe and return it; raises ValueError when invalid."""
+    if not isinstance(recipe, dict) or recipe.get('format') != RECIPE_FORMAT:
+        raise ValueError("Not a recipe file")
+    version = recipe.get('version')
+    if type(version) is not int or not 1 <= version <= RECIPE_VERSION:
+        raise ValueError(f"Unsupported recipe version: {version}")
+    stages = recipe.get('stages')
+    if not isinstance(stages, list):
+        raise ValueError("Recipe has no 'stages' list")
+    for i, stage in enumerate(stages):
+        if not isinstance(stage, dict):
+            raise ValueError(f"Stage {i + 1} is not a mapping")
+        kind, stage_type = stage.get('kind'), stage.get('type')
+        if kind not in _KNOWN_TYPES:
+            raise ValueError(f"Stage {i + 1}: unknown kind {kind!r}")
+        if stage_type not in _KNOWN_TYPES[kind]:
+            raise ValueError(f"Stage {i + 1}: unknown {kind} {stage_type!r}")
+        if not isinstance(stage.get('params', {}), dict):
+            raise ValueError(f"Stage {i + 1}: 'params' must be a mapping")
+        stage.setdefault('params', {})
+        try:
+            validate_params(stage_type, stage['params'], kind)
+        except ValueError as e:
+            raise ValueError(f"Stage {i + 1} ({stage_type}): {e}") from None
+    return recipe
+
+
+def dumps_recipe(recipe, fmt="json"):
+    if fmt == "yaml":
+        if yaml is None:
+            raise RuntimeError("PyYAML is not installed")
+        return yaml.safe_dump(recipe, sort_keys=False)
+    return json.dumps(recipe, indent=2)
+
+
+def loads_recipe(text):
+    """Parse a JSON or YAML recipe and validate it."""
+    if isinstance(text, bytes):
+        text = text.decode("utf-8")
+    try:
+        recipe = json.loads(text)
+    except json.JSONDecodeError:
+        if yaml is None:
+            raise ValueError("Recipe is not valid JSON (install PyYAML for YAML recipes)")
+        try:
+            recipe = yaml.safe_load(text)
+        except yaml.YAMLError as e:
+            raise ValueError(f"Recipe is neither JSON nor YAML: {e}")
+    return validate_recipe(recipe)
+
+
+def load_recipe(path):
+    with open(path, encoding="utf-8") as f:
+        return loads_recipe(f.read())
+
+
+# ========================================
+# REPLAY
+# ========================================
+
+class RecipeRunner:
+    """Replays a recipe; optimized plans are built once per input shape."""
+
+    def __init__(self, recipe):
+        self.recipe = validate_recipe(recipe)
+        self._plans = {}
+
+    def plan(self, shape):
+        plan = self._plans.get(shape)
+        if plan is None:
+            ops = compile_stages(self.recipe['stages'], shape)
+            plan = self._plans[shape] = optimize(ops, shape)
+        return plan
+
+    def prepare(self, shape):
+        """Build the plan and every remap grid it needs ahead of the first image."""
+        plan = self.plan(shape)
+        for op in plan:
+            if op['op'] == 'remap':
+                build_maps(op['name'], op['params'], (shape[1], shape[0]))
+            shape = out_shape(op, shape)
+        return plan
+
+    def __call__(self, img, out=None):
+        """Run the recipe on img; out, if given, receives the result (see planner.execute)."""
+        return execute_parallel(img, self.plan(_shape3(img)), out=out)
+
+
+def apply_recipe(img, recipe):
+    """Apply every stage of a recipe to an RGB image in one optimized plan."""
+    return RecipeRunner(recipe)(img)
+
+
+def replay_batch(paths, recipe, out_dir=None, suffix="_recipe"):
+    """Apply a recipe to image files; yields (path, result) for each.
+
+    Files are read/written with OpenCV (BGR) and converted so the recipe
+    always sees RGB, as in the Streamlit app. With out_dir set, results are
+    written there as PNG and the output path is yielded instead.
+    """
+    runner = RecipeRunner(recipe)
+    if out_dir:
+        os.makedirs(out_dir, exist_ok=True)
+    for path in paths:
+        img = cv2.imread(path, cv2.IMREAD_COLOR)
+        if img is None:
+            raise ValueError(f"Cannot read image: {path}")
+        result = runner(cv2.cvtColor(img, cv2.COLOR_BGR2RGB))
+        if not out_dir:
+            yield path, result
+            continue
+        stem = os.path.splitext(os.path.basename(path))[0]
+        out_path = os.path.join(out_dir, f"{stem}{suffix}.png")
+        if result.ndim == 3:
+            result = cv2.cvtColor(result, cv2.COLOR_RGB2BGR)
+        cv2.imwrite(out_path, np.ascontiguousarray(result))
+        yield path, out_path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay a transform recipe on images.")
+    parser.add_argument("recipe", help="recipe file (.json / .yaml)")
+    parser.add_argument("images", nargs="+", help="input image files")
+    parser.add_argument("-o", "--out-dir", default="recipe_out", help="output directory")
+    args = parser.parse_args(argv)
+
+    recipe = load_recipe(args.recipe)
+    for src, dst in replay_batch(args.images, recipe, args.out_dir):
+        print(f"{src} -> {dst}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+import base64
+
+import cv2
+import numpy as np
+
+from .parallel import _halo
+from .planner import execute
+from .roi import output_shape
+
+# ========================================
+# REGION-RESTRICTED FILTERS
+# ========================================
+# Filter hanya diterapkan di dalam sebuah region (persegi panjang, poligon,
+# atau mask yang di-upload), lalu hasilnya di-blend kembali ke gambar.
+#
+# Filter dihitung hanya pada bounding box region yang diperlebar dengan halo
+# kernel (jumlah radius semua op di dalamnya), sehingga biaya sebanding
+# dengan luas region, bukan luas gambar. Canny butuh seluruh gambar karena
+# hysteresis-nya global.
+#
+# Region adalah dict yang bisa diserialisasi ke JSON (jadi ikut tersimpan
+# di history dan recipe), dalam koordinat pixel gambar input:
+#   {'rect': [x0, y0, x1, y1]}
+#   {'polygon': [[x, y], ...]}
+#   {'mask': <PNG base64>, 'origin': [x0, y0]}
+# ditambah 'feather' opsional (radius tepi lembut, pixel) dan 'invert'
+# opsional (filter di luar region; bounding box = seluruh gambar).
+# Koordinat dari JSON/YAML bisa berupa float (1.0); semuanya dibulatkan ke
+# pixel terdekat sebelum dipakai untuk slicing.
+
+
+def rect_region(x0, y0, x1, y1, feather=0):
+    return {'rect': [int(x0), int(y0), int(x1), int(y1)], 'feather': int(feather)}
+
+
+def polygon_region(points, feather=0):
+    return {'polygon': [[int(x), int(y)] for x, y in points], 'feather': int(feather)}
+
+
+def mask_region(mask, feather=0):
+    """Region from a full-size mask (> 127 = inside), stored cropped to its bbox as PNG."""
+    if mask.ndim == 3:
+        mask = cv2.cvtColor(mask, cv2.COLOR_RGB2GRAY)
+    inside = np.uint8(mask > 127) * 255
+    points = cv2.findNonZero(inside)
+    if points is None:
+        raise ValueError("Mask is empty")
+    x, y, w, h = cv2.boundingRect(points)
+    _, png = cv2.imencode(".png", inside[y:y + h, x:x + w])
+    return {'mask': base64.b64encode(png.tobytes()).decode("ascii"), 'origin': [x, y],
+            'feather': int(feather)}
+
+
+def _pixels(values):
+    return [int(round(v)) for v in values]
+
+
+def _polygon(region):
+    return np.int32(np.rint(np.asarray(region['polygon'], dtype=np.float64)))
+
+
+def _clip(rect, cols, rows):
+    x0, y0, x1, y1 = rect
+    return (max(0, min(x0, cols)), max(0, min(y0, rows)),
+            max(0, min(x1, cols)), max(0, min(y1, rows)))
+
+
+def _decode_mask(region):
+    data = np.frombuffer(base64.b64decode(region['mask']), dtype=np.uint8)
+    return cv2.imdecode(data, cv2.IMREAD_GRAYSCALE)
+
+
+def _outline(region):
+    """Unclipped bbox (x0, y0, x1, y1) of the region itself."""
+    if 'rect' in region:
+        x0, y0, x1, y1 = _pixels(region['rect'])
+        return min(x0, x1), min(y0, y1), max(x0, x1), max(y0, y1)
+    if 'polygon' in region:
+        pts = _polygon(region)
+        return int(pts[:, 0].min()), int(pts[:, 1].min()), int(pts[:, 0].max()) + 1, int(pts[:, 1].max()) + 1
+    x, y = _pixels(region['origin'])
+    h, w = _decode_mask(region).shape
+    return x, y, x + w, y + h
+
+
+def region_bbox(region, shape):
+    """Pixels the region can change: its bbox grown by the feather radius, clipped."""
+    rows, cols = shape[:2]
+    if region.get('invert'):
+        return (0, 0, cols, rows)
+    f = region.get('feather', 0)
+    x0, y0, x1, y1 = _outline(region)
+    return _clip((x0 - f, y0 - f, x1 + f, y1 + f), cols, rows)
+
+
+def region_mask(region, bbox):
+    """uint8 mask (255 = filtered) covering bbox; soft-edged when feathered."""
+    x0, y0, x1, y1 = bbox
+    mask = np.zeros((y1 - y0, x1 - x0), dtype=np.uint8)
+    if 'rect' in region:
+        rx0, ry0, rx1, ry1 = _outline(region)
+        mask[max(ry0 - y0, 0):max(ry1 - y0, 0), max(rx0 - x0, 0):max(rx1 - x0, 0)] = 255
+    elif 'polygon' in region:
+        pts = _polygon(region) - np.int32([x0, y0])
+        cv2.fillPoly(mask, [pts], 255)
+    else:
+        local = _decode_mask(region)
+        mx, my = _pixels(region['origin'])
+        sx0, sy0 = max(x0 - mx, 0), max(y0 - my, 0)
+        sx1, sy1 = min(x1 - mx, local.shape[1]), min(y1 - my, local.shape[0])
+        if sx1 > sx0 and sy1 > sy0:
+            mask[my + sy0 - y0:my + sy1 - y0, mx + sx0 - x0:mx + sx1 - x0] = local[sy0:sy1, sx0:sx1]
+    if region.get('invert'):
+        cv2.bitwise_not(mask, mask)
+    f = region.get('feather', 0)
+    if f > 0:
+        mask = cv2.GaussianBlur(mask, (2 * f + 1, 2 * f + 1), 0)
+    return mask
+
+
+def _total_halo(ops):
+    total = 0
+    for op in ops:
+        h = _halo(op)
+        if h is None:
+            return None
+        total += h
+    return total
+
+
+def _channels(img, ch):
+    if ch == 3 and img.ndim == 2:
+        return cv2.cvtColor(img, cv2.COLOR_GRAY2RGB)
+    return img
+
+
+def blend_region(base, filtered, region, bbox):
+    """Write filtered (covering bbox) into base inside the region mask, in place."""
+    x0, y0, x1, y1 = bbox
+    dst = base[y0:y1, x0:x1]
+    mask = region_mask(region, bbox)
+    if region.get('feather', 0) > 0:
+        alpha = mask.astype(np.float32) / 255
+        if dst.ndim == 3:
+            alpha = alpha[:, :, None]
+        blended = filtered * alpha + dst * (1 - alpha)
+        dst[...] = blended + 0.5 if dst.dtype == np.uint8 else blended
+    else:
+        np.copyto(dst, filtered, where=(mask > 0) if dst.ndim == 2 else (mask > 0)[:, :, None])
+    return base
+
+
+def apply_region(img, ops, region, inplace=False):
+    """Run a plan only inside region and blend the result back into img.
+
+    Only the region's bounding box plus the plan's kernel halo is computed.
+    With inplace=True img itself is updated (when channel counts allow).
+    """
+    rows, cols = img.shape[:2]
+    ch = 1 if img.ndim == 2 else img.shape[2]
+    out_ch = max(ch, output_shape(ops, (rows, cols, ch))[2])
+    bbox = region_bbox(region, img.shape)
+    if out_ch != ch:
+        base = _channels(img, out_ch)
+    else:
+        base = img if inplace else img.copy()
+    if bbox[2] <= bbox[0] or bbox[3] <= bbox[1]:
+        return base
+    halo = _total_halo(ops)
+    if halo is None:
+        window = (0, 0, cols, rows)
+    else:
+        x0, y0, x1, y1 = bbox
+        window = _clip((x0 - halo, y0 - halo, x1 + halo, y1 + halo), cols, rows)
+    wx0, wy0, wx1, wy1 = window
+    res = _channels(execute(img[wy0:wy1, wx0:wx1], ops), out_ch)
+    x0, y0, x1, y1 = bbox
+    return blend_region(base, res[y0 - wy0:y1 - wy0, x0 - wx0:x1 - wx0], region, bbox)
+
@@ -0,0 +1,147 @@
+import cv2
+import numpy as np
+
+from .geometry import to_homography, warp
+from .parallel import _halo
+from .planner import out_shape, run_op
+from .warps import build_maps
+
+# ========================================
+# ROI EXECUTION
+# ========================================
+# Menghitung hanya persegi panjang (ROI) dari hasil akhir sebuah plan.
+#
+# Pass mundur: mulai dari ROI output, setiap op menentukan jendela input
+# minimal yang dibutuhkan:
+# - warp: sudut ROI dipetakan balik dengan H⁻¹ → bounding box di sumber
+#   (+ margin interpolasi);
+# - remap: bounding box nilai map pada ROI (map sudah di-cache);
+# - filter: ROI diperlebar dengan radius kernel (Canny: seluruh gambar);
+# - point op: jendela sama dengan ROI.
+#
+# Pass maju: setiap op dijalankan hanya pada jendelanya. Untuk warp, offset
+# jendela dilipat ke dalam matriks: H' = T(-roi) · H · T(+jendela sumber),
+# sehingga warp langsung menulis kanvas seukuran ROI.
+#
+# Rect ditulis sebagai (x0, y0, x1, y1), x1/y1 eksklusif.
+
+_INTERP_MARGIN = 2
+
+
+def _clip(rect, cols, rows):
+    x0, y0, x1, y1 = rect
+    return (max(0, min(x0, cols)), max(0, min(y0, rows)),
+            max(0, min(x1, cols)), max(0, min(y1, rows)))
+
+
+def _empty(rect):
+    return rect[2] <= rect[0] or rect[3] <= rect[1]
+
+
+def _shift(dx, dy):
+    return np.array([[1.0, 0, dx], [0, 1.0, dy], [0, 0, 1.0]])
+
+
+def source_window(H, out_rect, src_cols, src_rows, margin=_INTERP_MARGIN):
+    """Smallest source rect that forward warp H needs to fill out_rect."""
+    x0, y0, x1, y1 = out_rect
+    corners = np.array([[x0, y0, 1], [x1, y0, 1], [x1, y1, 1], [x0, y1, 1]], dtype=np.float64)
+    pts = corners @ np.linalg.inv(to_homography(H)).T
+    if (pts[:, 2] <= 1e-12).any():
+        # The ROI crosses the horizon of a projective warp: use the whole source
+        return (0, 0, src_cols, src_rows)
+    pts = pts[:, :2] / pts[:, 2:3]
+    lo = np.floor(pts.min(axis=0)).astype(int) - margin
+    hi = np.ceil(pts.max(axis=0)).astype(int) + margin + 1
+    return _clip((lo[0], lo[1], hi[0], hi[1]), src_cols, src_rows)
+
+
+def _input_window(op, out_rect, in_shape, out_sh):
+    in_rows, in_cols = in_shape[:2]
+    kind = op['op']
+    if kind == 'warp':
+        return source_window(op['matrix'], out_rect, in_cols, in_rows)
+    if kind == 'remap':
+        x0, y0, x1, y1 = out_rect
+        map1, _ = build_maps(op['name'], op['params'], (out_sh[1], out_sh[0]))
+        region = map1[y0:y1, x0:x1].reshape(-1, 2)
+        lo = region.min(axis=0).astype(int) - 1
+        hi = region.max(axis=0).astype(int) + 2
+        return _clip((lo[0], lo[1], hi[0], hi[1]), in_cols, in_rows)
+    h = _halo(op)
+    if h is None:
+        return (0, 0, in_cols, in_rows)
+    x0, y0, x1, y1 = out_rect
+    return _clip((x0 - h, y0 - h, x1 + h, y1 + h), in_cols, in_rows)
+
+
+def _run_window(img, op, in_rect, out_rect, out_sh):
+    """Run op on img (= in_rect of its full input); returns out_rect of its output."""
+    ox0, oy0, ox1, oy1 = out_rect
+    size = (ox1 - ox0, oy1 - oy0)
+    ch = out_sh[2]
+    if _empty(in_rect):
+        # Nothing of the source lands in the ROI
+        return np.zeros((size[1], size[0]) if ch == 1 else (size[1], size[0], ch), dtype=np.uint8)
+    kind = op['op']
+    ix0, iy0 = in_rect[:2]
+    if kind == 'warp':
+        H = _shift(-ox0, -oy0) @ op['matrix'] @ _shift(ix0, iy0)
+        out = warp(img, H, size)
+        for H_after, (canvas_w, canvas_h) in op['clips']:
+            win = source_window(H_after, out_rect, canvas_w, canvas_h, margin=1)
+            mask = np.zeros(size[::-1], dtype=np.uint8)
+            if not _empty(win):
+                canvas = np.full((win[3] - win[1], win[2] - win[0]), 255, dtype=np.uint8)
+                mask = warp(canvas, _shift(-ox0, -oy0) @ H_after @ _shift(win[0], win[1]), size,
+                            flags=cv2.INTER_NEAREST)
+            out[mask == 0] = 0
+        return out
+    if kind == 'remap':
+        map1, map2 = build_maps(op['name'], op['params'], (out_sh[1], out_sh[0]))
+        local1 = map1[oy0:oy1, ox0:ox1] - np.array([ix0, iy0], dtype=np.int16)
+        return cv2.remap(img, local1, map2[oy0:oy1, ox0:ox1], cv2.INTER_LINEAR,
+                         borderMode=cv2.BORDER_CONSTANT)
+    out = run_op(img, op)
+    return out[oy0 - iy0:oy1 - iy0, ox0 - ix0:ox1 - ix0]
+
+
+def plan_windows(ops, shape, roi):
+    """(in_rect, out_rect, out_shape) per op for an ROI of the final output."""
+    shapes = [shape]
+    for op in ops:
+        shapes.append(out_shape(op, shapes[-1]))
+    rows, cols = shapes[-1][:2]
+    rect = _clip(roi, cols, rows)
+    windows = []
+    for i in range(len(ops) - 1, -1, -1):
+        in_rect = rect if _empty(rect) else _input_window(ops[i], rect, shapes[i], shapes[i + 1])
+        windows.append((in_rect, rect, shapes[i + 1]))
+        rect = in_rect
+    return windows[::-1]
+
+
+def execute_roi(img, ops, roi):
+    """Compute only roi = (x0, y0, x1, y1) of the plan's final output.
+
+    Cost scales with the ROI (and the source windows it maps to), not with
+    the full canvas. The result equals the same crop of execute(img, ops)
+    up to ±1 interpolation rounding.
+    """
+    shape = (img.shape[0], img.shape[1], 1 if img.ndim == 2 else img.shape[2])
+    if not ops:
+        x0, y0, x1, y1 = _clip(roi, shape[1], shape[0])
+        return img[y0:y1, x0:x1]
+    windows = plan_windows(ops, shape, roi)
+    x0, y0, x1, y1 = windows[0][0]
+    current = img[y0:y1, x0:x1]
+    for op, (in_rect, out_rect, out_sh) in zip(ops, windows):
+        current = _run_window(current, op, in_rect, out_rect, out_sh)
+    return current
+
+
+def output_shape(ops, shape):
+    """(rows, cols, ch) of the final output of a plan."""
+    for op in ops:
+        shape = out_shape(op, shape)
+    return shape
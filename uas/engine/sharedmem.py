@@ -0,0 +1,236 @@
+import threading
+import weakref
+from collections import OrderedDict, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import get_context
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+
+from .planner import out_shape
+
+# ========================================
+# SHARED-MEMORY IMAGE TRANSPORT
+# ========================================
+# Gambar untuk worker process ditempatkan di segmen shared memory; yang
+# dikirim ke worker hanya handle kecil (nama, shape, dtype, strides), jadi
+# biaya dispatch tidak bergantung pada ukuran gambar. Worker menulis hasil
+# langsung ke segmen output yang sudah dialokasikan oleh proses utama.
+#
+# Segmen dimiliki oleh proses utama dan dihitung referensinya: setiap
+# pemegang (session, job yang sedang jalan) memanggil acquire()/release(),
+# dan segmen di-unlink saat referensi terakhir dilepas. weakref.finalize
+# menjamin unlink juga terjadi saat objek di-garbage-collect (session
+# berakhir) atau saat interpreter keluar. Worker hanya attach/close, tidak
+# pernah unlink, jadi worker yang crash tidak meninggalkan segmen.
+#
+# Paralelisme di sini berasal dari jumlah process, jadi setiap worker
+# memakai satu strip thread (dan satu thread OpenCV); op terakhir menulis
+# langsung ke segmen output, tanpa array hasil sementara lalu copy.
+
+ShmHandle = namedtuple("ShmHandle", "name shape dtype strides")
+
+
+def _destroy(shm):
+    try:
+        shm.close()
+    except BufferError:
+        pass  # numpy views still exist; the mapping goes away with them
+    try:
+        shm.unlink()
+    except FileNotFoundError:
+        pass
+
+
+class SharedImage:
+    """Array backed by a named shared-memory segment, owned by this process."""
+
+    def __init__(self, shape, dtype=np.uint8):
+        dtype = np.dtype(dtype)
+        nbytes = int(np.prod(shape)) * dtype.itemsize
+        self._shm = SharedMemory(create=True, size=max(nbytes, 1))
+        self.array = np.ndarray(shape, dtype=dtype, buffer=self._shm.buf)
+        self._refs = 1
+        self._lock = threading.Lock()
+        self._finalizer = weakref.finalize(self, _destroy, self._shm)
+
+    @classmethod
+    def from_array(cls, img):
+        shared = cls(img.shape, img.dtype)
+        shared.array[...] = img
+        return shared
+
+    @property
+    def name(self):
+        return self._shm.name
+
+    @property
+    def alive(self):
+        return self._finalizer.alive
+
+    def handle(self):
+        a = self.array
+        return ShmHandle(self._shm.name, a.shape, a.dtype.str, a.strides)
+
+    def acquire(self):
+        with self._lock:
+            if not self._finalizer.alive:
+                raise ValueError("Shared segment already released")
+            self._refs += 1
+        return self
+
+    def release(self):
+        with self._lock:
+            self._refs -= 1
+            last = self._refs == 0
+        if last:
+            self.array = None
+            self._finalizer()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+def attach(handle):
+    """Worker side: (array view, SharedMemory) for a handle; close() the shm when done."""
+    shm = SharedMemory(name=handle.name)
+    arr = np.ndarray(handle.shape, dtype=np.dtype(handle.dtype), buffer=shm.buf,
+                     strides=handle.strides)
+    return arr, shm
+
+
+# ----------------------------------------
+# Worker processes
+# ----------------------------------------
+
+# Per worker: RecipeRunner (plans + remap grids) of the most recently used recipes
+WORKER_MAX_RECIPES = 16
+
+_worker_runners = OrderedDict()
+
+
+def _init_worker():
+    from .parallel import configure_workers
+
+    configure_workers(1, cv_threads=1)
+
+
+def _run_recipe_job(src_handle, dst_handle, recipe, recipe_key):
+    """Runs in a worker process: read src segment, write the result into dst."""
+    from .recipe import RecipeRunner
+
+    runner = _worker_runners.get(recipe_key)
+    if runner is None:
+        # Plans and remap grids stay cached in the worker across jobs
+        runner = _worker_runners[recipe_key] = RecipeRunner(recipe)
+        while len(_worker_runners) > WORKER_MAX_RECIPES:
+            _worker_runners.popitem(last=False)
+    else:
+        _worker_runners.move_to_end(recipe_key)
+    src, src_shm = attach(src_handle)
+    dst, dst_shm = attach(dst_handle)
+    try:
+        runner(src, out=dst)
+    finally:
+        del src, dst
+        src_shm.close()
+        dst_shm.close()
+
+
+def _noop_job(src_handle, dst_handle, recipe, recipe_key):
+    return None
+
+
+class ProcessRunner:
+    """Runs recipes in worker processes, exchanging images via shared memory."""
+
+    def __init__(self, workers=None):
+        self.workers = workers
+        self._pool = None
+        self._lock = threading.Lock()
+
+    def _get_pool(self):
+        with self._lock:
+            if self._pool is None:
+                # spawn: forking a process that already runs threads is unsafe
+                self._pool = ProcessPoolExecutor(self.workers, mp_context=get_context("spawn"),
+                                                 initializer=_init_worker)
+            return self._pool
+
+    def output_shape(self, recipe, shape):
+        from .recipe import RecipeRunner
+
+        for op in RecipeRunner(recipe).plan(shape):
+            shape = out_shape(op, shape)
+        rows, cols, ch = shape
+        return (rows, cols) if ch == 1 else (rows, cols, ch)
+
+    def submit(self, src, recipe, _job=_run_recipe_job):
+        """Run recipe on a SharedImage; the future resolves to a new SharedImage.
+
+        src is held (acquire) until the job ends. On failure, including a
+        crashed worker, the output segment is released and the exception
+        re-raised by future.result().
+        """
+        a = src.array
+        shape = (a.shape[0], a.shape[1], 1 if a.ndim == 2 else a.shape[2])
+        dst = SharedImage(self.output_shape(recipe, shape), a.dtype)
+        src.acquire()
+        recipe_key = repr(recipe['stages'])
+        try:
+            future = self._get_pool().submit(_job, src.handle(), dst.handle(), recipe, recipe_key)
+        except BrokenProcessPool:
+            self._reset()
+            src.release()
+            dst.release()
+            raise
+        outer = _ResultFuture(future, dst)
+
+        def done(f):
+            src.release()
+            if f.cancelled():
+                dst.release()
+                return
+            error = f.exception()
+            if error is not None:
+                dst.release()
+                if isinstance(error, BrokenProcessPool):
+                    self._reset()
+
+        future.add_done_callback(done)
+        return outer
+
+    def run(self, img, recipe):
+        """Convenience: copy img in, run, copy the result out."""
+        with SharedImage.from_array(img) as src:
+            with self.submit(src, recipe).result() as dst:
+                return dst.array.copy()
+
+    def _reset(self):
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    def shutdown(self):
+        self._reset()
+
+
+class _ResultFuture:
+    def __init__(self, future, dst):
+        self._future = future
+        self._dst = dst
+
+    def done(self):
+        return self._future.done()
+
+    def cancel(self):
+        return self._future.cancel()
+
+    def result(self, timeout=None):
+        self._future.result(timeout)
+        return self._dst
@@ -0,0 +1,114 @@
+import cv2
+import numpy as np
+
+# ========================================
+# POINT OPERATIONS (cv2.LUT)
+# ========================================
+# Operasi tone per-pixel (brightness, contrast, gamma, levels, curves) hanya
+# bergantung pada nilai pixel itu sendiri, jadi untuk gambar uint8 cukup
+# dihitung pada 256 nilai input. Satu rantai operasi dikompilasi menjadi satu
+# lookup table per channel, lalu diterapkan dengan satu cv2.LUT.
+#
+# Setiap step adalah dict: {'type': 'Gamma', 'params': {...}, 'channels': 'RGB'}
+
+_IDENTITY = np.arange(256, dtype=np.float64)
+
+
+def _brightness(x, beta):
+    return x + beta
+
+
+def _contrast(x, alpha, pivot=0.0):
+    return alpha * (x - pivot) + pivot
+
+
+def _brightness_contrast(x, alpha, beta):
+    # Same formula as cv2.convertScaleAbs: I' = alpha * I + beta
+    return alpha * x + beta
+
+
+def _gamma(x, gamma):
+    # Float working images can hold negative values; gamma leaves them at 0
+    return 255.0 * (np.maximum(x, 0) / 255.0) ** (1.0 / gamma)
+
+
+def _levels(x, in_black=0, in_white=255, gamma=1.0, out_black=0, out_white=255):
+    t = np.clip((x - in_black) / max(in_white - in_black, 1e-6), 0.0, 1.0)
+    return out_black + (out_white - out_black) * t ** (1.0 / gamma)
+
+
+def _curve(x, points):
+    """Piecewise-linear curve through (input, output) control points."""
+    pts = sorted(points)
+    xp = [p[0] for p in pts]
+    fp = [p[1] for p in pts]
+    return np.interp(x, xp, fp)
+
+
+TONE_OPS = {
+    "Brightness": _brightness,
+    "Contrast": _contrast,
+    "Brightness/Contrast": _brightness_contrast,
+    "Gamma": _gamma,
+    "Levels": _levels,
+    "Curve": _curve,
+}
+
+
+def compile_lut(steps, n_channels=3):
+    """Compile a chain of tone steps into one (256, 1, n_channels) uint8 LUT.
+
+    Each step is clipped to [0, 255] like a uint8 result would be, but no
+    rounding happens until the very end.
+    """
+    tables = np.tile(_IDENTITY, (n_channels, 1))
+    for step in steps:
+        fn = TONE_OPS[step['type']]
+        channels = step.get('channels', 'RGB')
+        for c in range(n_channels):
+            if n_channels == 1 or "RGB"[c] in channels:
+                tables[c] = np.clip(fn(tables[c], **step.get('params', {})), 0, 255)
+    lut = np.rint(tables).astype(np.uint8).T
+    return lut.reshape(256, 1, n_channels)
+
+
+def compose_luts(first, second):
+    """LUT equivalent to applying `first` and then `second`."""
+    first = first.reshape(256, -1)
+    second = second.reshape(256, -1)
+    n = max(first.shape[1], second.shape[1])
+    first = np.broadcast_to(first, (256, n))
+    second = np.broadcast_to(second, (256, n))
+    out = np.take_along_axis(second, first.astype(np.intp), axis=0)
+    return np.ascontiguousarray(out).reshape(256, 1, n)
+
+
+def apply_lut(img, lut, dst=None):
+    """Apply a compiled LUT with a single cv2.LUT table lookup per pixel."""
+    if img.ndim == 2 or img.shape[2] == 1 or (lut == lut[:, :, :1]).all():
+        # A single-channel table is applied to every channel and takes the
+        # fast path in cv2.LUT
+        lut = lut[:, :, :1]
+    return cv2.LUT(img, np.ascontiguousarray(lut), dst=dst)
+
+
+def apply_tone(img, steps):
+    n_channels = 1 if img.ndim == 2 else img.shape[2]
+    return apply_lut(img, compile_lut(steps, n_channels))
+
+
+def apply_tone_float(img, steps):
+    """Evaluate tone steps directly on a float image, in place.
+
+    Unlike compile_lut nothing is clipped or rounded between steps, so e.g.
+    brightness followed by contrast keeps values pushed past 0 / 255.
+    """
+    n_channels = 1 if img.ndim == 2 else img.shape[2]
+    for step in steps:
+        fn = TONE_OPS[step['type']]
+        channels = step.get('channels', 'RGB')
+        for c in range(n_channels):
+            if n_channels == 1 or "RGB"[c] in channels:
+                plane = img if img.ndim == 2 else img[:, :, c]
+                plane[...] = fn(plane, **step.get('params', {}))
+    return img
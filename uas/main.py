@@ -1,5 +1,6 @@
 import streamlit as st
-from PIL import Image
+
+from service.prewarm import prewarm
 
 # Page config - MUST be first
 st.set_page_config(
@@ -9,6 +10,10 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+# Load OpenCV / matplotlib / the engine in the background, once per server
+# process, while the landing page is being read
+prewarm()
+
 # Custom CSS untuk styling yang berbeda
 st.markdown("""
 <style>
@@ -75,6 +80,7 @@ with col1:
             <li>Rotation (Putar)</li>
             <li>Shearing (Miring)</li>
             <li>Reflection (Cermin)</li>
+            <li>Perspective (Homografi)</li>
         </ul>
     </div>
     """, unsafe_allow_html=True)
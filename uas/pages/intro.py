@@ -1,8 +1,6 @@
 import streamlit as st
 import numpy as np
 import matplotlib.pyplot as plt
-from matplotlib.patches import FancyArrowPatch
-import io
 
 st.set_page_config(page_title="Introduction to Matrix Transformations", page_icon="📚", layout="wide")
 
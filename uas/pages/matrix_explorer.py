@@ -1,8 +1,6 @@
 import streamlit as st
 import numpy as np
 import matplotlib.pyplot as plt
-from mpl_toolkits.mplot3d import Axes3D
-import pandas as pd
 
 st.set_page_config(page_title="Matrix Explorer", page_icon="🔬", layout="wide")
 
@@ -52,7 +50,9 @@ with tab1:
     col1, col2 = st.columns([1, 2])
     
     with col1:
-        st.markdown("#### Matrix Elements (2×3)")
+        projective = st.checkbox("Projective (3×3 homography)", key="projective",
+                                 help="Add the third row to model perspective transforms")
+        st.markdown("#### Matrix Elements (3×3)" if projective else "#### Matrix Elements (2×3)")
         
         st.markdown("**Row 1:**")
         col_r1_1, col_r1_2, col_r1_3 = st.columns(3)
@@ -72,6 +72,18 @@ with tab1:
         with col_r2_3:
             a23 = st.number_input("a₂₃", value=0.0, step=0.5, format="%.2f", key="a23")
         
+        if projective:
+            st.markdown("**Row 3:**")
+            col_r3_1, col_r3_2, col_r3_3 = st.columns(3)
+            with col_r3_1:
+                a31 = st.number_input("a₃₁", value=0.0, step=0.05, format="%.3f", key="a31")
+            with col_r3_2:
+                a32 = st.number_input("a₃₂", value=0.0, step=0.05, format="%.3f", key="a32")
+            with col_r3_3:
+                a33 = st.number_input("a₃₃", value=1.0, step=0.1, format="%.3f", key="a33")
+        else:
+            a31, a32, a33 = 0.0, 0.0, 1.0
+        
         # Quick presets
         st.markdown("---")
         st.markdown("**Quick Presets:**")
@@ -115,17 +127,28 @@ with tab1:
     with col2:
         # Build matrix
         M = np.array([[a11, a12, a13], [a21, a22, a23]])
+        if projective:
+            M = np.array([[a11, a12, a13], [a21, a22, a23], [a31, a32, a33]])
         M_square = np.array([[a11, a12], [a21, a22]])  # For determinant/eigenvalues
         
         # Display matrix
         st.markdown("#### 📐 Your Matrix")
         st.markdown('<div class="matrix-container">', unsafe_allow_html=True)
-        st.latex(f"""
-        M = \\begin{{bmatrix}}
-        {a11:.3f} & {a12:.3f} & {a13:.3f} \\\\
-        {a21:.3f} & {a22:.3f} & {a23:.3f}
-        \\end{{bmatrix}}
-        """)
+        if projective:
+            st.latex(f"""
+            M = \\begin{{bmatrix}}
+            {a11:.3f} & {a12:.3f} & {a13:.3f} \\\\
+            {a21:.3f} & {a22:.3f} & {a23:.3f} \\\\
+            {a31:.3f} & {a32:.3f} & {a33:.3f}
+            \\end{{bmatrix}}
+            """)
+        else:
+            st.latex(f"""
+            M = \\begin{{bmatrix}}
+            {a11:.3f} & {a12:.3f} & {a13:.3f} \\\\
+            {a21:.3f} & {a22:.3f} & {a23:.3f}
+            \\end{{bmatrix}}
+            """)
         st.markdown('</div>', unsafe_allow_html=True)
         
         # Matrix properties
@@ -169,8 +192,10 @@ with tab1:
             [0, 0, 1]
         ]).T
         
-        # Transform points
+        # Transform points (perspective divide for the 3×3 case)
         transformed = M @ points
+        if projective:
+            transformed = transformed[:2] / transformed[2]
         
         # Plot
         fig, ax = plt.subplots(figsize=(8, 8))
@@ -211,6 +236,8 @@ with tab1:
         with test_col3:
             test_point = np.array([test_x, test_y, 1])
             result = M @ test_point
+            if projective:
+                result = result[:2] / result[2]
             st.markdown(f"""
             **Result:**
             
@@ -1,8 +1,61 @@
 import streamlit as st
+import base64
 import cv2
 import numpy as np
-from PIL import Image
-import io
+import os
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from engine import (
+    COLOR_PRESETS,
+    FILTER_TYPES,
+    NONLINEAR_WARPS,
+    TRANSFORM_TYPES,
+    WARP_TYPES,
+    BufferPool,
+    RecipeRunner,
+    StageCache,
+    WorkBuffer,
+    apply_recipe,
+    buffer_bytes,
+    build_matrix,
+    chain_key,
+    channel_swap_matrix,
+    compile_lut,
+    compile_stages,
+    compose_color,
+    dumps_recipe,
+    execute_parallel,
+    execute_roi,
+    explain,
+    filter_stage,
+    grid_cache,
+    image_corners,
+    image_key,
+    job_runner,
+    loads_recipe,
+    make_recipe,
+    mask_region,
+    optimize,
+    output_shape,
+    pipeline_job,
+    polygon_region,
+    rect_region,
+    region_bbox,
+    remap_op,
+    run_pipeline,
+    saturation_matrix,
+    session_stages,
+    transform_stage,
+    warp_op,
+    white_balance_matrix,
+)
+from service.codec import TempFile, decode_image, encode_image
+from service.display import DISPLAY_WIDTH, display_cache
+from service.pyramid import ImagePyramid
+from service.sessions import new_token, session_store
+from service.uploads import upload_store
 
 st.set_page_config(page_title="Transform Tool", page_icon="🎨", layout="wide")
 
@@ -44,9 +97,296 @@ if 'original_image' not in st.session_state:
     st.session_state.original_image = None
 if 'current_image' not in st.session_state:
     st.session_state.current_image = None
+if 'buffers' not in st.session_state:
+    # Preview outputs are written into reusable arrays instead of new ones per rerun
+    st.session_state.buffers = BufferPool()
+if 'session_token' not in st.session_state:
+    # The URL names this session's on-disk checkpoint, so a refresh or a server
+    # restart picks up where the user left off. Images are read only when needed.
+    token = st.query_params.get("session")
+    st.session_state.saved_session = session_store.load(token) if token else None
+    st.session_state.session_token = token if st.session_state.saved_session is not None else new_token()
+    st.session_state.checkpoint_rev = 0
+if st.query_params.get("session") != st.session_state.session_token:
+    st.query_params["session"] = st.session_state.session_token
 
 st.markdown('<div class="transform-header"><h1>🎨 Image Transformation Tool</h1></div>', unsafe_allow_html=True)
 
+
+def perspective_controls(cols, rows, key_prefix):
+    """Perspective input: four corner correspondences or a raw 3×3 matrix.
+
+    Returns stage params: {'dst': corners} or {'matrix': 3×3 list}, plus the
+    cols×rows 'size' they refer to, so a recipe rescales them for other sizes.
+    """
+    input_mode = st.radio("Perspective Input", ["Four Corners", "3×3 Matrix"],
+                          key=f"{key_prefix}_persp_mode", horizontal=True)
+
+    if input_mode == "Four Corners":
+        src = image_corners(cols, rows)
+        dst = []
+        st.caption("Destination position of each image corner (pixels)")
+        for name, (x0, y0) in zip(["Top-Left", "Top-Right", "Bottom-Right", "Bottom-Left"], src):
+            cx, cy = st.columns(2)
+            with cx:
+                x = st.number_input(f"{name} X", value=float(x0), step=10.0,
+                                    key=f"{key_prefix}_persp_{name}_x")
+            with cy:
+                y = st.number_input(f"{name} Y", value=float(y0), step=10.0,
+                                    key=f"{key_prefix}_persp_{name}_y")
+            dst.append([x, y])
+        return {'dst': dst, 'size': [cols, rows]}
+
+    H = np.eye(3)
+    for r in range(3):
+        row_cols = st.columns(3)
+        for c in range(3):
+            with row_cols[c]:
+                H[r, c] = st.number_input(f"h{r+1}{c+1}", value=float(r == c), step=0.1 if r < 2 else 0.0001,
+                                          format="%.4f", key=f"{key_prefix}_persp_h{r}{c}")
+    return {'matrix': H.tolist(), 'size': [cols, rows]}
+
+
+def transform_stage_controls(transform_type, cols, rows, i):
+    """Widgets for one transform stage of the pipeline; returns its params."""
+    if transform_type == "Translation":
+        return {'tx': st.slider("TX", -cols, cols, 0, 10, key=f"tx_{i}"),
+                'ty': st.slider("TY", -rows, rows, 0, 10, key=f"ty_{i}")}
+    if transform_type == "Scaling":
+        return {'sx': st.slider("Scale X", 0.1, 3.0, 1.0, 0.1, key=f"sx_{i}"),
+                'sy': st.slider("Scale Y", 0.1, 3.0, 1.0, 0.1, key=f"sy_{i}")}
+    if transform_type == "Rotation":
+        return {'angle': st.slider("Angle", -180, 180, 0, 5, key=f"angle_{i}")}
+    if transform_type == "Shearing":
+        return {'shear': st.slider("Shear", -1.0, 1.0, 0.0, 0.1, key=f"shear_{i}"),
+                'axis': st.radio("Axis", ["X", "Y"], key=f"shear_axis_{i}")}
+    if transform_type == "Reflection":
+        return {'axis': st.radio("Axis", ["Vertical", "Horizontal"], key=f"ref_{i}")}
+    if transform_type == "Perspective":
+        return perspective_controls(cols, rows, f"multi_{i}")
+    # Non-linear warps: one number input per parameter
+    return {name: st.number_input(name, value=float(default), step=0.05, key=f"warp_{name}_{i}")
+            for name, default in NONLINEAR_WARPS[transform_type].items()}
+
+
+def filter_stage_controls(filter_type, i):
+    """Widgets for one filter stage of the pipeline; returns its params."""
+    if filter_type == "Gaussian Blur":
+        return {'kernel_size': st.slider("Kernel Size", 1, 15, 5, step=2, key=f"ksize_{i}")}
+    if filter_type == "Sharpen":
+        return {'strength': st.slider("Strength", 0.0, 2.0, 1.0, 0.1, key=f"sharp_{i}")}
+    if filter_type == "Edge Detection":
+        method = st.radio("Method", ["Sobel", "Canny"], key=f"edge_{i}")
+        if method == "Sobel":
+            return {'method': method}
+        return {'method': method,
+                'threshold1': st.slider("Threshold 1", 0, 255, 100, key=f"th1_{i}"),
+                'threshold2': st.slider("Threshold 2", 0, 255, 200, key=f"th2_{i}")}
+    if filter_type == "Brightness/Contrast":
+        return {'brightness': st.slider("Brightness", -100, 100, 0, key=f"bright_{i}"),
+                'contrast': st.slider("Contrast", 0.5, 3.0, 1.0, 0.1, key=f"contrast_{i}")}
+    if filter_type == "Tone Curve":
+        gamma = st.slider("γ", 0.2, 5.0, 1.0, 0.1, key=f"gamma_{i}")
+        in_black, in_white = st.slider("Input Levels", 0, 255, (0, 255), key=f"levels_{i}")
+        return {'steps': [{'type': 'Levels', 'params': {'in_black': in_black, 'in_white': in_white}},
+                          {'type': 'Gamma', 'params': {'gamma': gamma}}]}
+    if filter_type == "Colour Matrix":
+        preset = st.selectbox("Preset", ["Sepia", "Saturation", "Invert", "Channel Swap"], key=f"cm_{i}")
+        if preset == "Saturation":
+            M = saturation_matrix(st.slider("Saturation", 0.0, 3.0, 1.5, 0.1, key=f"sat_{i}"))
+        elif preset == "Channel Swap":
+            M = channel_swap_matrix(st.selectbox("Channel Order", ["BGR", "GBR", "BRG"], key=f"swap_{i}"))
+        else:
+            M = COLOR_PRESETS[preset]()
+        return {'matrix': np.round(M, 6).tolist()}
+    return {}  # Grayscale
+
+
+def region_controls(cols, rows):
+    """Widgets for the area a filter is restricted to; returns a region dict or None."""
+    kind = st.radio("Apply to", ["Whole image", "Rectangle", "Polygon", "Uploaded mask"],
+                    key="region_kind", horizontal=True)
+    if kind == "Whole image":
+        return None
+    feather = st.slider("Feather (px)", 0, 50, 0, key="region_feather", help="Width of the soft edge")
+    if kind == "Rectangle":
+        cx, cy = st.columns(2)
+        with cx:
+            x0, x1 = st.slider("X range", 0, cols, (cols // 4, 3 * cols // 4), key="region_x")
+        with cy:
+            y0, y1 = st.slider("Y range", 0, rows, (rows // 4, 3 * rows // 4), key="region_y")
+        region = rect_region(x0, y0, x1, y1, feather)
+    elif kind == "Polygon":
+        default = f"{cols // 2}, {rows // 8}\n{7 * cols // 8}, {7 * rows // 8}\n{cols // 8}, {7 * rows // 8}"
+        text = st.text_area("Vertices (one 'x, y' per line, pixels)", default, key="region_polygon")
+        try:
+            points = [[float(v) for v in line.split(",")] for line in text.splitlines() if line.strip()]
+        except ValueError:
+            points = []
+        if len(points) < 3 or any(len(p) != 2 for p in points):
+            st.warning("⚠️ Enter at least three 'x, y' vertices")
+            return None
+        region = polygon_region(points, feather)
+    else:
+        mask_file = st.file_uploader("Mask image (white = filtered)", type=["png", "jpg", "jpeg", "bmp"],
+                                     key="region_mask")
+        if mask_file is None:
+            return None
+        mask = decode_image(mask_file.getvalue())
+        if mask.shape[:2] != (rows, cols):
+            mask = cv2.resize(mask, (cols, rows), interpolation=cv2.INTER_NEAREST)
+        try:
+            region = mask_region(mask, feather)
+        except ValueError as e:
+            st.warning(f"⚠️ {e}")
+            return None
+    if st.checkbox("Invert (filter outside the region)", key="region_invert"):
+        region['invert'] = True
+    return region
+
+
+def show(img, fraction, **kwargs):
+    """st.image of img encoded at the size of a column `fraction` of the page wide."""
+    st.image(display_cache.display(img, DISPLAY_WIDTH * fraction, **kwargs), use_container_width=True)
+
+
+def preview(img, ops):
+    """Run ops on the shared strip pool, writing into the session's pooled buffers.
+
+    Previews go through the engine's pool rather than calling OpenCV directly:
+    the pool limits OpenCV's own threads process-wide, so a direct call would
+    run on one thread.
+    """
+    return execute_parallel(img, ops, buffers=st.session_state.buffers)
+
+
+def commit_step(result, entry):
+    """Make result the current image and record entry in the history.
+
+    In high-precision mode the entry's stages are run on the float32 working
+    buffer instead and the current image is its 8-bit conversion.
+    """
+    work = st.session_state.get('work_buffer')
+    if work is not None:
+        if entry.get('from_original'):
+            work.reset(st.session_state.original_image)
+        work.apply(compile_stages(entry['stages'], work.shape))
+        result = work.to_uint8()
+    st.session_state.current_image = result
+    st.session_state.transformation_history.append(entry)
+    st.session_state.transform_count = st.session_state.get('transform_count', 0) + 1
+    checkpoint()
+
+
+def checkpoint(from_original=False):
+    """Save the current image and history under the session's URL token, in the background."""
+    st.session_state.checkpoint_rev += 1
+    session_store.save(st.session_state.session_token, st.session_state.checkpoint_rev,
+                       st.session_state.current_image, st.session_state.transformation_history,
+                       from_original=from_original)
+
+
+def restore_session(saved):
+    """Bring back a checkpointed session without a new upload."""
+    st.session_state.upload = upload_store.acquire(saved.original_bytes())
+    st.session_state.original_image = st.session_state.upload.image
+    current = saved.current()
+    st.session_state.current_image = st.session_state.original_image if current is None else current
+    st.session_state.transformation_history = saved.history
+    st.session_state.transform_count = len(saved.history)
+    st.session_state.checkpoint_rev = saved.revision
+    st.session_state.upload_info = saved.upload
+    st.session_state.original_key = None
+
+
+# Above this size the pipeline's Apply runs as a background job by default
+BACKGROUND_MIN_PIXELS = 12_000_000
+
+
+@st.fragment(run_every=0.5)
+def background_job_panel():
+    """Progress / cancel for the session's background job; delivers its result."""
+    job = st.session_state.get('bg_job')
+    if job is None:
+        return
+    job.heartbeat()
+    if job.status in ("queued", "running"):
+        text = f"⏳ {job.label}: tile {job.done}/{job.total}" if job.total else f"⏳ {job.label}: {job.status}"
+        pcol1, pcol2 = st.columns([4, 1])
+        with pcol1:
+            st.progress(job.fraction, text=text)
+        with pcol2:
+            if st.button("⛔ Cancel", key="cancel_bg_job", use_container_width=True):
+                job.cancel()
+        return
+    
+    st.session_state.bg_job = None
+    if job.status == "done":
+        commit_step(job.result, st.session_state.pop('bg_job_entry'))
+        st.session_state.job_message = f"✅ {job.label} finished in {job.elapsed:.1f} s"
+    elif job.status == "cancelled":
+        st.session_state.job_message = f"⛔ {job.label} cancelled after {job.done}/{job.total} tiles"
+    else:
+        st.session_state.job_message = f"❌ {job.label} failed: {job.error}"
+    st.rerun()
+
+
+def gallery_job(runner, name, uploaded, thumb_size=256):
+    """Decode, transform and encode one gallery file; runs in a worker thread."""
+    result = runner(decode_image(uploaded.getvalue()))
+    png = encode_image(result)
+    h, w = result.shape[:2]
+    scale = thumb_size / max(h, w)
+    if scale < 1:
+        result = cv2.resize(result, (max(1, int(w * scale)), max(1, int(h * scale))),
+                            interpolation=cv2.INTER_AREA)
+    return name, png, result
+
+
+def gallery_tile(caption, thumb, error):
+    """One gallery cell: the thumbnail, or why the image failed."""
+    if thumb is None:
+        st.error(f"❌ {caption}\n\n{error}")
+    else:
+        st.image(thumb, caption=caption, use_container_width=True)
+
+# Size of the zoomable viewer window, CSS px
+VIEWER_SIZE = (DISPLAY_WIDTH, 560)
+
+
+@st.fragment
+def inspect_viewer():
+    """Zoom and pan over the current image; only the tiles in view are encoded."""
+    img = st.session_state.current_image
+    pyramid = st.session_state.get('pyramid')
+    if pyramid is None or pyramid.source is not img:
+        pyramid = st.session_state.pyramid = ImagePyramid(img)
+    rows, cols = img.shape[:2]
+    view_w, view_h = VIEWER_SIZE
+    
+    zc1, zc2, zc3 = st.columns([2, 3, 3])
+    with zc1:
+        zoom = st.select_slider("Zoom", pyramid.zoom_levels(view_w, view_h), format_func=lambda z: f"{z:.0%}")
+    with zc2:
+        cx = st.slider("Centre X", 0, cols, cols // 2)
+    with zc3:
+        cy = st.slider("Centre Y", 0, rows, rows // 2)
+    
+    level, tiles = pyramid.viewport(zoom, cx, cy, view_w, view_h)
+    rendering = "image-rendering:pixelated;" if zoom > 1 else ""
+    html = "".join(
+        f'<img src="data:{pyramid.mime};base64,{base64.b64encode(data).decode("ascii")}" '
+        f'style="position:absolute;left:{x:.1f}px;top:{y:.1f}px;width:{w:.1f}px;height:{h:.1f}px;'
+        f'max-width:none;{rendering}">'
+        for data, x, y, w, h in tiles
+    )
+    st.markdown(f'<div style="position:relative;width:{view_w}px;max-width:100%;height:{view_h}px;'
+                f'overflow:hidden;background:#1a202c">{html}</div>', unsafe_allow_html=True)
+    level_rows, level_cols = pyramid.shapes[level]
+    st.caption(f"Level {level} ({level_cols}×{level_rows}) · {len(tiles)} tiles in view · "
+               f"{pyramid.encoded} tiles encoded, {pyramid.levels_built} of {len(pyramid.shapes)} levels built")
+
+
 # ========================================
 # SIDEBAR - UPLOAD & CONTROLS
 # ========================================
@@ -58,34 +398,70 @@ with st.sidebar:
         help="Upload an image to start transforming"
     )
     
-    if uploaded_file is not None:
-        # Load image
-        image = Image.open(uploaded_file).convert("RGB")
-        img_array = np.array(image)
-        
-        # Store original if first time
-        if st.session_state.original_image is None:
-            st.session_state.original_image = img_array.copy()
-            st.session_state.current_image = img_array.copy()
+    # Store original if first time. Decoded uploads are shared read-only across
+    # sessions; steps always produce new arrays, so nothing writes into them.
+    if uploaded_file is not None and st.session_state.original_image is None:
+        data = uploaded_file.getvalue()
+        st.session_state.upload = upload_store.acquire(data)
+        st.session_state.original_image = st.session_state.upload.image
+        st.session_state.current_image = st.session_state.original_image
+        st.session_state.original_key = None
+        st.session_state.upload_info = {'name': uploaded_file.name, 'type': uploaded_file.type,
+                                        'size': uploaded_file.size}
+        session_store.save_original(st.session_state.session_token, data, uploaded_file.name, uploaded_file.type)
+    elif st.session_state.original_image is None and st.session_state.get('saved_session') is not None:
+        try:
+            restore_session(st.session_state.saved_session)
+        except (OSError, ValueError):
+            st.warning("⚠️ The saved session could not be restored")
+        st.session_state.saved_session = None
+    
+    if st.session_state.original_image is not None:
+        img_array = st.session_state.original_image
+        info = st.session_state.upload_info
         
-        st.success("✅ Image loaded successfully!")
+        st.success("✅ Image loaded successfully!" if uploaded_file is not None else "♻️ Session restored")
         
         # Image info
         st.markdown("### 📊 Image Info")
         st.info(f"""
         **Dimensions:** {img_array.shape[1]} × {img_array.shape[0]} px
         
-        **Size:** {uploaded_file.size / 1024:.2f} KB
+        **Size:** {info['size'] / 1024:.2f} KB
         
-        **Format:** {uploaded_file.type}
+        **Format:** {info['type']}
         """)
+        images, refs, held = upload_store.stats()
+        st.caption(f"Shared uploads: {images} image(s), {held / 1e6:.1f} MB, used by {refs} session(s)")
         
         st.markdown("---")
         
+        # High precision: steps accumulate in float32, 8-bit only for display/export
+        original = st.session_state.original_image
+        high_precision = st.toggle(
+            "🔬 High precision (float32)", key="high_precision",
+            help="Applied steps run on a float32 working image, so nothing is rounded or clipped between "
+                 "steps. Previews are still computed in 8 bits."
+        )
+        st.caption(f"Float32 working buffers: {buffer_bytes(original.shape) / 1e6:.1f} MB "
+                   f"(8-bit image: {original.nbytes / 1e6:.1f} MB)")
+        if high_precision and st.session_state.get('work_buffer') is None:
+            # Rebuild the working image from the original by replaying the history in float
+            work = WorkBuffer(original)
+            work.apply(compile_stages(session_stages(st.session_state.transformation_history), work.shape))
+            st.session_state.work_buffer = work
+            st.session_state.current_image = work.to_uint8()
+        elif not high_precision:
+            st.session_state.work_buffer = None
+            st.session_state.pop('work_png16', None)
+        
         # Reset button
         if st.button("🔄 Reset to Original", use_container_width=True):
-            st.session_state.current_image = st.session_state.original_image.copy()
+            st.session_state.current_image = st.session_state.original_image
             st.session_state.transformation_history = []
+            if st.session_state.get('work_buffer') is not None:
+                st.session_state.work_buffer.reset(st.session_state.original_image)
+            checkpoint(from_original=True)
             st.rerun()
     else:
         st.warning("⚠️ Please upload an image to begin")
@@ -98,12 +474,18 @@ with st.sidebar:
 # Mode selection
 mode = st.radio(
     "**Choose Mode:**",
-    ["🎯 Single Transformation", "🔗 Multiple Transformations", "🎨 Filters"],
+    ["🎯 Single Transformation", "🔗 Multiple Transformations", "🌀 Non-linear Warps", "🎨 Filters",
+     "🖼️ Gallery", "🎞️ Video / GIF"],
     horizontal=True
 )
 
 st.markdown("---")
 
+if st.session_state.get('job_message'):
+    st.toast(st.session_state.pop('job_message'))
+if st.session_state.get('bg_job') is not None:
+    background_job_panel()
+
 # ========================================
 # MODE 1: SINGLE TRANSFORMATION
 # ========================================
@@ -114,7 +496,7 @@ if mode == "🎯 Single Transformation":
     # Transformation selection
     transform_type = st.selectbox(
         "Select Transformation Type",
-        ["Translation", "Scaling", "Rotation", "Shearing", "Reflection"]
+        ["Translation", "Scaling", "Rotation", "Shearing", "Reflection", "Perspective"]
     )
     
     st.markdown("---")
@@ -138,7 +520,8 @@ if mode == "🎯 Single Transformation":
             
             # Create matrix
             M = np.float32([[1, 0, tx], [0, 1, ty]])
-            transformed = cv2.warpAffine(img_array, M, (cols, rows))
+            transformed = preview(img_array, [warp_op(M, (cols, rows))])
+            stage = transform_stage("Translation", tx=tx, ty=ty)
             
             # Display matrix
             st.markdown("**Matrix:**")
@@ -163,7 +546,8 @@ if mode == "🎯 Single Transformation":
             M = np.float32([[sx, 0, 0], [0, sy, 0]])
             new_cols = int(cols * sx)
             new_rows = int(rows * sy)
-            transformed = cv2.warpAffine(img_array, M, (new_cols, new_rows))
+            transformed = preview(img_array, [warp_op(M, (new_cols, new_rows))])
+            stage = transform_stage("Scaling", sx=sx, sy=sy, resize_canvas=True)
             
             st.markdown("**Matrix:**")
             st.latex(f"""
@@ -188,7 +572,9 @@ if mode == "🎯 Single Transformation":
                                 help="Scale during rotation")
             
             M = cv2.getRotationMatrix2D(center, angle, scale_rot)
-            transformed = cv2.warpAffine(img_array, M, (cols, rows))
+            transformed = preview(img_array, [warp_op(M, (cols, rows))])
+            stage = transform_stage("Rotation", angle=angle, scale=scale_rot,
+                                    center='image' if rotation_center == "Image Center" else 'origin')
             
             theta_rad = np.radians(angle)
             st.markdown("**Matrix:**")
@@ -207,7 +593,8 @@ if mode == "🎯 Single Transformation":
             if shear_axis == "X-axis (horizontal)":
                 M = np.float32([[1, shear_factor, 0], [0, 1, 0]])
                 new_cols = int(cols + abs(shear_factor) * rows)
-                transformed = cv2.warpAffine(img_array, M, (new_cols, rows))
+                transformed = preview(img_array, [warp_op(M, (new_cols, rows))])
+                stage = transform_stage("Shearing", shear=shear_factor, axis='X', resize_canvas=True)
                 
                 st.markdown("**Matrix:**")
                 st.latex(f"""
@@ -219,7 +606,8 @@ if mode == "🎯 Single Transformation":
             else:
                 M = np.float32([[1, 0, 0], [shear_factor, 1, 0]])
                 new_rows = int(rows + abs(shear_factor) * cols)
-                transformed = cv2.warpAffine(img_array, M, (cols, new_rows))
+                transformed = preview(img_array, [warp_op(M, (cols, new_rows))])
+                stage = transform_stage("Shearing", shear=shear_factor, axis='Y', resize_canvas=True)
                 
                 st.markdown("**Matrix:**")
                 st.latex(f"""
@@ -228,7 +616,22 @@ if mode == "🎯 Single Transformation":
                 {shear_factor:.2f} & 1 & 0
                 \\end{{bmatrix}}
                 """)
-                
+
+        elif transform_type == "Perspective":
+            persp_params = perspective_controls(cols, rows, "single")
+            M = build_matrix("Perspective", persp_params, img_array.shape)
+            transformed = preview(img_array, [warp_op(M, (cols, rows))])
+            stage = transform_stage("Perspective", **persp_params)
+
+            st.markdown("**Matrix (Homography):**")
+            st.latex(f"""
+            H = \\begin{{bmatrix}}
+            {M[0,0]:.3f} & {M[0,1]:.3f} & {M[0,2]:.1f} \\\\
+            {M[1,0]:.3f} & {M[1,1]:.3f} & {M[1,2]:.1f} \\\\
+            {M[2,0]:.5f} & {M[2,1]:.5f} & {M[2,2]:.3f}
+            \\end{{bmatrix}}
+            """)
+
         else:  # Reflection
             reflection_axis = st.radio(
                 "Reflection Axis",
@@ -237,6 +640,7 @@ if mode == "🎯 Single Transformation":
             
             if reflection_axis == "Vertical (flip left-right)":
                 M = np.float32([[-1, 0, cols], [0, 1, 0]])
+                stage = transform_stage("Reflection", axis="Vertical")
                 st.markdown("**Matrix:**")
                 st.latex(f"""
                 M = \\begin{{bmatrix}}
@@ -246,6 +650,7 @@ if mode == "🎯 Single Transformation":
                 """)
             elif reflection_axis == "Horizontal (flip up-down)":
                 M = np.float32([[1, 0, 0], [0, -1, rows]])
+                stage = transform_stage("Reflection", axis="Horizontal")
                 st.markdown("**Matrix:**")
                 st.latex(f"""
                 M = \\begin{{bmatrix}}
@@ -255,6 +660,7 @@ if mode == "🎯 Single Transformation":
                 """)
             else:  # Both
                 M = np.float32([[-1, 0, cols], [0, -1, rows]])
+                stage = transform_stage("Reflection", axis="Both")
                 st.markdown("**Matrix:**")
                 st.latex(f"""
                 M = \\begin{{bmatrix}}
@@ -263,19 +669,18 @@ if mode == "🎯 Single Transformation":
                 \\end{{bmatrix}}
                 """)
             
-            transformed = cv2.warpAffine(img_array, M, (cols, rows))
+            transformed = preview(img_array, [warp_op(M, (cols, rows))])
         
         st.markdown('</div>', unsafe_allow_html=True)
         
         # Apply button
         if st.button("✨ Apply Transformation", use_container_width=True, type="primary"):
-            st.session_state.current_image = transformed
-            st.session_state.transformation_history.append({
+            commit_step(transformed, {
                 'type': transform_type,
                 'matrix': M,
+                'stages': [stage],
                 'timestamp': st.session_state.get('transform_count', 0) + 1
             })
-            st.session_state.transform_count = st.session_state.get('transform_count', 0) + 1
             st.success(f"✅ {transform_type} applied!")
             st.rerun()
     
@@ -287,124 +692,283 @@ if mode == "🎯 Single Transformation":
         
         with col_before:
             st.markdown("**Original**")
-            st.image(img_array, use_container_width=True, channels="RGB")
+            show(img_array, 1 / 3)
         
         with col_after:
             st.markdown("**Transformed**")
-            st.image(transformed, use_container_width=True, channels="RGB")
+            show(transformed, 1 / 3)
 
 # ========================================
 # MODE 2: MULTIPLE TRANSFORMATIONS
 # ========================================
 elif mode == "🔗 Multiple Transformations":
     st.markdown("### 🔗 Multiple Transformations Mode")
-    st.info("Combine multiple transformations sequentially. Each transformation is applied to the result of the previous one.")
+    st.info("Build a pipeline of transforms and filters. Each stage is applied to the result of the previous one; results are cached per stage, so editing stage k only recomputes stages k..N.")
     
-    img_array = st.session_state.current_image
-    rows, cols = img_array.shape[:2]
+    original = st.session_state.original_image
+    rows, cols = original.shape[:2]
+    
+    if 'stage_cache' not in st.session_state:
+        st.session_state.stage_cache = StageCache()
+    if st.session_state.get('original_key') is None:
+        st.session_state.original_key = image_key(original)
     
     # Transformation pipeline
     st.markdown("#### 🔧 Build Transformation Pipeline")
     
-    num_transforms = st.number_input("Number of transformations", min_value=1, max_value=5, value=2, step=1)
+    num_stages = st.number_input("Number of stages", min_value=1, value=2, step=1)
     
-    transforms_list = []
+    stages = []
     
-    for i in range(num_transforms):
-        with st.expander(f"🔹 Transformation {i+1}", expanded=(i==0)):
-            trans_type = st.selectbox(
-                "Type",
-                ["Translation", "Scaling", "Rotation", "Shearing", "Reflection"],
-                key=f"trans_type_{i}"
-            )
+    for i in range(num_stages):
+        with st.expander(f"🔹 Stage {i+1}", expanded=(i==0)):
+            kind = st.radio("Stage Kind", ["Transform", "Filter"], key=f"stage_kind_{i}", horizontal=True)
             
             col1, col2 = st.columns([1, 1])
             
             with col1:
-                if trans_type == "Translation":
-                    tx = st.slider("TX", -200, 200, 0, 10, key=f"tx_{i}")
-                    ty = st.slider("TY", -200, 200, 0, 10, key=f"ty_{i}")
-                    M = np.float32([[1, 0, tx], [0, 1, ty]])
-                    
-                elif trans_type == "Scaling":
-                    sx = st.slider("Scale X", 0.1, 3.0, 1.0, 0.1, key=f"sx_{i}")
-                    sy = st.slider("Scale Y", 0.1, 3.0, 1.0, 0.1, key=f"sy_{i}")
-                    M = np.float32([[sx, 0, 0], [0, sy, 0]])
-                    
-                elif trans_type == "Rotation":
-                    angle = st.slider("Angle", -180, 180, 0, 5, key=f"angle_{i}")
-                    center = (cols / 2, rows / 2)
-                    M = cv2.getRotationMatrix2D(center, angle, 1.0)
-                    
-                elif trans_type == "Shearing":
-                    shear = st.slider("Shear", -1.0, 1.0, 0.0, 0.1, key=f"shear_{i}")
-                    axis = st.radio("Axis", ["X", "Y"], key=f"shear_axis_{i}")
-                    if axis == "X":
-                        M = np.float32([[1, shear, 0], [0, 1, 0]])
-                    else:
-                        M = np.float32([[1, 0, 0], [shear, 1, 0]])
-                        
-                else:  # Reflection
-                    ref_type = st.radio("Axis", ["Vertical", "Horizontal"], key=f"ref_{i}")
-                    if ref_type == "Vertical":
-                        M = np.float32([[-1, 0, cols], [0, 1, 0]])
-                    else:
-                        M = np.float32([[1, 0, 0], [0, -1, rows]])
+                if kind == "Transform":
+                    stage_type = st.selectbox("Type", TRANSFORM_TYPES + WARP_TYPES, key=f"trans_type_{i}")
+                    stage = transform_stage(stage_type, **transform_stage_controls(stage_type, cols, rows, i))
+                else:
+                    stage_type = st.selectbox("Type", FILTER_TYPES, key=f"filter_type_{i}")
+                    stage = filter_stage(stage_type, **filter_stage_controls(stage_type, i))
             
             with col2:
-                st.markdown("**Matrix:**")
-                st.code(str(M), language="python")
+                if kind == "Transform" and stage_type in TRANSFORM_TYPES:
+                    st.markdown("**Matrix:**")
+                    st.code(str(np.round(build_matrix(stage_type, stage['params'], original.shape), 4)), language="python")
+                else:
+                    st.markdown("**Parameters:**")
+                    st.code(str(stage['params']), language="python")
             
-            transforms_list.append({'type': trans_type, 'matrix': M})
+            stages.append(stage)
     
-    # Apply all transformations
-    if st.button("✨ Apply All Transformations", type="primary", use_container_width=True):
-        result = st.session_state.original_image.copy()
-        
-        progress_bar = st.progress(0)
-        status_text = st.empty()
-        
-        for idx, trans in enumerate(transforms_list):
-            status_text.text(f"Applying {trans['type']}...")
-            M = trans['matrix']
-            
-            # Calculate new dimensions for scaling/shearing
-            h, w = result.shape[:2]
-            result = cv2.warpAffine(result, M, (w, h))
-            
-            progress_bar.progress((idx + 1) / len(transforms_list))
+    background = st.toggle(
+        "⏳ Apply as background job",
+        value=rows * cols >= BACKGROUND_MIN_PIXELS,
+        help="Runs tile by tile with progress and a cancel button while the page stays responsive. The live preview is skipped."
+    )
+    
+    result = None
+    if not background:
+        # Live preview: only stages downstream of the first edited one are recomputed
+        result, stage_report = run_pipeline(original, stages, st.session_state.stage_cache,
+                                            source_key=st.session_state.original_key)
         
-        st.session_state.current_image = result
-        status_text.text("✅ All transformations applied!")
+        with st.expander("🧠 Execution Plan"):
+            cache = st.session_state.stage_cache
+            st.code("\n".join(
+                f"{'cached' if seg['cached'] else '%7.1f ms' % seg['ms']:>10}  {seg['label']}"
+                for seg in stage_report
+            ))
+            st.caption(f"Stage cache: {cache.hits} hits / {cache.misses} misses, {cache.nbytes / 1e6:.1f} MB")
+            # Optimized plan of every segment: estimated vs actual per fused op
+            st.code("\n\n".join(
+                explain(seg['plan'], seg['shape'], seg['timings'],
+                        title=f"Segment {g + 1}: {seg['label']}" + (" (cached, estimate only)" if seg['cached'] else ""))
+                for g, seg in enumerate(stage_report)
+            ))
+            shape = (rows, cols, 1 if original.ndim == 2 else original.shape[2])
+            fused_ops = len(optimize(compile_stages(stages, shape), shape))
+            segment_ops = sum(len(seg['plan']) for seg in stage_report)
+            if fused_ops < segment_ops:
+                st.caption(f"Optimizing the whole pipeline at once would need {fused_ops} op(s) instead of "
+                           f"{segment_ops}: stages are optimized per cached segment, so nothing fuses across "
+                           "segment boundaries.")
+    
+    history_entry = {
+        'type': f"Pipeline ({len(stages)} stages)",
+        'matrix': None,
+        'params': stages,
+        'stages': stages,
+        'from_original': True,
+        'timestamp': st.session_state.get('transform_count', 0) + 1
+    }
+    
+    # Apply all transformations
+    job_active = st.session_state.get('bg_job') is not None
+    if st.button("✨ Apply All Transformations", type="primary", use_container_width=True,
+                 disabled=background and job_active):
+        if background:
+            st.session_state.bg_job = job_runner.submit(pipeline_job(original, stages),
+                                                        label=history_entry['type'])
+            st.session_state.bg_job_entry = history_entry
+            st.rerun()
+        commit_step(result, history_entry)
+        st.success("✅ All transformations applied!")
         st.balloons()
         st.rerun()
     
     # Display result
     st.markdown("---")
-    col1, col2 = st.columns(2)
+    col1, col2, col3 = st.columns(3)
     
     with col1:
         st.markdown("**Original Image**")
-        st.image(st.session_state.original_image, use_container_width=True, channels="RGB")
+        show(original, 1 / 3)
     
     with col2:
+        st.markdown("**Pipeline Preview**")
+        if result is not None:
+            show(result, 1 / 3)
+        else:
+            st.info("Preview skipped in background mode.")
+    
+    with col3:
         st.markdown("**Current Result**")
-        st.image(st.session_state.current_image, use_container_width=True, channels="RGB")
+        show(st.session_state.current_image, 1 / 3)
+    
+    # Zoom: only the requested rectangle of the result is computed. It is opt-in
+    # (an expander's body runs even when collapsed) and cached per (pipeline, ROI),
+    # since Canny and region stages still fall back to whole-image work
+    with st.expander("🔍 Zoom / ROI"):
+        if job_active:
+            st.info("Zoom is paused while a background job is running.")
+        elif st.toggle("Compute zoomed region", key="roi_on",
+                       help="Runs the pipeline for the rectangle below only; the result is cached until the stages or the rectangle change."):
+            shape = (rows, cols, 1 if original.ndim == 2 else original.shape[2])
+            try:
+                # Building the recipe validates the stages (the live preview does not)
+                plan = RecipeRunner(make_recipe(stages)).plan(shape)
+            except ValueError as e:
+                plan = None
+                st.error(f"❌ Cannot zoom into this pipeline: {e}")
+            if plan is not None:
+                out_rows, out_cols, _ = output_shape(plan, shape)
+                st.caption(f"Rectangle in result coordinates (result is {out_cols}×{out_rows}). "
+                           "Warps are inverse-mapped to the source window they need, so the cost follows the zoomed area.")
+                zc1, zc2, zc3, zc4 = st.columns(4)
+                with zc1:
+                    roi_w = st.number_input("Width", 1, out_cols, min(512, out_cols), key="roi_w")
+                with zc2:
+                    roi_h = st.number_input("Height", 1, out_rows, min(512, out_rows), key="roi_h")
+                with zc3:
+                    roi_x = st.number_input("X", 0, out_cols - 1, max(0, (out_cols - roi_w) // 2), key="roi_x")
+                with zc4:
+                    roi_y = st.number_input("Y", 0, out_rows - 1, max(0, (out_rows - roi_h) // 2), key="roi_y")
+                
+                roi = (roi_x, roi_y, roi_x + roi_w, roi_y + roi_h)
+                roi_key = (chain_key(st.session_state.original_key, stages), roi)
+                cached = st.session_state.get('roi_result')
+                if cached is None or cached[0] != roi_key:
+                    t0 = time.perf_counter()
+                    zoomed = execute_roi(original, plan, roi)
+                    cached = st.session_state.roi_result = (roi_key, zoomed, (time.perf_counter() - t0) * 1000)
+                _, zoomed, roi_ms = cached
+                show(zoomed, 1, ext=".png")  # zoom is for detail: lossless
+                area = zoomed.shape[0] * zoomed.shape[1] / (out_rows * out_cols)
+                st.caption(f"{zoomed.shape[1]}×{zoomed.shape[0]} ({area:.1%} of the result) computed in {roi_ms:.1f} ms")
+        else:
+            st.session_state.pop('roi_result', None)
+
+# ========================================
+# MODE 3: NON-LINEAR WARPS
+# ========================================
+elif mode == "🌀 Non-linear Warps":
+    st.markdown("### 🌀 Non-linear Warps")
+    st.info("Warps that cannot be written as a single matrix. Each one builds a sampling grid (map_x, map_y) and resamples the image with cv2.remap.")
+    
+    img_array = st.session_state.current_image
+    rows, cols = img_array.shape[:2]
+    
+    warp_type = st.selectbox(
+        "Select Warp",
+        ["Lens Distortion", "Lens Undistortion", "Barrel / Pincushion", "Swirl", "Polar", "Log-Polar"]
+    )
+    
+    col1, col2 = st.columns([1, 2])
+    
+    with col1:
+        st.markdown("#### ⚙️ Warp Parameters")
+        
+        if warp_type in ("Lens Distortion", "Lens Undistortion"):
+            k1 = st.slider("k₁ (radial)", -0.5, 0.5, 0.2, 0.01)
+            k2 = st.slider("k₂ (radial)", -0.2, 0.2, 0.05, 0.01)
+            warp_params = {"k1": k1, "k2": k2}
+            
+            st.markdown("**Radial Model:**")
+            st.latex(r"""
+            r_d = r_u \left(1 + k_1 r_u^2 + k_2 r_u^4\right)
+            """)
+            
+        elif warp_type == "Barrel / Pincushion":
+            strength = st.slider("Strength", -0.5, 0.5, 0.3, 0.01,
+                                 help="Positive = barrel, Negative = pincushion")
+            warp_params = {"strength": strength}
+            
+            st.latex(r"""
+            r' = r \left(1 - s \cdot r^2\right)
+            """)
+            
+        elif warp_type == "Swirl":
+            strength = st.slider("Strength", -10.0, 10.0, 3.0, 0.5)
+            radius = st.slider("Radius", 0.05, 1.0, 0.5, 0.05,
+                               help="Fraction of the half-diagonal")
+            rotation = st.slider("Rotation (degrees)", -180, 180, 0, 5)
+            warp_params = {"strength": strength, "radius": radius, "rotation": rotation}
+            
+            st.latex(r"""
+            \theta' = \theta + \phi + s \cdot e^{-\rho \ln 2 / r}
+            """)
+            
+        else:  # Polar / Log-Polar
+            warp_params = {}
+            st.markdown("Columns = angle (0 → 2π), rows = radius from the image centre.")
+            if warp_type == "Log-Polar":
+                st.latex(r"""
+                \rho = e^{\, y \cdot \ln(R + 1) / H} - 1
+                """)
+            else:
+                st.latex(r"""
+                \rho = y \cdot R / H
+                """)
+        
+        warped = preview(img_array, [remap_op(warp_type, warp_params)])
+        st.caption(f"Grid cache: {grid_cache.hits} hits / {grid_cache.misses} builds")
+        
+        if st.button("✨ Apply Warp", use_container_width=True, type="primary"):
+            commit_step(warped, {
+                'type': warp_type,
+                'matrix': None,
+                'params': warp_params,
+                'stages': [transform_stage(warp_type, **warp_params)],
+                'timestamp': st.session_state.get('transform_count', 0) + 1
+            })
+            st.success(f"✅ {warp_type} applied!")
+            st.rerun()
+    
+    with col2:
+        st.markdown("#### 🖼️ Result Preview")
+        
+        col_b, col_a = st.columns(2)
+        
+        with col_b:
+            st.markdown("**Before**")
+            show(img_array, 1 / 3)
+        
+        with col_a:
+            st.markdown("**After**")
+            show(warped, 1 / 3)
 
 # ========================================
-# MODE 3: FILTERS
+# MODE 4: FILTERS
 # ========================================
-else:  # Filters mode
+elif mode == "🎨 Filters":
     st.markdown("### 🎨 Image Filters")
     st.info("Apply various filters to enhance or modify your image.")
     
     img_array = st.session_state.current_image
+    rows, cols = img_array.shape[:2]
     
     filter_type = st.selectbox(
         "Select Filter",
-        ["Gaussian Blur", "Sharpen", "Edge Detection", "Brightness/Contrast", "Grayscale"]
+        ["Gaussian Blur", "Sharpen", "Edge Detection", "Brightness/Contrast", "Tone Curve", "Grayscale", "Colour Matrix"]
     )
     
+    with st.expander("🎯 Region", expanded=st.session_state.get('region_kind', "Whole image") != "Whole image"):
+        region = region_controls(cols, rows)
+    
     col1, col2 = st.columns([1, 2])
     
     with col1:
@@ -416,7 +980,7 @@ else:  # Filters mode
             if kernel_size % 2 == 0:
                 kernel_size += 1
             
-            filtered = cv2.GaussianBlur(img_array, (kernel_size, kernel_size), 0)
+            stage = filter_stage("Gaussian Blur", kernel_size=kernel_size)
             
             st.markdown("**Kernel Matrix (simplified):**")
             st.latex(r"""
@@ -430,13 +994,7 @@ else:  # Filters mode
         elif filter_type == "Sharpen":
             strength = st.slider("Sharpening Strength", 0.0, 2.0, 1.0, 0.1)
             
-            kernel = np.array([
-                [0, -1, 0],
-                [-1, 5, -1],
-                [0, -1, 0]
-            ]) * strength
-            
-            filtered = cv2.filter2D(img_array, -1, kernel)
+            stage = filter_stage("Sharpen", strength=strength)
             
             st.markdown("**Sharpen Kernel:**")
             st.latex(r"""
@@ -451,11 +1009,7 @@ else:  # Filters mode
             method = st.radio("Method", ["Sobel", "Canny"])
             
             if method == "Sobel":
-                gray = cv2.cvtColor(img_array, cv2.COLOR_RGB2GRAY)
-                sobelx = cv2.Sobel(gray, cv2.CV_64F, 1, 0, ksize=3)
-                sobely = cv2.Sobel(gray, cv2.CV_64F, 0, 1, ksize=3)
-                filtered = np.uint8(np.sqrt(sobelx**2 + sobely**2))
-                filtered = cv2.cvtColor(filtered, cv2.COLOR_GRAY2RGB)
+                stage = filter_stage("Edge Detection", method="Sobel")
                 
                 st.markdown("**Sobel X Kernel:**")
                 st.latex(r"""
@@ -468,15 +1022,15 @@ else:  # Filters mode
             else:
                 threshold1 = st.slider("Threshold 1", 0, 255, 100)
                 threshold2 = st.slider("Threshold 2", 0, 255, 200)
-                gray = cv2.cvtColor(img_array, cv2.COLOR_RGB2GRAY)
-                edges = cv2.Canny(gray, threshold1, threshold2)
-                filtered = cv2.cvtColor(edges, cv2.COLOR_GRAY2RGB)
+                stage = filter_stage("Edge Detection", method="Canny",
+                                     threshold1=threshold1, threshold2=threshold2)
         
         elif filter_type == "Brightness/Contrast":
             brightness = st.slider("Brightness", -100, 100, 0)
             contrast = st.slider("Contrast", 0.5, 3.0, 1.0, 0.1)
             
-            filtered = cv2.convertScaleAbs(img_array, alpha=contrast, beta=brightness)
+            # Compiled into a 256-entry lookup table: one cv2.LUT pass
+            stage = filter_stage("Brightness/Contrast", brightness=brightness, contrast=contrast)
             
             st.markdown("**Formula:**")
             st.latex(r"""
@@ -485,17 +1039,124 @@ else:  # Filters mode
             st.markdown(f"α (contrast) = {contrast:.2f}")
             st.markdown(f"β (brightness) = {brightness}")
             
-        else:  # Grayscale
-            gray = cv2.cvtColor(img_array, cv2.COLOR_RGB2GRAY)
-            filtered = cv2.cvtColor(gray, cv2.COLOR_GRAY2RGB)
+        elif filter_type == "Tone Curve":
+            tone_ops = st.multiselect(
+                "Tone Adjustments (applied in order)",
+                ["Brightness", "Contrast", "Gamma", "Levels", "Curve"],
+                default=["Gamma"]
+            )
+            
+            tone_steps = []
+            for op in tone_ops:
+                st.markdown(f"**{op}**")
+                channels = st.radio("Channels", ["RGB", "R", "G", "B"], horizontal=True,
+                                    key=f"tone_ch_{op}")
+                if op == "Brightness":
+                    params = {'beta': st.slider("β", -100, 100, 20, key="tone_beta")}
+                elif op == "Contrast":
+                    params = {'alpha': st.slider("α", 0.5, 3.0, 1.2, 0.1, key="tone_alpha"),
+                              'pivot': 128.0}
+                elif op == "Gamma":
+                    params = {'gamma': st.slider("γ", 0.2, 5.0, 1.8, 0.1, key="tone_gamma",
+                                                 help="> 1 brightens midtones")}
+                elif op == "Levels":
+                    in_black, in_white = st.slider("Input Levels", 0, 255, (10, 245), key="tone_in")
+                    out_black, out_white = st.slider("Output Levels", 0, 255, (0, 255), key="tone_out")
+                    params = {'in_black': in_black, 'in_white': in_white,
+                              'out_black': out_black, 'out_white': out_white}
+                else:  # Curve
+                    shadows = st.slider("Output at 64", 0, 255, 50, key="tone_c64")
+                    mids = st.slider("Output at 128", 0, 255, 128, key="tone_c128")
+                    highs = st.slider("Output at 192", 0, 255, 210, key="tone_c192")
+                    params = {'points': [(0, 0), (64, shadows), (128, mids), (192, highs), (255, 255)]}
+                tone_steps.append({'type': op, 'params': params, 'channels': channels})
+            
+            # Every step folds into the same 256-entry table per channel
+            lut = compile_lut(tone_steps)
+            stage = filter_stage("Tone Curve", steps=tone_steps)
+            
+            st.markdown("**Lookup Table (input → output):**")
+            st.line_chart({ch: lut[:, 0, c] for c, ch in enumerate("RGB")}, height=200)
+            
+        elif filter_type == "Grayscale":
+            stage = filter_stage("Grayscale")
             
             st.markdown("**Conversion Formula:**")
             st.latex(r"""
             Gray = 0.299R + 0.587G + 0.114B
             """)
+            
+        else:  # Colour Matrix
+            adjustments = st.multiselect(
+                "Adjustments (applied in order)",
+                ["Sepia", "Grayscale", "Saturation", "White Balance", "Channel Swap", "Invert"],
+                default=["Sepia"]
+            )
+            
+            color_matrices = []
+            for adj in adjustments:
+                if adj == "Saturation":
+                    sat = st.slider("Saturation", 0.0, 3.0, 1.5, 0.1,
+                                    help="0 = grayscale, 1 = original")
+                    color_matrices.append(saturation_matrix(sat))
+                elif adj == "White Balance":
+                    wb_r = st.slider("Red Gain", 0.5, 2.0, 1.0, 0.05)
+                    wb_g = st.slider("Green Gain", 0.5, 2.0, 1.0, 0.05)
+                    wb_b = st.slider("Blue Gain", 0.5, 2.0, 1.0, 0.05)
+                    color_matrices.append(white_balance_matrix(wb_r, wb_g, wb_b))
+                elif adj == "Channel Swap":
+                    order = st.selectbox("Channel Order", ["BGR", "GBR", "BRG", "RBG", "GRB"])
+                    color_matrices.append(channel_swap_matrix(order))
+                else:
+                    color_matrices.append(COLOR_PRESETS[adj]())
+            
+            if st.checkbox("Custom 3×4 matrix"):
+                custom = np.eye(3, 4)
+                for r, ch in enumerate("RGB"):
+                    row_cols = st.columns(4)
+                    for c in range(4):
+                        with row_cols[c]:
+                            custom[r, c] = st.number_input(
+                                f"{ch}' ← {'RGB'[c] if c < 3 else 'offset'}",
+                                value=float(custom[r, c]), step=0.05 if c < 3 else 5.0,
+                                format="%.3f", key=f"color_m{r}{c}")
+                color_matrices.append(custom)
+            
+            # Whole chain composed into one matrix → one pass over the pixels
+            color_M = compose_color(color_matrices)
+            stage = filter_stage("Colour Matrix", matrix=np.round(color_M, 6).tolist())
+            
+            st.markdown("**Composed Colour Matrix:**")
+            st.latex(f"""
+            \\begin{{bmatrix}} R' \\\\ G' \\\\ B' \\end{{bmatrix}} =
+            \\begin{{bmatrix}}
+            {color_M[0,0]:.3f} & {color_M[0,1]:.3f} & {color_M[0,2]:.3f} & {color_M[0,3]:.1f} \\\\
+            {color_M[1,0]:.3f} & {color_M[1,1]:.3f} & {color_M[1,2]:.3f} & {color_M[1,3]:.1f} \\\\
+            {color_M[2,0]:.3f} & {color_M[2,1]:.3f} & {color_M[2,2]:.3f} & {color_M[2,3]:.1f}
+            \\end{{bmatrix}}
+            \\begin{{bmatrix}} R \\\\ G \\\\ B \\\\ 1 \\end{{bmatrix}}
+            """)
+        
+        # Preview, Apply and recipe replay share the engine path; with a
+        # region only its bounding box plus the kernel halo is computed
+        if region is not None:
+            stage['params']['region'] = region
+        t0 = time.perf_counter()
+        filtered = preview(img_array, compile_stages([stage], (rows, cols, 1 if img_array.ndim == 2 else img_array.shape[2])))
+        filter_ms = (time.perf_counter() - t0) * 1000
+        if region is not None:
+            x0, y0, x1, y1 = region_bbox(region, img_array.shape)
+            st.caption(f"Region box {x1 - x0}×{y1 - y0} ({(x1 - x0) * (y1 - y0) / (rows * cols):.1%} of the image), "
+                       f"computed in {filter_ms:.1f} ms")
         
         if st.button("✨ Apply Filter", use_container_width=True, type="primary"):
-            st.session_state.current_image = filtered
+            commit_step(filtered, {
+                'type': filter_type,
+                'matrix': None,
+                'params': stage['params'],
+                'stages': [stage],
+                'timestamp': st.session_state.get('transform_count', 0) + 1
+            })
             st.success(f"✅ {filter_type} applied!")
             st.rerun()
     
@@ -506,11 +1167,205 @@ else:  # Filters mode
         
         with col_b:
             st.markdown("**Before**")
-            st.image(img_array, use_container_width=True, channels="RGB")
+            show(img_array, 1 / 3)
         
         with col_a:
             st.markdown("**After**")
-            st.image(filtered, use_container_width=True, channels="RGB")
+            show(filtered, 1 / 3)
+
+# ========================================
+# MODE 5: GALLERY
+# ========================================
+elif mode == "🖼️ Gallery":
+    st.markdown("### 🖼️ Gallery Mode")
+    st.info("Apply the current pipeline (every step applied to the loaded image so far) to many images at once. Images are processed in parallel and written into a ZIP as they finish.")
+    
+    gallery_stages = session_stages(st.session_state.transformation_history)
+    if gallery_stages:
+        st.caption("Pipeline: " + " → ".join(s['type'] for s in gallery_stages))
+    else:
+        st.warning("⚠️ No steps applied yet; images will be copied unchanged.")
+    
+    gallery_files = st.file_uploader(
+        "Choose image files",
+        type=["png", "jpg", "jpeg", "bmp"],
+        accept_multiple_files=True,
+        key="gallery_upload"
+    )
+    max_workers = max(2, os.cpu_count() or 4)
+    workers = st.slider("Worker threads", 1, max_workers, min(4, max_workers),
+                        help="OpenCV releases the GIL, so threads process images in parallel")
+    
+    if gallery_files and st.button("▶️ Process Gallery", type="primary", use_container_width=True):
+        runner = RecipeRunner(make_recipe(gallery_stages))
+        # The previous batch's ZIP is deleted now; the last one goes with the session
+        old_zip = st.session_state.pop('gallery_zip', None)
+        if old_zip is not None:
+            old_zip.remove()
+        st.session_state.gallery_download = False
+        zip_file = TempFile(prefix="gallery-", suffix=".zip")
+        
+        progress = st.progress(0.0)
+        status = st.empty()
+        grid = st.columns(4)
+        tiles, names = [], set()
+        t0 = time.perf_counter()
+        
+        # Only the workers hold decoded images; finished PNGs go straight into the ZIP file
+        with zipfile.ZipFile(zip_file.path, "w", zipfile.ZIP_STORED) as zf, \
+                ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = {pool.submit(gallery_job, runner, f.name, f): f.name for f in gallery_files}
+            for done, future in enumerate(as_completed(futures), 1):
+                try:
+                    name, png, thumb = future.result()
+                except Exception as e:
+                    # One bad image (undecodable, too large, OpenCV error) must not end the batch
+                    tile = (futures[future], None, f"{type(e).__name__}: {e}")
+                else:
+                    arcname = os.path.splitext(name)[0] + ".png"
+                    while arcname in names:
+                        arcname = "_" + arcname
+                    names.add(arcname)
+                    zf.writestr(arcname, png)
+                    tile = (arcname, thumb, None)
+                with grid[len(tiles) % 4]:
+                    gallery_tile(*tile)
+                tiles.append(tile)
+                elapsed = time.perf_counter() - t0
+                progress.progress(done / len(futures))
+                status.caption(f"{done}/{len(futures)} images · {done / elapsed:.1f} img/s")
+        
+        st.session_state.gallery_zip = zip_file
+        st.session_state.gallery_thumbs = tiles
+    elif st.session_state.get('gallery_thumbs'):
+        grid = st.columns(4)
+        for idx, tile in enumerate(st.session_state.gallery_thumbs):
+            with grid[idx % 4]:
+                gallery_tile(*tile)
+    
+    tiles = st.session_state.get('gallery_thumbs') or []
+    failed = sum(thumb is None for _, thumb, _ in tiles)
+    if failed:
+        st.warning(f"⚠️ {failed} of {len(tiles)} image(s) failed and are not in the ZIP")
+    zip_file = st.session_state.get('gallery_zip')
+    if zip_file is not None and zip_file.size:
+        st.caption(f"ZIP size: {zip_file.size / 1024 / 1024:.1f} MB")
+        # st.download_button reads its data into memory on every run it is drawn in,
+        # so the ZIP is only loaded between an explicit request and the download
+        if st.session_state.get('gallery_download'):
+            if st.download_button(
+                label="📥 Download Gallery (ZIP)",
+                data=zip_file.read(),
+                file_name="gallery.zip",
+                mime="application/zip",
+                use_container_width=True,
+                key="gallery_zip_download"
+            ):
+                st.session_state.gallery_download = False
+        elif st.button("📦 Prepare ZIP download", use_container_width=True):
+            st.session_state.gallery_download = True
+            st.rerun()
+
+# ========================================
+# MODE 6: VIDEO / GIF
+# ========================================
+elif mode == "🎞️ Video / GIF":
+    st.markdown("### 🎞️ Video / GIF Mode")
+    from service.video import transcode  # only this mode needs the video pipeline
+    
+    st.info("Apply the current pipeline to every frame of a video or animated GIF. Frames are decoded, transformed and encoded as a stream with constant memory, and the warp maps are built once for all frames.")
+    
+    video_stages = session_stages(st.session_state.transformation_history)
+    if video_stages:
+        st.caption("Pipeline: " + " → ".join(s['type'] for s in video_stages))
+    else:
+        st.warning("⚠️ No steps applied yet; frames will be copied unchanged.")
+    
+    video_file = st.file_uploader(
+        "Choose a video or animated GIF",
+        type=["gif", "mp4", "avi", "mov", "mkv"],
+        key="video_upload"
+    )
+    
+    if video_file is not None:
+        in_ext = os.path.splitext(video_file.name)[1].lower()
+        vcol1, vcol2 = st.columns(2)
+        with vcol1:
+            out_ext = st.selectbox("Output Format", [".gif", ".mp4"] if in_ext == ".gif" else [".mp4", ".avi", ".gif"])
+        with vcol2:
+            max_workers = max(2, os.cpu_count() or 4)
+            frame_workers = st.slider("Frame worker threads", 1, max_workers, min(2, max_workers))
+        
+        if st.button("▶️ Process Video", type="primary", use_container_width=True):
+            src_file = TempFile(prefix="video-src-", suffix=in_ext)
+            with open(src_file.path, "wb") as f:
+                f.write(video_file.getbuffer())
+            # The previous output is deleted now; the last one goes with the session
+            old_out = st.session_state.pop('video_out', None)
+            if old_out is not None:
+                old_out.remove()
+            st.session_state.video_download = False
+            out_file = TempFile(prefix="video-", suffix=out_ext)
+            
+            progress = st.progress(0.0)
+            fps_text = st.empty()
+            
+            def report(done, total, fps):
+                if total:
+                    progress.progress(min(done / total, 1.0))
+                fps_text.caption(f"Frame {done}/{total or '?'} · {fps:.1f} fps")
+            
+            try:
+                stats = transcode(src_file.path, out_file.path, make_recipe(video_stages),
+                                  frame_workers, report)
+            except (ValueError, cv2.error, OSError) as e:
+                # Unreadable input, unsupported codec or container, disk errors
+                out_file.remove()
+                st.error(f"❌ {e}")
+            else:
+                st.session_state.video_stats = stats
+                st.session_state.video_out = out_file
+            finally:
+                src_file.remove()
+    
+    video_out = st.session_state.get('video_out')
+    if video_out is not None and video_out.size:
+        stats = st.session_state.video_stats
+        m1, m2, m3 = st.columns(3)
+        m1.metric("Frames", stats['frames'])
+        m2.metric("Throughput", f"{stats['fps']:.1f} fps")
+        m3.metric("Source Frame Rate", f"{stats['source_fps']:.1f} fps")
+        
+        out_ext = os.path.splitext(video_out.path)[1]
+        if out_ext == ".gif":
+            st.image(video_out.path)
+        else:
+            st.video(video_out.path)
+        st.caption(f"Output size: {video_out.size / 1024 / 1024:.1f} MB")
+        # As for the gallery ZIP: the file is only read between an explicit request and the download
+        if st.session_state.get('video_download'):
+            if st.download_button(
+                label="📥 Download Result",
+                data=video_out.read(),
+                file_name=f"transformed{out_ext}",
+                mime={".gif": "image/gif", ".mp4": "video/mp4", ".avi": "video/x-msvideo"}[out_ext],
+                use_container_width=True,
+                key="video_result_download"
+            ):
+                st.session_state.video_download = False
+        elif st.button("📦 Prepare video download", use_container_width=True):
+            st.session_state.video_download = True
+            st.rerun()
+
+# ========================================
+# INSPECT - ZOOMABLE RESULT VIEWER
+# ========================================
+st.markdown("---")
+
+if st.toggle("🔎 Inspect result (zoom & pan)", key="inspect",
+             help="Browse the current image at up to 4× without sending the whole image: "
+                  "it is split into pyramid levels and tiles, and only the visible tiles are encoded."):
+    inspect_viewer()
 
 # ========================================
 # BOTTOM SECTION - HISTORY & DOWNLOAD
@@ -525,19 +1380,17 @@ with bottom_col1:
         
         for idx, trans in enumerate(st.session_state.transformation_history[-5:]):
             with st.expander(f"Transform {idx+1}: {trans['type']}"):
-                st.code(str(trans['matrix']), language="python")
+                if trans.get('matrix') is not None:
+                    st.code(str(trans['matrix']), language="python")
+                else:
+                    st.code(str(trans.get('params', {})), language="python")
 
 with bottom_col2:
     st.markdown("### 💾 Download Results")
     
     if st.session_state.current_image is not None:
-        # Convert to PIL Image
-        result_image = Image.fromarray(st.session_state.current_image)
-        
-        # Save to bytes
-        buf = io.BytesIO()
-        result_image.save(buf, format='PNG')
-        byte_im = buf.getvalue()
+        # Encoded once per image version, not on every rerun
+        byte_im = display_cache.encoded(st.session_state.current_image, ".png")
         
         st.download_button(
             label="📥 Download Transformed Image",
@@ -546,9 +1399,73 @@ with bottom_col2:
             mime="image/png",
             use_container_width=True
         )
+        work = st.session_state.get('work_buffer')
+        if work is not None:
+            # Converted and encoded once per working-buffer version, not on every rerun
+            cached = st.session_state.get('work_png16')
+            if cached is None or cached[0] is not work or cached[1] != work.version:
+                cached = st.session_state.work_png16 = (work, work.version, encode_image(work.to_uint16()))
+            st.download_button(
+                label="📥 Download 16-bit PNG",
+                data=cached[2],
+                file_name="transformed_image_16bit.png",
+                mime="image/png",
+                use_container_width=True
+            )
         
         # Statistics
         st.markdown("**Image Stats:**")
         st.metric("Width", f"{st.session_state.current_image.shape[1]} px")
         st.metric("Height", f"{st.session_state.current_image.shape[0]} px")
-        st.metric("Transforms Applied", len(st.session_state.transformation_history))
\ No newline at end of file
+        st.metric("Transforms Applied", len(st.session_state.transformation_history))
+        pool = st.session_state.buffers
+        st.caption(f"Output buffers: {pool.hits} reused / {pool.misses} allocated, {pool.nbytes / 1e6:.1f} MB pooled")
+
+        # Recipe: the stages that turn the original into the current image
+        st.markdown("**📋 Recipe:**")
+        recipe = make_recipe(session_stages(st.session_state.transformation_history))
+        st.caption(f"{len(recipe['stages'])} stage(s) from the original image")
+        st.download_button(
+            label="📥 Download Recipe (JSON)",
+            data=dumps_recipe(recipe),
+            file_name="recipe.json",
+            mime="application/json",
+            use_container_width=True
+        )
+        try:
+            st.download_button(
+                label="📥 Download Recipe (YAML)",
+                data=dumps_recipe(recipe, fmt="yaml"),
+                file_name="recipe.yaml",
+                mime="application/x-yaml",
+                use_container_width=True
+            )
+        except RuntimeError:
+            pass
+
+        recipe_file = st.file_uploader("Upload recipe", type=['json', 'yaml', 'yml'],
+                                       key="recipe_upload")
+        if recipe_file is not None:
+            try:
+                uploaded_recipe = loads_recipe(recipe_file.getvalue())
+            except ValueError as e:
+                st.error(f"❌ Invalid recipe: {e}")
+            else:
+                st.caption(" → ".join(s['type'] for s in uploaded_recipe['stages']) or "(empty)")
+                if st.button("▶️ Replay Recipe on Original", use_container_width=True):
+                    replayed = None
+                    try:
+                        if st.session_state.get('work_buffer') is None:
+                            replayed = apply_recipe(st.session_state.original_image, uploaded_recipe)
+                        commit_step(replayed, {
+                            'type': f"Recipe: {uploaded_recipe.get('name', 'recipe')}",
+                            'matrix': None,
+                            'params': {'stages': len(uploaded_recipe['stages'])},
+                            'stages': uploaded_recipe['stages'],
+                            'from_original': True,
+                            'timestamp': st.session_state.get('transform_count', 0) + 1
+                        })
+                    except (ValueError, TypeError, KeyError, cv2.error, MemoryError) as e:
+                        st.error(f"❌ Recipe failed on this image: {e}")
+                    else:
+                        st.rerun()
\ No newline at end of file
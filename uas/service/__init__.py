@@ -0,0 +1 @@
+# Service lokal (hot folder, HTTP) di atas engine; dijalankan dengan python -m service.<nama>
@@ -0,0 +1,87 @@
+import os
+import tempfile
+import weakref
+
+import cv2
+import numpy as np
+
+# ========================================
+# IMAGE BYTES <-> RGB ARRAYS
+# ========================================
+# OpenCV membaca/menulis BGR, sedangkan engine dan Streamlit app bekerja
+# dalam RGB. Semua service memakai helper ini supaya konversinya konsisten.
+
+IMAGE_EXTENSIONS = {'.png', '.jpg', '.jpeg', '.bmp', '.tif', '.tiff', '.webp'}
+
+
+def is_image_name(name):
+    return os.path.splitext(name)[1].lower() in IMAGE_EXTENSIONS
+
+
+def decode_image(data):
+    """Decode encoded image bytes into an RGB (or single-channel) uint8 array."""
+    img = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+    if img is None:
+        raise ValueError("Cannot decode image")
+    return cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+
+
+def encode_image(img, ext=".png", quality=95):
+    """Encode an RGB/grayscale array; ext selects the format (.png, .jpg, .webp)."""
+    if img.ndim == 3 and img.shape[2] == 3:
+        img = cv2.cvtColor(img, cv2.COLOR_RGB2BGR)
+    params = []
+    if ext in (".jpg", ".jpeg"):
+        params = [cv2.IMWRITE_JPEG_QUALITY, quality]
+    elif ext == ".webp":
+        params = [cv2.IMWRITE_WEBP_QUALITY, quality]
+    ok, buf = cv2.imencode(ext, np.ascontiguousarray(img), params)
+    if not ok:
+        raise ValueError(f"Cannot encode image as {ext}")
+    return buf.tobytes()
+
+
+def atomic_write(path, data):
+    """Write bytes so readers only ever see the old file or the complete new one."""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp = tempfile.mkstemp(dir=directory, prefix=".tmp-", suffix=os.path.basename(path))
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+def _remove_quietly(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+class TempFile:
+    """A temporary file deleted on remove() or once nothing holds this handle.
+
+    Kept in Streamlit session state, the file goes away with the session.
+    """
+
+    def __init__(self, prefix="tmp-", suffix=""):
+        fd, self.path = tempfile.mkstemp(prefix=prefix, suffix=suffix)
+        os.close(fd)
+        self._finalizer = weakref.finalize(self, _remove_quietly, self.path)
+
+    @property
+    def size(self):
+        return os.path.getsize(self.path) if os.path.exists(self.path) else 0
+
+    def read(self):
+        with open(self.path, "rb") as f:
+            return f.read()
+
+    def remove(self):
+        self._finalizer()
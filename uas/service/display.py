@@ -0,0 +1,137 @@
+import os
+import threading
+import weakref
+from collections import OrderedDict
+
+import cv2
+
+from engine import image_key
+
+from .codec import encode_image
+
+# ========================================
+# DISPLAY IMAGES
+# ========================================
+# st.image(array) meng-encode array resolusi penuh sebagai PNG di setiap
+# rerun dan mengirimnya ke browser, yang lalu memperkecilnya ke lebar kolom.
+# DisplayCache membuat gambar tampilan di server: diperkecil (INTER_AREA)
+# ke lebar kolom yang dirender x device pixel ratio (dibatasi MAX_DPR),
+# di-encode JPEG/WebP kualitas preview, dan disimpan per versi gambar:
+#
+# - array read-only (upload bersama, output StageCache, session restore)
+#   tidak pernah berubah, jadi versinya adalah identitas array itu sendiri
+#   (tanpa hashing);
+# - array lain (preview, buffer pool) diberi key hash isi gambar yang sudah
+#   diperkecil, yang murah karena kecil.
+#
+# Panel yang tidak berubah menghasilkan bytes yang sama persis; media file
+# manager Streamlit memberi URL yang sama untuk bytes yang sama, sehingga
+# browser tidak mengunduhnya lagi. Cache dipakai bersama semua session.
+#
+# Lebar area konten (px CSS) tidak diketahui server; DISPLAY_WIDTH adalah
+# lebar layout "wide" yang umum dan bisa diubah lewat UAS_DISPLAY_WIDTH.
+# Lebar sebuah kolom = DISPLAY_WIDTH x fraksi kolom itu (mis. 1/3 untuk
+# tiga kolom), lalu dikali device pixel ratio yang dibatasi UAS_DISPLAY_DPR.
+
+DISPLAY_WIDTH = int(os.environ.get("UAS_DISPLAY_WIDTH", 1200))
+MAX_DPR = float(os.environ.get("UAS_DISPLAY_DPR", 2))
+PREVIEW_FORMAT = os.environ.get("UAS_DISPLAY_FORMAT", ".jpg")
+PREVIEW_QUALITY = 80
+CACHE_MAX_BYTES = 64 * 2**20
+
+
+def display_size(shape, width, dpr=MAX_DPR):
+    """(cols, rows) to encode for a column `width` CSS px wide; never upscales."""
+    rows, cols = shape[:2]
+    target = max(1, min(cols, int(round(width * dpr))))
+    return target, max(1, int(round(rows * target / cols)))
+
+
+class DisplayCache:
+    """Encoded display images keyed by image version, LRU-bounded by bytes."""
+
+    def __init__(self, max_bytes=CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._items = OrderedDict()
+        self._versions = {}  # id(array) -> (weakref, generation) for read-only arrays
+        self._generation = 0
+        # Reentrant: _forget runs from weakref callbacks, which the GC can fire
+        # on a thread that is already inside a locked section (any allocation)
+        self._lock = threading.RLock()
+
+    def _identity(self, img):
+        """Version key of a read-only array, or None when its contents may change."""
+        if img.flags.writeable:
+            return None
+        with self._lock:
+            ref, gen = self._versions.get(id(img), (None, None))
+            if ref is None or ref() is not img:
+                self._generation += 1
+                gen = self._generation
+                ref = weakref.ref(img, lambda r, i=id(img): self._forget(i, r))
+                self._versions[id(img)] = (ref, gen)
+            return ('id', id(img), gen)
+
+    def _forget(self, i, ref):
+        with self._lock:
+            if self._versions.get(i, (None,))[0] is ref:
+                del self._versions[i]
+
+    def _get(self, key):
+        with self._lock:
+            data = self._items.get(key)
+            if data is not None:
+                self._items.move_to_end(key)
+                self.hits += 1
+            else:
+                self.misses += 1
+            return data
+
+    def _put(self, key, data):
+        with self._lock:
+            if key in self._items:
+                return
+            self._items[key] = data
+            self.nbytes += len(data)
+            while self.nbytes > self.max_bytes and len(self._items) > 1:
+                _, old = self._items.popitem(last=False)
+                self.nbytes -= len(old)
+
+    def display(self, img, width, dpr=MAX_DPR, ext=PREVIEW_FORMAT, quality=PREVIEW_QUALITY):
+        """Encoded bytes of img sized for a column `width` CSS px wide."""
+        size = display_size(img.shape, width, dpr)
+        params = ('display', size, ext, quality)
+        version = self._identity(img)
+        if version is not None:
+            data = self._get(version + params)
+            if data is not None:
+                return data
+        small = img if size[0] == img.shape[1] else cv2.resize(img, size, interpolation=cv2.INTER_AREA)
+        key = (version or (image_key(small),)) + params
+        if version is None:
+            data = self._get(key)
+            if data is not None:
+                return data
+        data = encode_image(small, ext, quality)
+        self._put(key, data)
+        return data
+
+    def encoded(self, img, ext=".png", quality=95):
+        """Full-resolution encoded bytes (downloads), cached per image version."""
+        key = (self._identity(img) or (image_key(img),)) + ('full', ext, quality)
+        data = self._get(key)
+        if data is None:
+            data = encode_image(img, ext, quality)
+            self._put(key, data)
+        return data
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self.nbytes = 0
+
+
+display_cache = DisplayCache()
@@ -0,0 +1,237 @@
+import argparse
+import asyncio
+import json
+import os
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from engine import RecipeRunner, load_recipe
+
+from .codec import atomic_write, decode_image, encode_image, is_image_name
+
+# ========================================
+# HOT FOLDER
+# ========================================
+# Service yang memantau folder input dan memproses setiap gambar baru dengan
+# recipe (lihat engine/recipe.py):
+#
+#   scanner (asyncio) --> queue (terbatas) --> worker (thread pool) --> output
+#
+# - Scanner mem-poll folder dan hanya mengambil file yang ukuran/mtime-nya
+#   sudah stabil (tidak sedang ditulis). Jika queue penuh, scanner menunggu
+#   (backpressure) sehingga memori tetap terbatas berapa pun jumlah file.
+# - Decode, transform dan encode berjalan di thread pool; OpenCV melepas GIL
+#   sehingga worker benar-benar paralel.
+# - Output ditulis atomik (file sementara + os.replace).
+# - Journal JSONL mencatat file yang selesai/gagal setelah output ditulis.
+#   Setelah crash, file yang belum tercatat diproses ulang; baris terakhir
+#   yang terpotong diabaikan.
+#
+# Menjalankan (di folder uas/):
+#
+#   python -m service.hotfolder recipe.json masuk/ keluar/ --workers 4
+
+JOURNAL_NAME = ".hotfolder-journal.jsonl"
+
+
+class Journal:
+    """Append-only, fsync'ed record of processed input files."""
+
+    def __init__(self, path):
+        self.path = path
+        self.done = {}
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue  # torn write from a crash
+                    self.done[(entry['name'], entry['size'], entry['mtime_ns'])] = entry['status']
+        self._file = open(path, "a", encoding="utf-8")
+
+    def seen(self, key):
+        return key in self.done
+
+    def record(self, key, status, **extra):
+        name, size, mtime_ns = key
+        entry = {'name': name, 'size': size, 'mtime_ns': mtime_ns, 'status': status, **extra}
+        self._file.write(json.dumps(entry) + "\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self.done[key] = status
+
+    def close(self):
+        self._file.close()
+
+
+class Stats:
+    """Throughput and latency counters (latency = detected -> written)."""
+
+    def __init__(self, window=1000):
+        self.started = time.perf_counter()
+        self.processed = 0
+        self.failed = 0
+        self.latency_ms = deque(maxlen=window)
+        self.compute_ms = deque(maxlen=window)
+
+    def add(self, latency_ms, compute_ms):
+        self.processed += 1
+        self.latency_ms.append(latency_ms)
+        self.compute_ms.append(compute_ms)
+
+    def snapshot(self, queued=0):
+        elapsed = time.perf_counter() - self.started
+        lat = sorted(self.latency_ms)
+
+        def pct(p):
+            return lat[min(len(lat) - 1, int(p / 100 * len(lat)))] if lat else 0.0
+
+        return {
+            'processed': self.processed,
+            'failed': self.failed,
+            'queued': queued,
+            'images_per_s': self.processed / elapsed if elapsed else 0.0,
+            'p50_ms': pct(50),
+            'p99_ms': pct(99),
+            'mean_compute_ms': sum(self.compute_ms) / len(self.compute_ms) if self.compute_ms else 0.0,
+        }
+
+    def format(self, queued=0):
+        s = self.snapshot(queued)
+        return (f"processed={s['processed']} failed={s['failed']} queued={s['queued']} "
+                f"{s['images_per_s']:.1f} img/s p50={s['p50_ms']:.0f}ms p99={s['p99_ms']:.0f}ms "
+                f"compute={s['mean_compute_ms']:.0f}ms")
+
+
+class HotFolder:
+    def __init__(self, recipe, in_dir, out_dir, workers=None, queue_size=None,
+                 interval=1.0, out_ext=".png"):
+        if os.path.abspath(in_dir) == os.path.abspath(out_dir):
+            raise ValueError("Input and output folders must differ")
+        self.runner = RecipeRunner(recipe)
+        self.in_dir = in_dir
+        self.out_dir = out_dir
+        self.workers = workers or os.cpu_count() or 2
+        # Enough queued work to keep every worker busy, but no more
+        self.queue_size = queue_size or 2 * self.workers
+        self.interval = interval
+        self.out_ext = out_ext
+        os.makedirs(out_dir, exist_ok=True)
+        self.journal = Journal(os.path.join(out_dir, JOURNAL_NAME))
+        self.stats = Stats()
+        self._pending = set()   # keys queued or in flight
+        self._sizes = {}        # name -> (size, mtime_ns) from the previous scan
+
+    # ----------------------------------------
+    # Scanner
+    # ----------------------------------------
+
+    def _scan(self):
+        """Input files whose size and mtime did not change since the last scan."""
+        ready, sizes = [], {}
+        with os.scandir(self.in_dir) as it:
+            for entry in it:
+                if entry.name.startswith(".") or not entry.is_file() or not is_image_name(entry.name):
+                    continue
+                st = entry.stat()
+                sizes[entry.name] = (st.st_size, st.st_mtime_ns)
+                if self._sizes.get(entry.name) == sizes[entry.name]:
+                    ready.append((entry.name, st.st_size, st.st_mtime_ns))
+        self._sizes = sizes
+        return sorted(ready, key=lambda key: key[2])
+
+    async def _scanner(self, queue, once):
+        loop = asyncio.get_running_loop()
+        while True:
+            ready = await loop.run_in_executor(None, self._scan)
+            for key in ready:
+                if key in self._pending or self.journal.seen(key):
+                    continue
+                self._pending.add(key)
+                await queue.put((key, time.perf_counter()))  # blocks when full
+            if once and len(ready) == len(self._sizes):
+                return  # every file is stable and already queued or journaled
+            await asyncio.sleep(self.interval)
+
+    # ----------------------------------------
+    # Workers
+    # ----------------------------------------
+
+    def _process(self, key):
+        name = key[0]
+        with open(os.path.join(self.in_dir, name), "rb") as f:
+            data = f.read()
+        t0 = time.perf_counter()
+        result = self.runner(decode_image(data))
+        out_data = encode_image(result, self.out_ext)
+        compute_ms = (time.perf_counter() - t0) * 1000
+        out_path = os.path.join(self.out_dir, os.path.splitext(name)[0] + self.out_ext)
+        atomic_write(out_path, out_data)
+        return out_path, compute_ms
+
+    async def _worker(self, queue, pool):
+        loop = asyncio.get_running_loop()
+        while True:
+            key, detected = await queue.get()
+            try:
+                out_path, compute_ms = await loop.run_in_executor(pool, self._process, key)
+            except Exception as e:
+                self.stats.failed += 1
+                self.journal.record(key, "failed", error=str(e))
+                print(f"FAILED {key[0]}: {e}")
+            else:
+                latency_ms = (time.perf_counter() - detected) * 1000
+                self.stats.add(latency_ms, compute_ms)
+                self.journal.record(key, "done", output=os.path.basename(out_path),
+                                    ms=round(compute_ms, 1))
+            finally:
+                self._pending.discard(key)
+                queue.task_done()
+
+    async def _reporter(self, queue, every):
+        while True:
+            await asyncio.sleep(every)
+            print(self.stats.format(queue.qsize()))
+
+    async def run(self, once=False, report_every=10.0):
+        """Watch forever; with once=True, stop after the folder is drained."""
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="hotfolder") as pool:
+            workers = [asyncio.create_task(self._worker(queue, pool)) for _ in range(self.workers)]
+            reporter = asyncio.create_task(self._reporter(queue, report_every))
+            try:
+                await self._scanner(queue, once)
+                await queue.join()
+            finally:
+                for task in workers + [reporter]:
+                    task.cancel()
+                await asyncio.gather(*workers, reporter, return_exceptions=True)
+                self.journal.close()
+        return self.stats.snapshot()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Process images dropped into a folder with a recipe.")
+    parser.add_argument("recipe", help="recipe file (.json / .yaml)")
+    parser.add_argument("in_dir", help="folder to watch")
+    parser.add_argument("out_dir", help="folder for results and the journal")
+    parser.add_argument("--workers", type=int, default=None, help="worker threads (default: CPU count)")
+    parser.add_argument("--queue-size", type=int, default=None, help="max queued images (default: 2 × workers)")
+    parser.add_argument("--interval", type=float, default=1.0, help="poll interval in seconds")
+    parser.add_argument("--format", default="png", choices=["png", "jpg", "webp"], help="output format")
+    parser.add_argument("--once", action="store_true", help="process what is there, then exit")
+    args = parser.parse_args(argv)
+
+    folder = HotFolder(load_recipe(args.recipe), args.in_dir, args.out_dir, workers=args.workers,
+                       queue_size=args.queue_size, interval=args.interval, out_ext="." + args.format)
+    try:
+        asyncio.run(folder.run(once=args.once))
+    except KeyboardInterrupt:
+        pass
+    print(folder.stats.format())
+
+
+if __name__ == "__main__":
+    main()
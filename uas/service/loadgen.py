@@ -0,0 +1,96 @@
+import argparse
+import json
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from .codec import encode_image
+
+# ========================================
+# LOAD GENERATOR
+# ========================================
+# Mengirim request bersamaan ke service.server dan melaporkan latency
+# p50/p99 serta requests/s:
+#
+#   python -m service.server &
+#   python -m service.loadgen recipe.json --requests 500 --concurrency 16
+#
+# Dengan --unique N dipakai N gambar berbeda (N=0: setiap request unik),
+# sehingga result cache tidak menyembunyikan biaya transform.
+
+
+def _post(url, data, headers=None):
+    req = urllib.request.Request(url, data=data, headers=headers or {}, method="POST")
+    with urllib.request.urlopen(req) as resp:
+        return resp.read()
+
+
+def make_images(count, size, seed=0):
+    rng = np.random.default_rng(seed)
+    cols, rows = size
+    base = (rng.random((rows, cols, 3)) * 255).astype(np.uint8)
+    images = []
+    for i in range(count):
+        img = base.copy()
+        img[0, 0] = (i % 256, (i // 256) % 256, 0)  # distinct bytes, same geometry
+        images.append(encode_image(img))
+    return images
+
+
+def run_load(url, recipe_text, images, requests, concurrency, fmt="png"):
+    recipe_id = json.loads(_post(f"{url}/recipes", recipe_text.encode()))['id']
+    target = f"{url}/transform?recipe={recipe_id}&format={fmt}"
+    latencies = []
+
+    def one(i):
+        t0 = time.perf_counter()
+        _post(target, images[i % len(images)], {'Content-Type': "application/octet-stream"})
+        latencies.append((time.perf_counter() - t0) * 1000)
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, range(requests)))
+    elapsed = time.perf_counter() - t0
+
+    lat = np.array(latencies)
+    return {
+        'requests': requests,
+        'concurrency': concurrency,
+        'req_per_s': requests / elapsed,
+        'p50_ms': float(np.percentile(lat, 50)),
+        'p99_ms': float(np.percentile(lat, 99)),
+        'max_ms': float(lat.max()),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load-test the local transform service.")
+    parser.add_argument("recipe", help="recipe file (.json / .yaml)")
+    parser.add_argument("--url", default="http://127.0.0.1:8765")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--size", default="800x600", help="image size COLSxROWS")
+    parser.add_argument("--unique", type=int, default=0,
+                        help="number of distinct images (0 = one per request)")
+    parser.add_argument("--format", default="png", choices=["png", "jpg", "webp"])
+    args = parser.parse_args(argv)
+
+    size = tuple(int(v) for v in args.size.lower().split("x"))
+    with open(args.recipe, encoding="utf-8") as f:
+        recipe_text = f.read()
+    images = make_images(args.unique or args.requests, size)
+
+    r = run_load(args.url, recipe_text, images, args.requests, args.concurrency, args.format)
+    server_stats = json.loads(urllib.request.urlopen(f"{args.url}/stats").read())
+    print(f"{r['requests']} requests, concurrency {r['concurrency']}: "
+          f"{r['req_per_s']:.1f} req/s  p50={r['p50_ms']:.1f}ms  p99={r['p99_ms']:.1f}ms  "
+          f"max={r['max_ms']:.1f}ms")
+    print(f"server: mean batch {server_stats['mean_batch']:.2f}, "
+          f"result cache hits {server_stats['result_cache']['hits']}, "
+          f"decoded cache hits {server_stats['decoded_cache']['hits']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+import threading
+import time
+
+# ========================================
+# PREWARM
+# ========================================
+# Import pertama cv2, matplotlib dan engine, serta panggilan pertama OpenCV
+# (inisialisasi IPP / thread pool), memakan waktu yang terasa pada request
+# pertama setelah deploy atau restart pod. prewarm() melakukan semua itu
+# sekali per proses di thread latar belakang, di luar jalur request:
+# halaman utama memanggilnya, jadi saat pengguna membuka halaman tool
+# modul-modul berat sudah ada di sys.modules.
+#
+# Pool strip engine juga dibuat di sini: pool itu membatasi thread internal
+# OpenCV untuk seluruh proses, jadi sebaiknya terjadi sekali saat startup,
+# bukan saat session pertama kebetulan memakainya.
+#
+# Modul ini sendiri sengaja tidak mengimpor apa pun yang berat.
+
+_lock = threading.Lock()
+_started = False
+timings = {}  # step -> seconds, filled in by the warm-up
+
+
+def _warm(plots):
+    t0 = time.perf_counter()
+    import cv2
+    import numpy as np
+    timings['cv2'] = time.perf_counter() - t0
+
+    if plots:
+        t = time.perf_counter()
+        import matplotlib.pyplot  # noqa: F401
+        timings['matplotlib'] = time.perf_counter() - t
+
+    t = time.perf_counter()
+    from engine import nonlinear_warp, shared_pool, warp
+    timings['engine'] = time.perf_counter() - t
+    shared_pool()
+
+    # One tiny call per code path initialises OpenCV's dispatch tables
+    t = time.perf_counter()
+    img = np.zeros((64, 64, 3), dtype=np.uint8)
+    warp(img, np.float64([[1, 0.2, 3], [0.1, 1, 2]]), (64, 64))
+    warp(img, np.float64([[1, 0.1, 0], [0, 1, 0], [0.001, 0, 1]]), (64, 64))
+    nonlinear_warp(img, "Swirl")
+    cv2.GaussianBlur(img, (5, 5), 0)
+    cv2.imencode(".png", img)
+    timings['first_calls'] = time.perf_counter() - t
+    timings['total'] = time.perf_counter() - t0
+
+
+def _run(plots):
+    # Best effort: a failed warm-up only means the first request pays the cost
+    try:
+        _warm(plots)
+    except Exception as e:
+        timings['error'] = repr(e)
+
+
+def prewarm(background=True, plots=True):
+    """Warm imports and OpenCV once per process; returns the thread (or None)."""
+    global _started
+    with _lock:
+        if _started:
+            return None
+        _started = True
+    if not background:
+        _run(plots)
+        return None
+    thread = threading.Thread(target=_run, args=(plots,), name="prewarm", daemon=True)
+    thread.start()
+    return thread
\ No newline at end of file
@@ -0,0 +1,129 @@
+import math
+import threading
+from collections import OrderedDict
+
+import cv2
+
+from .codec import encode_image
+
+# ========================================
+# IMAGE PYRAMID VIEWER
+# ========================================
+# Untuk memeriksa detail gambar besar (sampai 100 MP) tanpa pernah
+# meng-encode seluruh gambar untuk tampilan. Level 0 adalah gambar itu
+# sendiri, level k+1 = cv2.pyrDown(level k); level dibuat lazy saat zoom
+# pertama kali membutuhkannya (zoom 1:1 tidak membangun level apa pun).
+#
+# Setiap level dibagi menjadi tile TILE x TILE. Untuk zoom dan posisi
+# tertentu hanya tile yang terlihat di viewport yang di-encode (JPEG),
+# dan hasilnya disimpan (LRU terbatas byte), jadi geser dan zoom kembali
+# ke area yang sama tidak meng-encode ulang. Satu ImagePyramid berlaku
+# untuk satu versi gambar; buat yang baru saat gambarnya berganti.
+#
+# Zoom = piksel CSS per piksel gambar. Level yang dipakai adalah level
+# terkecil yang resolusinya masih >= zoom, sehingga browser hanya
+# memperkecil sedikit (paling banyak 2x).
+
+TILE = 256
+TILE_FORMAT = ".jpg"
+TILE_QUALITY = 90
+TILE_CACHE_BYTES = 64 * 2**20
+
+
+def _mime(ext):
+    return {'.jpg': "image/jpeg", '.jpeg': "image/jpeg", '.png': "image/png", '.webp': "image/webp"}[ext]
+
+
+class ImagePyramid:
+    """Lazily built pyrDown levels of one image, served as cached encoded tiles."""
+
+    def __init__(self, img, tile=TILE, ext=TILE_FORMAT, quality=TILE_QUALITY, max_bytes=TILE_CACHE_BYTES):
+        self.source = img
+        self.tile = tile
+        self.ext = ext
+        self.mime = _mime(ext)
+        self.quality = quality
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.encoded = 0
+        self._levels = [img]
+        self._tiles = OrderedDict()
+        self._lock = threading.Lock()
+
+        # pyrDown output is ceil(size / 2); stop once a level fits in one tile
+        rows, cols = img.shape[:2]
+        self.shapes = [(rows, cols)]
+        while max(rows, cols) > tile:
+            rows, cols = (rows + 1) // 2, (cols + 1) // 2
+            self.shapes.append((rows, cols))
+
+    @property
+    def levels_built(self):
+        return len(self._levels)
+
+    def level(self, k):
+        with self._lock:
+            while len(self._levels) <= k:
+                self._levels.append(cv2.pyrDown(self._levels[-1]))
+            return self._levels[k]
+
+    def level_for(self, zoom):
+        """(level, CSS px per level px) to show the image at zoom."""
+        k = 0 if zoom >= 1 else int(math.floor(-math.log2(zoom)))
+        k = min(k, len(self.shapes) - 1)
+        return k, zoom * self.shapes[0][1] / self.shapes[k][1]
+
+    def zoom_levels(self, view_w, view_h, max_zoom=4):
+        """Fit-to-view zoom followed by the power-of-two zooms above it."""
+        rows, cols = self.shapes[0]
+        fit = min(view_w / cols, view_h / rows, 1.0)
+        zooms = [fit]
+        z = 2.0 ** math.ceil(math.log2(fit) + 1e-9)
+        if z <= fit:
+            z *= 2
+        while z <= max_zoom:
+            zooms.append(z)
+            z *= 2
+        return zooms
+
+    def tile_bytes(self, k, tx, ty):
+        """Encoded tile (tx, ty) of level k."""
+        key = (k, tx, ty)
+        with self._lock:
+            data = self._tiles.get(key)
+            if data is not None:
+                self._tiles.move_to_end(key)
+                return data
+        t = self.tile
+        data = encode_image(self.level(k)[ty * t:(ty + 1) * t, tx * t:(tx + 1) * t], self.ext, self.quality)
+        with self._lock:
+            self.encoded += 1
+            if key not in self._tiles:
+                self._tiles[key] = data
+                self.nbytes += len(data)
+                while self.nbytes > self.max_bytes and len(self._tiles) > 1:
+                    _, old = self._tiles.popitem(last=False)
+                    self.nbytes -= len(old)
+        return data
+
+    def viewport(self, zoom, cx, cy, view_w, view_h):
+        """Tiles visible in a view_w x view_h CSS px window centred on source pixel (cx, cy).
+
+        Returns (level, [(tile bytes, left, top, width, height)]) with positions
+        in CSS px relative to the window.
+        """
+        k, scale = self.level_for(zoom)
+        rows, cols = self.shapes[k]
+        src_rows, src_cols = self.shapes[0]
+        # Window origin in level pixels
+        x0 = cx * cols / src_cols - view_w / (2 * scale)
+        y0 = cy * rows / src_rows - view_h / (2 * scale)
+        x1, y1 = x0 + view_w / scale, y0 + view_h / scale
+        t = self.tile
+        tiles = []
+        for ty in range(max(0, int(y0 // t)), min(int(math.ceil(min(y1, rows) / t)), (rows + t - 1) // t)):
+            for tx in range(max(0, int(x0 // t)), min(int(math.ceil(min(x1, cols) / t)), (cols + t - 1) // t)):
+                w, h = min(t, cols - tx * t), min(t, rows - ty * t)
+                tiles.append((self.tile_bytes(k, tx, ty), (tx * t - x0) * scale, (ty * t - y0) * scale,
+                              w * scale, h * scale))
+        return k, tiles
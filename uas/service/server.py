@@ -0,0 +1,357 @@
+import argparse
+import hashlib
+import json
+import sys
+import threading
+import time
+import traceback
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from engine import RecipeRunner, StageCache, loads_recipe
+
+from .codec import decode_image, encode_image
+from .hotfolder import Stats
+from .prewarm import prewarm
+
+# ========================================
+# HTTP TRANSFORM SERVICE
+# ========================================
+# Endpoint lokal untuk menjalankan recipe dari program lain:
+#
+#   POST /recipes                 body = recipe JSON/YAML  -> {"id": "..."}
+#   POST /transform?recipe=<id>   body = bytes gambar      -> bytes gambar hasil
+#        (atau header X-Recipe berisi recipe JSON; ?format=png|jpg|webp)
+#   GET  /stats                   counter throughput / latency / cache
+#
+# Request yang datang bersamaan dengan recipe dan ukuran gambar yang sama
+# dikumpulkan beberapa milidetik (micro-batch): plan optimasi dan remap grid
+# dibuat sekali untuk seluruh batch sebelum gambar-gambarnya diproses
+# paralel di worker pool, dan gambar identik dalam batch hanya dihitung
+# sekali. Gambar hasil decode dan hasil encode juga di-cache per isi.
+#
+# Menjalankan (di folder uas/):
+#
+#   python -m service.server --port 8765 --workers 4
+#
+# Recipe divalidasi saat didaftarkan (400 jika tidak valid); id yang tidak
+# dikenal -> 404; error lain saat memproses -> 500 dengan body JSON. Runner
+# recipe disimpan dalam LRU (max_recipes), jadi klien yang mendaftarkan
+# recipe baru terus-menerus tidak membuat memori tumbuh tanpa batas.
+
+
+class UnknownRecipe(LookupError):
+    """No registered recipe has this id (never registered, or evicted)."""
+
+
+class BytesLRU:
+    """Thread-safe LRU of encoded results with a byte budget."""
+
+    def __init__(self, max_bytes=256 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            data = self._items.get(key)
+            if data is None:
+                self.misses += 1
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+            return data
+
+    def put(self, key, data):
+        with self._lock:
+            if key in self._items:
+                return
+            self._items[key] = data
+            self.nbytes += len(data)
+            while self.nbytes > self.max_bytes and len(self._items) > 1:
+                _, old = self._items.popitem(last=False)
+                self.nbytes -= len(old)
+
+
+class MicroBatcher:
+    """Groups submitted jobs by key; each group is prepared once, then run.
+
+    A group is dispatched when it reaches max_batch jobs or its oldest job
+    has waited max_wait_ms. prepare(key) builds what the group shares (plan,
+    grids) in a worker; afterwards each distinct item runs as its own pool
+    task via run(key, item), so a batch still uses every worker. Jobs with
+    the same item_id are computed once.
+    """
+
+    def __init__(self, prepare, run, pool, max_batch=16, max_wait_ms=5.0):
+        self.prepare = prepare
+        self.run = run
+        self.pool = pool
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self._groups = OrderedDict()  # key -> (first_time, [(item_id, item, future)])
+        self._cond = threading.Condition()
+        self.batches = 0
+        self.batched_items = 0
+        threading.Thread(target=self._dispatch_loop, name="batcher", daemon=True).start()
+
+    def submit(self, key, item_id, item):
+        future = Future()
+        with self._cond:
+            group = self._groups.get(key)
+            if group is None:
+                group = self._groups[key] = (time.perf_counter(), [])
+            group[1].append((item_id, item, future))
+            self._cond.notify()
+        return future
+
+    def _take_ready(self, now):
+        ready = []
+        for key, (first, jobs) in list(self._groups.items()):
+            if len(jobs) >= self.max_batch or now - first >= self.max_wait:
+                del self._groups[key]
+                ready.append((key, jobs))
+        return ready
+
+    def _dispatch_loop(self):
+        while True:
+            with self._cond:
+                while not self._groups:
+                    self._cond.wait()
+                now = time.perf_counter()
+                ready = self._take_ready(now)
+                if not ready:
+                    oldest = min(first for first, _ in self._groups.values())
+                    self._cond.wait(max(0.0, oldest + self.max_wait - now))
+                    continue
+            for key, jobs in ready:
+                self.batches += 1
+                self.batched_items += len(jobs)
+                self.pool.submit(self._run_batch, key, jobs)
+
+    def _run_batch(self, key, jobs):
+        try:
+            self.prepare(key)
+        except Exception as e:
+            for _, _, future in jobs:
+                future.set_exception(e)
+            return
+        unique = OrderedDict()
+        for item_id, item, future in jobs:
+            unique.setdefault(item_id, (item, []))[1].append(future)
+        for item, futures in unique.values():
+            self.pool.submit(self._run_item, key, item, futures)
+
+    def _run_item(self, key, item, futures):
+        try:
+            result = self.run(key, item)
+        except Exception as e:
+            for future in futures:
+                future.set_exception(e)
+            return
+        for future in futures:
+            future.set_result(result)
+
+
+class TransformService:
+    def __init__(self, workers=4, max_batch=16, max_wait_ms=5.0,
+                 decoded_bytes=512 * 1024 * 1024, result_bytes=256 * 1024 * 1024, max_recipes=256):
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="transform")
+        self.batcher = MicroBatcher(self._prepare, self._run, self.pool, max_batch, max_wait_ms)
+        self.max_recipes = max_recipes
+        self.runners = OrderedDict()      # recipe id -> RecipeRunner, least recently used first
+        self._runners_lock = threading.Lock()
+        self.decoded = StageCache(decoded_bytes)
+        self._decoded_lock = threading.Lock()
+        self.results = BytesLRU(result_bytes)
+        self.stats = Stats()
+        self._stats_lock = threading.Lock()
+
+    # ----------------------------------------
+    # Recipes and caches
+    # ----------------------------------------
+
+    def register(self, recipe_text):
+        """Parse and store a recipe; returns its content id.
+
+        Raises ValueError for an invalid recipe (including bad stage params).
+        """
+        recipe = loads_recipe(recipe_text)
+        canonical = json.dumps(recipe['stages'], sort_keys=True)
+        recipe_id = hashlib.blake2b(canonical.encode(), digest_size=8).hexdigest()
+        with self._runners_lock:
+            if recipe_id in self.runners:
+                self.runners.move_to_end(recipe_id)
+            else:
+                self.runners[recipe_id] = RecipeRunner(recipe)
+                while len(self.runners) > self.max_recipes:
+                    self.runners.popitem(last=False)
+        return recipe_id
+
+    def runner(self, recipe_id):
+        """RecipeRunner for a registered id; raises UnknownRecipe."""
+        with self._runners_lock:
+            runner = self.runners.get(recipe_id)
+            if runner is None:
+                raise UnknownRecipe(recipe_id)
+            self.runners.move_to_end(recipe_id)
+            return runner
+
+    def _decode(self, data, data_key):
+        with self._decoded_lock:
+            img = self.decoded.get(data_key)
+            if img is not None:
+                self.decoded.hits += 1
+                return img
+            self.decoded.misses += 1
+        img = decode_image(data)
+        with self._decoded_lock:
+            self.decoded.put(data_key, img)
+        return img
+
+    # ----------------------------------------
+    # Transform
+    # ----------------------------------------
+
+    def transform(self, data, recipe_id, fmt="png"):
+        """Encoded result for encoded image bytes; blocks until done."""
+        runner = self.runner(recipe_id)
+        t0 = time.perf_counter()
+        data_key = hashlib.blake2b(data, digest_size=16).hexdigest()
+        result_key = (data_key, recipe_id, fmt)
+        out, compute_ms = self.results.get(result_key), 0.0
+        if out is None:
+            img = self._decode(data, data_key)
+            # Same recipe and same input geometry -> same plan and remap grids.
+            # The key holds the runner itself, so an LRU eviction meanwhile is harmless
+            batch_key = (runner, img.shape, fmt)
+            out, compute_ms = self.batcher.submit(batch_key, data_key, img).result()
+            self.results.put(result_key, out)
+        ms = (time.perf_counter() - t0) * 1000
+        with self._stats_lock:
+            self.stats.add(ms, compute_ms)
+        return out
+
+    def _prepare(self, batch_key):
+        runner, shape, _ = batch_key
+        runner.prepare(shape)
+
+    def _run(self, batch_key, img):
+        runner, _, fmt = batch_key
+        t0 = time.perf_counter()
+        out = encode_image(runner(img), "." + fmt)
+        return out, (time.perf_counter() - t0) * 1000
+
+    def snapshot(self):
+        with self._stats_lock:
+            s = self.stats.snapshot()
+        s.update({
+            'recipes': len(self.runners),
+            'batches': self.batcher.batches,
+            'mean_batch': self.batcher.batched_items / self.batcher.batches if self.batcher.batches else 0.0,
+            'decoded_cache': {'hits': self.decoded.hits, 'misses': self.decoded.misses,
+                              'mb': self.decoded.nbytes / 1e6},
+            'result_cache': {'hits': self.results.hits, 'misses': self.results.misses,
+                             'mb': self.results.nbytes / 1e6},
+        })
+        return s
+
+
+# ========================================
+# HTTP
+# ========================================
+
+MIME = {'png': "image/png", 'jpg': "image/jpeg", 'webp': "image/webp"}
+
+
+def make_handler(service):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def _send(self, code, body, content_type="application/json"):
+            if isinstance(body, (dict, list)):
+                body = json.dumps(body).encode()
+            self.send_response(code)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _body(self):
+            return self.rfile.read(int(self.headers.get("Content-Length", 0)))
+
+        def do_GET(self):
+            path = urlparse(self.path).path
+            if path == "/stats":
+                self._send(200, service.snapshot())
+            elif path == "/health":
+                self._send(200, {'status': "ok"})
+            else:
+                self._send(404, {'error': "not found"})
+
+        def do_POST(self):
+            url = urlparse(self.path)
+            query = parse_qs(url.query)
+            try:
+                if url.path == "/recipes":
+                    self._send(200, {'id': service.register(self._body())})
+                elif url.path == "/transform":
+                    fmt = query.get('format', ["png"])[0]
+                    if fmt not in MIME:
+                        raise ValueError(f"Unsupported format: {fmt}")
+                    data = self._body()
+                    if "X-Recipe" in self.headers:
+                        recipe_id = service.register(self.headers["X-Recipe"])
+                    else:
+                        recipe_id = query.get('recipe', [""])[0]
+                    self._send(200, service.transform(data, recipe_id, fmt), MIME[fmt])
+                else:
+                    self._send(404, {'error': "not found"})
+            except UnknownRecipe as e:
+                self._send(404, {'error': f"unknown recipe {e.args[0]!r}"})
+            except ValueError as e:
+                self._send(400, {'error': str(e)})
+            except Exception as e:
+                traceback.print_exc(file=sys.stderr)
+                self._send(500, {'error': f"{type(e).__name__}: {e}"})
+
+        def log_message(self, format, *args):
+            pass  # one line per request would dominate the console under load
+
+    return Handler
+
+
+def serve(host="127.0.0.1", port=8765, **service_kwargs):
+    service = TransformService(**service_kwargs)
+    server = ThreadingHTTPServer((host, port), make_handler(service))
+    server.daemon_threads = True
+    return server, service
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Local HTTP service for recipe transforms.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--max-batch", type=int, default=16)
+    parser.add_argument("--max-wait-ms", type=float, default=5.0, help="micro-batch window")
+    parser.add_argument("--max-recipes", type=int, default=256, help="registered recipes kept (LRU)")
+    args = parser.parse_args(argv)
+
+    server, _ = serve(args.host, args.port, workers=args.workers, max_batch=args.max_batch,
+                      max_wait_ms=args.max_wait_ms, max_recipes=args.max_recipes)
+    prewarm(plots=False)  # first OpenCV calls happen before the first request
+    print(f"Serving on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,222 @@
+import json
+import os
+import re
+import secrets
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from .codec import atomic_write, decode_image, encode_image
+
+# ========================================
+# PERSISTENT SESSIONS
+# ========================================
+# Refresh browser atau restart pod menghapus session state Streamlit:
+# gambar asli, gambar saat ini dan history hilang. SessionStore menyimpan
+# checkpoint setiap session ke disk lokal, dengan key token acak yang
+# disimpan di query param URL (?session=...):
+#
+#   <root>/<token>/original         bytes upload asli (sudah terkompresi)
+#   <root>/<token>/current-<rev>.png   checkpoint gambar saat ini (PNG)
+#   <root>/<token>/state.json       history parameter + info upload + rev
+#
+# Checkpoint ditulis di thread latar belakang (satu thread, urutan terjaga)
+# dan atomik; state.json ditulis terakhir dan menunjuk ke checkpoint yang
+# sudah lengkap, jadi crash di tengah penulisan menyisakan state lama yang
+# konsisten.
+#
+# Restore bersifat lazy: saat reconnect hanya state.json yang dibaca;
+# gambar dibaca saat halaman tool membutuhkannya. Gambar asli di-restore
+# lewat UploadStore dengan bytes yang sama seperti upload, jadi jika
+# session lain memakai gambar yang sama tidak ada decode ulang. Tanpa
+# langkah yang diterapkan, gambar saat ini = gambar asli (tidak ada decode).
+#
+# Eviction: session yang tidak disentuh lebih dari max_age detik dihapus,
+# lalu yang paling lama tidak disentuh sampai total ukuran <= max_bytes.
+# Konfigurasi lewat UAS_SESSION_DIR, UAS_SESSION_MAX_AGE (detik) dan
+# UAS_SESSION_MAX_MB.
+
+SESSION_DIR = os.environ.get("UAS_SESSION_DIR") or os.path.join(tempfile.gettempdir(), "uas-sessions")
+MAX_AGE = float(os.environ.get("UAS_SESSION_MAX_AGE", 7 * 24 * 3600))
+MAX_BYTES = int(float(os.environ.get("UAS_SESSION_MAX_MB", 2048)) * 2**20)
+EVICT_INTERVAL = 60
+
+STATE_NAME = "state.json"
+ORIGINAL_NAME = "original"
+
+_TOKEN = re.compile(r"^[A-Za-z0-9_-]{16,64}$")
+
+
+def new_token():
+    return secrets.token_urlsafe(16)
+
+
+def _jsonable(obj):
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    raise TypeError(f"Cannot serialise {type(obj).__name__}")
+
+
+class SavedSession:
+    """A session found on disk; images are only read when asked for."""
+
+    def __init__(self, store, token, state):
+        self.store = store
+        self.token = token
+        self.upload = state.get('upload', {})
+        self.revision = state.get('revision', 0)
+        self.current_name = state.get('current')
+        self.history = [
+            {**entry, 'matrix': np.array(entry['matrix'])} if entry.get('matrix') is not None else entry
+            for entry in state.get('history', [])
+        ]
+
+    def original_bytes(self):
+        with open(os.path.join(self.store.path(self.token), ORIGINAL_NAME), "rb") as f:
+            return f.read()
+
+    def current(self):
+        """Checkpointed current image, or None when it equals the original."""
+        if self.current_name is None:
+            return None
+        with open(os.path.join(self.store.path(self.token), self.current_name), "rb") as f:
+            image = decode_image(f.read())
+        image.setflags(write=False)
+        return image
+
+
+class SessionStore:
+    """On-disk checkpoints of app sessions, keyed by URL token."""
+
+    def __init__(self, root=SESSION_DIR, max_age=MAX_AGE, max_bytes=MAX_BYTES):
+        self.root = root
+        self.max_age = max_age
+        self.max_bytes = max_bytes
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="session-store")
+        self._revisions = {}  # token -> newest revision queued; older saves are skipped
+        self._lock = threading.Lock()
+        self._last_evict = 0.0
+
+    def path(self, token):
+        if not token or not _TOKEN.match(token):
+            raise ValueError("Invalid session token")
+        return os.path.join(self.root, token)
+
+    def load(self, token):
+        """SavedSession for token, or None (unknown, evicted or unreadable)."""
+        try:
+            path = os.path.join(self.path(token), STATE_NAME)
+            with open(path, encoding="utf-8") as f:
+                state = json.load(f)
+            os.utime(path)  # touched: counts as recent use for eviction
+        except (ValueError, OSError):
+            return None
+        if not os.path.exists(os.path.join(self.path(token), ORIGINAL_NAME)):
+            return None
+        return SavedSession(self, token, state)
+
+    def save_original(self, token, data, name=None, mime=None):
+        """Start a new checkpoint for token from the uploaded bytes."""
+        upload = {'name': name, 'type': mime, 'size': len(data)}
+        return self._submit(token, 0, self._write_original, data, upload)
+
+    def save(self, token, revision, current, history, from_original=False):
+        """Checkpoint the current image and history; runs in the background.
+
+        current is encoded later, so it must not be modified in place afterwards
+        (steps in the app always produce new arrays). With from_original the
+        current image is the original and no PNG is written.
+        """
+        state = {'revision': revision,
+                 'history': json.loads(json.dumps(history, default=_jsonable))}
+        return self._submit(token, revision, self._write_state, None if from_original else current, state)
+
+    def _submit(self, token, revision, fn, *args):
+        self.path(token)
+        with self._lock:
+            self._revisions[token] = revision
+        return self._executor.submit(self._run, token, fn, *args)
+
+    def _run(self, token, fn, *args):
+        fn(token, *args)
+        if time.time() - self._last_evict > EVICT_INTERVAL:
+            self._last_evict = time.time()
+            self.evict(keep=token)
+
+    def _write_original(self, token, data, upload):
+        directory = self.path(token)
+        if os.path.isdir(directory):
+            shutil.rmtree(directory, ignore_errors=True)
+        os.makedirs(directory)
+        atomic_write(os.path.join(directory, ORIGINAL_NAME), data)
+        self._write_json(directory, {'revision': 0, 'upload': upload, 'current': None, 'history': []})
+
+    def _write_state(self, token, current, state):
+        with self._lock:
+            if self._revisions.get(token, 0) > state['revision']:
+                return  # a newer checkpoint for this session is already queued
+        directory = self.path(token)
+        try:
+            with open(os.path.join(directory, STATE_NAME), encoding="utf-8") as f:
+                old = json.load(f)
+        except (OSError, ValueError):
+            return  # no original on disk (evicted): nothing to attach the checkpoint to
+        state['upload'] = old.get('upload', {})
+        state['current'] = None
+        if current is not None:
+            state['current'] = f"current-{state['revision']}.png"
+            atomic_write(os.path.join(directory, state['current']), encode_image(current))
+        self._write_json(directory, state)
+        for name in os.listdir(directory):
+            if name.startswith("current-") and name != state['current']:
+                os.remove(os.path.join(directory, name))
+
+    def _write_json(self, directory, state):
+        atomic_write(os.path.join(directory, STATE_NAME), json.dumps(state).encode("utf-8"))
+
+    def flush(self):
+        """Wait for queued checkpoints to be written."""
+        self._executor.submit(lambda: None).result()
+
+    def usage(self):
+        """[(last used, bytes, token)] for every stored session."""
+        sessions = []
+        if not os.path.isdir(self.root):
+            return sessions
+        for token in os.listdir(self.root):
+            directory = os.path.join(self.root, token)
+            try:
+                used = os.path.getmtime(os.path.join(directory, STATE_NAME))
+                size = sum(e.stat().st_size for e in os.scandir(directory) if e.is_file())
+            except OSError:
+                continue
+            sessions.append((used, size, token))
+        return sessions
+
+    def evict(self, now=None, keep=None):
+        """Drop sessions older than max_age, then the least recently used over max_bytes."""
+        now = time.time() if now is None else now
+        sessions = sorted(self.usage())
+        total = sum(size for _, size, _ in sessions)
+        removed = []
+        for used, size, token in sessions:
+            if token == keep:
+                continue
+            if now - used <= self.max_age and total <= self.max_bytes:
+                break
+            shutil.rmtree(os.path.join(self.root, token), ignore_errors=True)
+            total -= size
+            removed.append(token)
+        return removed
+
+    def delete(self, token):
+        shutil.rmtree(self.path(token), ignore_errors=True)
+
+
+session_store = SessionStore()
@@ -0,0 +1,100 @@
+import hashlib
+import threading
+import weakref
+
+from .codec import decode_image
+
+# ========================================
+# SHARED UPLOAD STORE
+# ========================================
+# Banyak pengguna meng-upload gambar referensi yang sama. Tanpa store ini
+# setiap session men-decode dan menyimpan salinannya sendiri. UploadStore
+# menyimpan hasil decode sekali per proses, dengan key hash isi file
+# (bytes yang di-upload), sehingga upload kedua dan seterusnya tidak
+# di-decode ulang dan tidak menambah memori.
+#
+# Array yang dibagikan bersifat read-only (setflags(write=False)), seperti
+# output StageCache: session membaca langsung dari array yang sama, dan
+# setiap perubahan menghasilkan array baru (copy-on-write). Penulisan
+# in-place akan gagal dengan ValueError, bukan diam-diam mengubah gambar
+# session lain.
+#
+# Reference count: setiap session memegang satu SharedUpload di session
+# state. Saat handle itu dilepas (release(), atau session state dibuang
+# ketika session berakhir dan handle di-garbage-collect), count turun;
+# entri dengan count 0 dihapus dari store.
+
+
+def content_key(data):
+    """Hash of uploaded bytes identifying an image across sessions."""
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+class SharedUpload:
+    """A session's reference to a stored upload; dropping it releases the reference."""
+
+    def __init__(self, store, key, image):
+        self.key = key
+        self.image = image
+        self._finalizer = weakref.finalize(self, store._release, key)
+
+    def release(self):
+        self._finalizer()
+
+
+class UploadStore:
+    """Process-wide decoded uploads keyed by content hash, with reference counts."""
+
+    def __init__(self):
+        self._entries = {}  # key -> [read-only image, references]
+        # Reentrant: _release runs from weakref.finalize callbacks, which the GC
+        # can fire on a thread that is already inside a locked section
+        self._lock = threading.RLock()
+        self.decodes = 0
+        self.hits = 0
+
+    def acquire(self, data):
+        """SharedUpload for encoded image bytes, decoding only unseen content."""
+        key = content_key(data)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry[1] += 1
+                self.hits += 1
+                return SharedUpload(self, key, entry[0])
+
+        # Decode outside the lock; if another session raced us, keep its copy
+        image = decode_image(data)
+        image.setflags(write=False)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = self._entries[key] = [image, 0]
+                self.decodes += 1
+            else:
+                self.hits += 1
+            entry[1] += 1
+            return SharedUpload(self, key, entry[0])
+
+    def _release(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return
+            entry[1] -= 1
+            if entry[1] <= 0:
+                del self._entries[key]
+
+    def refcount(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry[1] if entry is not None else 0
+
+    def stats(self):
+        """(images, total references, bytes held)."""
+        with self._lock:
+            entries = list(self._entries.values())
+        return len(entries), sum(refs for _, refs in entries), sum(img.nbytes for img, _ in entries)
+
+
+upload_store = UploadStore()
@@ -0,0 +1,233 @@
+import argparse
+import os
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+from PIL import Image, ImageSequence
+
+from engine import RecipeRunner, load_recipe
+
+# ========================================
+# VIDEO / GIF STREAMING
+# ========================================
+# Video dan GIF animasi diproses frame demi frame sebagai rantai generator:
+#
+#   decode (thread) --> transform (worker pool) --> encode (thread pemanggil)
+#
+# Setiap tahap dihubungkan dengan queue terbatas sehingga memori konstan
+# berapa pun panjang video, dan decode/compute/encode berjalan bersamaan.
+# Semua frame punya ukuran yang sama, jadi plan dan remap grid dibuat sekali
+# (RecipeRunner.prepare) lalu dipakai untuk setiap frame.
+#
+# Catatan: writer GIF (Pillow) menyimpan frame ter-palet (1 byte/pixel)
+# sampai file ditulis; output video benar-benar streaming.
+
+VIDEO_EXTENSIONS = {'.mp4', '.avi', '.mov', '.mkv', '.m4v'}
+
+
+def is_gif(path):
+    return os.path.splitext(path)[1].lower() == ".gif"
+
+
+def probe(path):
+    """{'fps', 'frames', 'size'} of a video or GIF (frames may be 0 if unknown)."""
+    if is_gif(path):
+        with Image.open(path) as im:
+            n = getattr(im, "n_frames", 1)
+            duration = im.info.get("duration", 100) or 100
+            return {'fps': 1000.0 / duration, 'frames': n, 'size': im.size}
+    cap = cv2.VideoCapture(path)
+    try:
+        if not cap.isOpened():
+            raise ValueError(f"Cannot open video: {path}")
+        return {
+            'fps': cap.get(cv2.CAP_PROP_FPS) or 25.0,
+            'frames': int(cap.get(cv2.CAP_PROP_FRAME_COUNT)),
+            'size': (int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))),
+        }
+    finally:
+        cap.release()
+
+
+# ----------------------------------------
+# Stages
+# ----------------------------------------
+
+def read_frames(path):
+    """Yield (rgb_frame, duration_ms) one frame at a time."""
+    if is_gif(path):
+        with Image.open(path) as im:
+            for frame in ImageSequence.Iterator(im):
+                yield np.array(frame.convert("RGB")), frame.info.get("duration", 100)
+        return
+    cap = cv2.VideoCapture(path)
+    if not cap.isOpened():
+        raise ValueError(f"Cannot open video: {path}")
+    duration = 1000.0 / (cap.get(cv2.CAP_PROP_FPS) or 25.0)
+    try:
+        while True:
+            ok, frame = cap.read()
+            if not ok:
+                break
+            yield cv2.cvtColor(frame, cv2.COLOR_BGR2RGB), duration
+    finally:
+        cap.release()
+
+
+_DONE = object()
+
+
+def prefetch(iterable, maxsize=8):
+    """Run an iterator in a background thread, buffering at most maxsize items."""
+    q = queue.Queue(maxsize)
+    stop = threading.Event()
+
+    def produce():
+        try:
+            for item in iterable:
+                if stop.is_set():
+                    return
+                q.put(item)
+        except BaseException as e:
+            q.put(e)
+        q.put(_DONE)
+
+    threading.Thread(target=produce, name="prefetch", daemon=True).start()
+    try:
+        while True:
+            item = q.get()
+            if item is _DONE:
+                return
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+    finally:
+        stop.set()
+        # Unblock a producer waiting on a full queue
+        while not q.empty():
+            q.get_nowait()
+
+
+def ordered_map(fn, iterable, workers=2):
+    """Parallel map that keeps input order and at most 2 × workers items in flight."""
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="frame") as pool:
+        pending = deque()
+        for item in iterable:
+            pending.append(pool.submit(fn, item))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def transform_frames(frames, runner, workers=2):
+    """Apply a RecipeRunner to (frame, duration) pairs, yielding them in order."""
+    frames = iter(frames)
+    first = next(frames, None)
+    if first is None:
+        return
+    img = first[0]
+    runner.prepare((img.shape[0], img.shape[1], 1 if img.ndim == 2 else img.shape[2]))
+
+    def one(item):
+        frame, duration = item
+        return runner(frame), duration
+
+    def chained():
+        yield first
+        yield from frames
+
+    yield from ordered_map(one, chained(), workers)
+
+
+# ----------------------------------------
+# Writers
+# ----------------------------------------
+
+def _to_rgb(frame):
+    return cv2.cvtColor(frame, cv2.COLOR_GRAY2RGB) if frame.ndim == 2 else frame
+
+
+def write_video(frames, path, fps, fourcc="mp4v"):
+    """Write RGB frames with cv2.VideoWriter; the first frame fixes the size."""
+    writer = None
+    count = 0
+    try:
+        for frame, _ in frames:
+            frame = _to_rgb(frame)
+            if writer is None:
+                h, w = frame.shape[:2]
+                writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*fourcc), fps, (w, h))
+                if not writer.isOpened():
+                    raise ValueError(f"Cannot open video writer for {path}")
+            writer.write(cv2.cvtColor(frame, cv2.COLOR_RGB2BGR))
+            count += 1
+            yield count
+    finally:
+        if writer is not None:
+            writer.release()
+
+
+def write_gif(frames, path):
+    """Write frames as a looping GIF; frames are quantised as they arrive."""
+    paletted, durations = [], []
+    for frame, duration in frames:
+        # Fast octree quantiser: ~60× faster than the default median cut
+        paletted.append(Image.fromarray(_to_rgb(frame)).quantize(256, method=Image.Quantize.FASTOCTREE))
+        durations.append(duration)
+        yield len(paletted)
+    if paletted:
+        paletted[0].save(path, save_all=True, append_images=paletted[1:],
+                         duration=durations, loop=0, optimize=False)
+
+
+# ----------------------------------------
+# Transcode
+# ----------------------------------------
+
+def transcode(src, dst, recipe, workers=2, progress=None):
+    """Stream src through a recipe into dst (.gif or a video extension).
+
+    progress(done, total, fps) is called after every encoded frame; total is
+    0 when the container does not report a frame count. Returns a stats dict.
+    """
+    info = probe(src)
+    runner = recipe if isinstance(recipe, RecipeRunner) else RecipeRunner(recipe)
+    frames = transform_frames(prefetch(read_frames(src)), runner, workers)
+    if is_gif(dst):
+        written = write_gif(frames, dst)
+    else:
+        written = write_video(frames, dst, info['fps'])
+
+    t0 = time.perf_counter()
+    done = 0
+    for done in written:
+        if progress is not None:
+            progress(done, info['frames'], done / (time.perf_counter() - t0))
+    elapsed = time.perf_counter() - t0
+    return {'frames': done, 'seconds': elapsed, 'fps': done / elapsed if elapsed else 0.0,
+            'source_fps': info['fps']}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Apply a recipe to a video or animated GIF.")
+    parser.add_argument("recipe", help="recipe file (.json / .yaml)")
+    parser.add_argument("src", help="input video or GIF")
+    parser.add_argument("dst", help="output file (.mp4 / .avi / .gif)")
+    parser.add_argument("--workers", type=int, default=2, help="frame worker threads")
+    args = parser.parse_args(argv)
+
+    def report(done, total, fps):
+        print(f"\rframe {done}/{total or '?'}  {fps:.1f} fps", end="", flush=True)
+
+    stats = transcode(args.src, args.dst, load_recipe(args.recipe), args.workers, report)
+    print(f"\n{stats['frames']} frames in {stats['seconds']:.2f}s ({stats['fps']:.1f} fps)")
+
+
+if __name__ == "__main__":
+    main()
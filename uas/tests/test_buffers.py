@@ -0,0 +1,33 @@
+import sys
+
+import numpy as np
+
+from engine import BufferPool
+from engine.buffers import _FREE_REFCOUNT
+
+
+def test_free_refcount_matches_interpreter():
+    # The pool reuses an array when getrefcount says only the pool holds it;
+    # a wrong constant either never reuses or overwrites arrays still in use
+    pool = BufferPool()
+    pool.get((4, 4))
+    for arr in pool._buffers[((4, 4), np.dtype(np.uint8).str)]:
+        assert sys.getrefcount(arr) == _FREE_REFCOUNT
+
+
+def test_held_buffer_is_not_reused():
+    pool = BufferPool()
+    a = pool.get((8, 8, 3))
+    b = pool.get((8, 8, 3))
+    assert b is not a
+    view = b[2:4]  # a view keeps its base alive
+    del b
+    c = pool.get((8, 8, 3))
+    assert c is not a and c.base is None and view.base is not c
+
+
+def test_dropped_buffer_is_reused():
+    pool = BufferPool()
+    first = id(pool.get((8, 8, 3)))
+    assert id(pool.get((8, 8, 3))) == first
+    assert pool.hits == 1
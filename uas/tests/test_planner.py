@@ -0,0 +1,60 @@
+import cv2
+import numpy as np
+import pytest
+
+from engine import compile_stages, execute, filter_stage, optimize, transform_stage
+
+
+@pytest.fixture(scope="module")
+def photo():
+    # Smooth random texture: closer to a photo than white noise, where two
+    # resamplings differ from one by far more than on real images
+    rng = np.random.default_rng(0)
+    img = cv2.GaussianBlur(rng.integers(0, 256, (240, 320, 3), dtype=np.uint8), (0, 0), 4)
+    return cv2.normalize(img, None, 0, 255, cv2.NORM_MINMAX)
+
+
+def fused_error(img, stages):
+    ops = compile_stages(stages, img.shape)
+    plan = optimize(ops, img.shape)
+    assert len(plan) < len(ops), "expected the planner to fuse"
+    diff = np.abs(execute(img, ops).astype(int) - execute(img, plan).astype(int))
+    return diff.mean(), np.percentile(diff, 99)
+
+
+# Fusing warps skips the intermediate resampling and clipping, so results
+# are close to sequential execution but not equal; isolated pixels at
+# canvas edges can differ by much more than the bounds below.
+@pytest.mark.parametrize("stages", [
+    [transform_stage("Rotation", angle=20), transform_stage("Rotation", angle=-35)],
+    [transform_stage("Scaling", sx=0.7, sy=0.7), transform_stage("Scaling", sx=1.6, sy=1.3),
+     transform_stage("Scaling", sx=0.9, sy=1.2)],
+    [transform_stage("Shearing", shear=0.3, axis='X'),
+     transform_stage("Perspective", dst=[[5, 3], [310, 0], [320, 240], [0, 235]])],
+], ids=["rotation+rotation", "three scalings", "shear+perspective"])
+def test_fused_warps_close_to_sequential(photo, stages):
+    mean, p99 = fused_error(photo, stages)
+    assert mean < 1.5
+    assert p99 <= 8
+
+
+def test_fused_warps_before_sharpen(photo):
+    # Sharpen amplifies the resampling difference
+    mean, p99 = fused_error(photo, [transform_stage("Rotation", angle=20), transform_stage("Rotation", angle=15),
+                                    filter_stage("Sharpen", strength=1.0)])
+    assert mean < 4
+    assert p99 <= 20
+
+
+@pytest.mark.parametrize("stages", [
+    [transform_stage("Rotation", angle=20)],
+    [transform_stage("Rotation", angle=20), filter_stage("Grayscale")],
+    [filter_stage("Edge Detection", method="Canny")],
+    [],
+], ids=["warp", "to gray", "canny", "empty"])
+def test_execute_into_out(photo, stages):
+    plan = optimize(compile_stages(stages, photo.shape), photo.shape)
+    expected = execute(photo, plan)
+    out = np.empty_like(expected)
+    assert execute(photo, plan, out=out) is out
+    assert np.array_equal(out, expected)
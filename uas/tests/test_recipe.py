@@ -0,0 +1,112 @@
+import base64
+
+import cv2
+import numpy as np
+import pytest
+
+from engine import (apply_recipe, build_matrix, filter_stage, loads_recipe, make_recipe, transform_stage,
+                    validate_recipe)
+from engine.geometry import image_corners, transform_points
+from engine.warps import NONLINEAR_WARPS
+
+
+def recipe(*stages):
+    return make_recipe(list(stages))
+
+
+@pytest.mark.parametrize("stage, message", [
+    (transform_stage("Perspective"), "missing params 'dst' or 'matrix'"),
+    (filter_stage("Colour Matrix"), "missing params matrix"),
+    (filter_stage("Gaussian Blur", kernel_size="5"), "'kernel_size' must be an integer"),
+    (filter_stage("Gaussian Blur", kernel_size=-3), "'kernel_size' must be >= 1"),
+    (transform_stage("Swirl", strength=3.0, radius=0.5, rotation=0.0, twist=1), "unknown params twist"),
+    (transform_stage("Swirl", strength=3.0), "missing params radius, rotation"),
+    (transform_stage("Scaling", sx=0), "'sx' must be > 0"),
+    (transform_stage("Reflection", axis="Diagonal"), "'axis' must be one of"),
+    (transform_stage("Perspective", dst=[[0, 0], [1, 1], [2, 2], [0, 5]]), "three points on one line"),
+    (filter_stage("Colour Matrix", matrix=[[1, 0], [0, 1]]), "'matrix' must have shape"),
+    (filter_stage("Tone Curve", steps=[{'type': 'Gamma', 'params': {}}]), "missing params gamma"),
+    (filter_stage("Tone Curve", steps=[{'type': 'Gamma', 'params': {'gamma': 1, 'x': 2}}]), "unknown params x"),
+    (filter_stage("Sharpen", strength=1.0, region={'rect': [0, 0, 5]}), "'region.rect' must have shape"),
+    (transform_stage("Perspective", dst=[[5, 0], [60, 3], [64, 48], [0, 40]], size=[64.0, 48]),
+     "'size' must be [cols, rows]"),
+])
+def test_bad_params_raise_value_error_with_stage(stage, message):
+    bad = recipe(transform_stage("Rotation", angle=10), stage)
+    with pytest.raises(ValueError, match="^Stage 2 ") as info:
+        validate_recipe(bad)
+    assert message in str(info.value)
+
+
+def test_app_stages_validate():
+    stages = [
+        transform_stage("Translation", tx=10, ty=-5),
+        transform_stage("Scaling", sx=1.5, sy=0.5, resize_canvas=True),
+        transform_stage("Rotation", angle=30, scale=1.0, center='image'),
+        transform_stage("Shearing", shear=0.2, axis='Y', resize_canvas=True),
+        transform_stage("Reflection", axis="Both"),
+        transform_stage("Perspective", dst=[[5, 0], [60, 3], [64, 48], [0, 40]]),
+        *[transform_stage(name, **params) for name, params in NONLINEAR_WARPS.items()],
+        filter_stage("Gaussian Blur", kernel_size=5),
+        filter_stage("Sharpen", strength=1.0, region={'polygon': [[0, 0], [30, 0], [0, 30]], 'feather': 2}),
+        filter_stage("Edge Detection", method="Canny", threshold1=100, threshold2=200),
+        filter_stage("Brightness/Contrast", brightness=10, contrast=1.2),
+        filter_stage("Tone Curve", steps=[
+            {'type': 'Levels', 'params': {'in_black': 10, 'in_white': 245}, 'channels': 'RGB'},
+            {'type': 'Curve', 'params': {'points': [[0, 0], [128, 140], [255, 255]]}, 'channels': 'R'},
+        ]),
+        filter_stage("Grayscale"),
+        filter_stage("Colour Matrix", matrix=np.eye(3).tolist()),
+    ]
+    r = validate_recipe(recipe(*stages))
+    img = np.random.default_rng(0).integers(0, 256, (48, 64, 3), dtype=np.uint8)
+    assert apply_recipe(img, r).ndim == 3
+
+
+@pytest.mark.parametrize("version", [0, -1, True, 1.0, "1", None, 99])
+def test_bad_version_rejected(version):
+    bad = dict(recipe(transform_stage("Rotation", angle=10)), version=version)
+    with pytest.raises(ValueError, match="Unsupported recipe version"):
+        validate_recipe(bad)
+
+
+def test_loads_recipe_rejects_bad_params():
+    text = '{"format": "uas-recipe", "version": 1, "stages": [{"kind": "transform", "type": "Perspective"}]}'
+    with pytest.raises(ValueError, match="Stage 1"):
+        loads_recipe(text)
+
+
+
+def _mask_png(size):
+    png = cv2.imencode(".png", np.full((size, size), 255, np.uint8))[1]
+    return base64.b64encode(png.tobytes()).decode("ascii")
+
+
+@pytest.mark.parametrize("region, as_ints", [
+    ({'rect': [1.0, 1.0, 10.0, 10.0]}, {'rect': [1, 1, 10, 10]}),
+    ({'polygon': [[0.0, 0.0], [30.4, 0.0], [0.0, 29.6]]}, {'polygon': [[0, 0], [30, 0], [0, 30]]}),
+    ({'mask': _mask_png(8), 'origin': [2.0, 3.0]}, {'mask': _mask_png(8), 'origin': [2, 3]}),
+], ids=["rect", "polygon", "mask"])
+def test_float_region_coordinates(region, as_ints):
+    # JSON and YAML recipes may carry pixel coordinates as floats
+    img = np.random.default_rng(0).integers(0, 256, (48, 64, 3), dtype=np.uint8)
+    out = apply_recipe(img, validate_recipe(recipe(filter_stage("Gaussian Blur", kernel_size=5, region=region))))
+    assert np.array_equal(out, apply_recipe(img, recipe(filter_stage("Gaussian Blur", kernel_size=5, region=as_ints))))
+    assert not np.array_equal(out, img)
+
+
+@pytest.mark.parametrize("params", [
+    {'dst': [[5, 0], [60, 3], [64, 48], [0, 40]], 'size': [64, 48]},
+    {'matrix': build_matrix("Perspective", {'dst': [[5, 0], [60, 3], [64, 48], [0, 40]]}, (48, 64)).tolist(),
+     'size': [64, 48]},
+], ids=["corners", "matrix"])
+def test_perspective_replays_on_other_sizes(params):
+    # Tuned on a 64×48 sample, replayed on a 160×96 image: corners land at the same relative positions
+    H = build_matrix("Perspective", params, (96, 160))
+    expected = np.float64([[5, 0], [60, 3], [64, 48], [0, 40]]) * [160 / 64, 96 / 48]
+    assert np.allclose(transform_points(H, image_corners(160, 96)), expected, atol=1e-3)
+
+    img = np.random.default_rng(0).integers(0, 256, (96, 160, 3), dtype=np.uint8)
+    tuned_here = transform_stage("Perspective", dst=expected.tolist(), size=[160, 96])
+    out = apply_recipe(img, validate_recipe(recipe(transform_stage("Perspective", **params))))
+    assert np.array_equal(out, apply_recipe(img, recipe(tuned_here)))
@@ -0,0 +1,41 @@
+import logging
+from concurrent.futures import Future
+
+import numpy as np
+
+import engine.sharedmem as sharedmem
+from engine import filter_stage, make_recipe, transform_stage
+from engine.sharedmem import ProcessRunner, SharedImage
+
+
+class _PendingPool:
+    """Stands in for the process pool: jobs stay pending until the test resolves them."""
+
+    def submit(self, *args):
+        self.future = Future()
+        return self.future
+
+
+def test_cancelled_job_releases_output(caplog):
+    runner = ProcessRunner()
+    runner._pool = pool = _PendingPool()
+    src = SharedImage.from_array(np.zeros((8, 8, 3), np.uint8))
+    result = runner.submit(src, make_recipe([filter_stage("Grayscale")]))
+    with caplog.at_level(logging.ERROR, logger="concurrent.futures"):
+        assert pool.future.cancel()
+    assert not caplog.records
+    assert not result._dst.alive
+    src.release()
+    assert not src.alive
+
+
+def test_worker_runner_cache_is_bounded(monkeypatch):
+    monkeypatch.setattr(sharedmem, "WORKER_MAX_RECIPES", 2)
+    monkeypatch.setattr(sharedmem, "_worker_runners", sharedmem.OrderedDict())
+    img = np.zeros((8, 8, 3), np.uint8)
+    for angle in (10, 20, 10, 30):
+        recipe = make_recipe([transform_stage("Rotation", angle=angle)])
+        with SharedImage.from_array(img) as src, SharedImage(img.shape) as dst:
+            sharedmem._run_recipe_job(src.handle(), dst.handle(), recipe, repr(recipe['stages']))
+    assert [key for key in sharedmem._worker_runners] == [
+        repr(make_recipe([transform_stage("Rotation", angle=a)])['stages']) for a in (10, 30)]
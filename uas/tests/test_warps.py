@@ -0,0 +1,26 @@
+import numpy as np
+import pytest
+
+from engine import GridCache
+
+
+def test_evicted_maps_are_not_reused():
+    cache = GridCache(max_entries=2)
+    size = (64, 48)
+    map1, map2 = cache.get("Swirl", {'strength': 3.0, 'radius': 0.5, 'rotation': 0.0}, size)
+    before1, before2 = map1.copy(), map2.copy()
+
+    # Push the held entry out of the LRU with grids of the same size
+    for k in (0.1, 0.2, 0.3, 0.4):
+        cache.get("Lens Distortion", {'k1': k, 'k2': 0.0}, size)
+
+    np.testing.assert_array_equal(map1, before1)
+    np.testing.assert_array_equal(map2, before2)
+
+
+def test_maps_are_read_only():
+    map1, map2 = GridCache().get("Polar", {}, (32, 32))
+    with pytest.raises(ValueError):
+        map1[0, 0] = 0
+    with pytest.raises(ValueError):
+        map2[0, 0] = 0